@@ -1,10 +1,22 @@
 import argparse
+import hashlib
 import json
 import os
 import random
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
+from typing import TypedDict
+
+if str(Path(__file__).resolve().parent.parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # запуск як скрипт
+
+from aizine_integration.catalog import get_catalog
+from aizine_integration.image_header import classify_orientation, display_size, read_image_size
+from aizine_integration.layout_engine import pages_for_photos, plan_placements
+from aizine_integration.photo_meta import file_sha256, load_index
 
 # ===== Configuration =====
 
@@ -14,6 +26,17 @@ TEMPLATES_DIR = Path(os.getenv("TEMPLATES_DIR", BASE_DIR / "data" / "templates")
 CONFIG_DIR = BASE_DIR / "data" / "config"
 
 
+class Plan(TypedDict):
+    """compose_plan.json у пам'яті (те саме, що читає compose.jsx)."""
+    meta: dict
+    placements: list[dict]
+    texts: dict
+
+
+def plan_path_for(job_dir: Path) -> Path:
+    return job_dir / "meta" / "compose_plan.json"
+
+
 def log(msg: str, verbose: bool):
     """Prints when verbose=True (ASCII only)"""
     if verbose:
@@ -21,215 +44,141 @@ def log(msg: str, verbose: bool):
 
 
 def load_templates_map(verbose=False) -> dict:
-    map_path = CONFIG_DIR / "templates_map.json"
-
-    log(f"Loading templates map from {map_path}", verbose)
-
-    if map_path.exists():
-        with open(map_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            log("Loaded templates_map keys: " + str(list(data.keys())), verbose)
-            return data
-
-    log("templates_map.json not found, using default", verbose)
-
-    # fallback на випадок, якщо json відсутній
-    return {
-        "custom": {
-            "default": "data/templates/adult18/adult18.indd"
-        }
-    }
+    templates_map = get_catalog().templates_map
+    log("Loaded templates_map keys: " + str(list(templates_map.keys())), verbose)
+    return templates_map
 
 
 def get_template_path(theme: str, category: str | None, pages: int, verbose=False) -> Path | None:
-    templates_map = load_templates_map(verbose)
-
     log(f"Requested theme={theme}, category={category}, pages={pages}", verbose)
 
-    theme_block = templates_map.get(theme)
-    if not theme_block:
+    entry = get_catalog().find_template(theme, category, pages)
+    if entry is None:
         log(f"Theme '{theme}' not found in templates_map.json", verbose)
         return None
 
-    # Випадок theme -> { "default": "data/templates/..." }
-    if isinstance(theme_block, dict) and "default" in theme_block:
-        return BASE_DIR / theme_block["default"]
+    log(f"Matched template: {entry.path} (category={entry.name}, pages={entry.pages})", verbose)
+    return BASE_DIR / entry.path
+
 
-    templates_list = theme_block if isinstance(theme_block, list) else []
+SUPPORTED_EXT = {".jpg", ".jpeg", ".png", ".tif", ".tiff"}
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", "8"))
+PHOTOS_PER_PAGE = int(os.getenv("PHOTOS_PER_PAGE", "4"))  # максимум фото на внутрішній сторінці
 
-    # exact category + pages
-    if category:
-        for item in templates_list:
-            if item.get("name") == category and item.get("pages") == pages:
-                log(f"Matched exact category-pages template: {item['path']}", verbose)
-                return BASE_DIR / item["path"]
 
-    # match by pages only
-    for item in templates_list:
-        if item.get("pages") == pages:
-            log(f"Matched pages-only template: {item['path']}", verbose)
-            return BASE_DIR / item["path"]
+def analyze_photo(file_path: Path) -> dict:
+    """Розміри + орієнтація одного фото (тільки заголовок, без декодування)."""
+    photo_info = {
+        "path": str(file_path.absolute()),
+        "filename": file_path.name,
+    }
 
-    # fallback
-    if templates_list:
-        log(f"Falling back to first template: {templates_list[0]['path']}", verbose)
-        return BASE_DIR / templates_list[0]["path"]
+    try:
+        header = read_image_size(file_path)
+        w, h = display_size(*header)
+        photo_info["width"] = w
+        photo_info["height"] = h
+        photo_info["exif_orientation"] = header[2]
+        photo_info["orientation"] = classify_orientation(w, h)
+    except Exception:
+        photo_info["orientation"] = "unknown"
 
-    log("No matching template found", verbose)
-    return None
+    return photo_info
 
 
 def analyze_photos(input_dir: Path, verbose=False) -> list[dict]:
-    photos = []
-    supported_ext = {".jpg", ".jpeg", ".png", ".tif", ".tiff"}
-
     if not input_dir.exists():
         log(f"Input photo directory not found: {input_dir}", verbose)
-        return photos
+        return []
 
     log(f"Scanning photos in {input_dir}", verbose)
 
-    for file_path in sorted(input_dir.iterdir()):
-        if file_path.suffix.lower() not in supported_ext:
-            continue
-
-        photo_info = {
-            "path": str(file_path.absolute()),
-            "filename": file_path.name,
-        }
-
-        try:
-            from PIL import Image
-            with Image.open(file_path) as img:
-                w, h = img.size
-                photo_info["width"] = w
-                photo_info["height"] = h
-
-                ratio = h / w if w else 1
-                if ratio > 1.2:
-                    photo_info["orientation"] = "vertical"
-                elif ratio < 0.8:
-                    photo_info["orientation"] = "horizontal"
-                else:
-                    photo_info["orientation"] = "square"
-
-        except Exception:
-            photo_info["orientation"] = "unknown"
-
-        photos.append(photo_info)
+    files = [p for p in sorted(input_dir.iterdir()) if p.suffix.lower() in SUPPORTED_EXT]
+
+    # Фото, проаналізовані ще під час завантаження (meta/photos_index.json)
+    index = load_index(input_dir.parent / "meta")
+    photos: dict[Path, dict] = {}
+    for p in files:
+        meta = index.get(p.name)
+        if meta and "width" in meta and meta.get("bytes") == p.stat().st_size:
+            photos[p] = {
+                "path": str(p.absolute()),
+                "filename": p.name,
+                "width": meta["width"],
+                "height": meta["height"],
+                "exif_orientation": meta.get("exif_orientation", 1),
+                "orientation": meta["orientation"],
+                "sha256": meta.get("sha256"),
+            }
+
+    missing = [p for p in files if p not in photos]
+    log(f"Photo index hits: {len(photos)}, to analyze: {len(missing)}", verbose)
+
+    # Читання заголовків — це I/O (мережеве сховище), тож потоки дають виграш
+    if len(missing) > 1 and ANALYZE_WORKERS > 1:
+        with ThreadPoolExecutor(max_workers=min(ANALYZE_WORKERS, len(missing))) as pool:
+            photos.update(zip(missing, pool.map(analyze_photo, missing)))
+    else:
+        photos.update((p, analyze_photo(p)) for p in missing)
 
     log(f"Found {len(photos)} photos", verbose)
-    return photos
+    return [photos[p] for p in files]
 
 
 def calculate_pages_for_photos(photo_count: int, verbose=False) -> int:
     """
-    Розраховує кількість сторінок на основі кількості фото.
-    - 1 фото на обкладинку
-    - 1 фото на внутрішню сторінку (кожне фото = окрема сторінка)
-    - 1 фото на задню обкладинку
+    Розраховує мінімальну кількість сторінок для фото.
+    - 1 фото на обкладинку і 1 на задню обкладинку
+    - всередині до PHOTOS_PER_PAGE фото на сторінку
     - Мінімум 4 сторінки, завжди парне число
     """
-    if photo_count <= 0:
-        return 4
-
-    # Кожне фото = 1 сторінка (включаючи обкладинки)
-    # Cover + internal pages + back cover
-    total = photo_count
-
-    # Мінімум 4 сторінки
-    if total < 4:
-        total = 4
-
-    # Парне число для друку
-    if total % 2 != 0:
-        total += 1
-
+    total = pages_for_photos(photo_count, PHOTOS_PER_PAGE)
     log(f"Photos: {photo_count} -> Pages: {total}", verbose)
     return total
 
 
-def generate_placements(photos: list[dict], pages: int, verbose=False, shuffle_internal: bool = True) -> tuple[list[dict], int]:
+def job_seed(job_meta: dict, photo_hashes: list[str], theme: str, category: str | None, pages: int) -> int:
+    """
+    Seed розкладки, похідний від входів (вміст фото + тема/категорія/сторінки):
+    однакове повторне замовлення дає той самий план і той самий digest (кеш рендеру).
+    «Інший макет» зсуває його лічильником reshuffle з job.json; явний seed (старі job) — як є.
+    """
+    if job_meta.get("seed") is not None:
+        return int(job_meta["seed"])
+    key = json.dumps([sorted(photo_hashes), theme, category, pages], ensure_ascii=False)
+    base = int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16)
+    return (base + int(job_meta.get("reshuffle", 0))) % (1 << 31)
+
+
+def generate_placements(
+    photos: list[dict],
+    pages: int,
+    verbose=False,
+    rng: random.Random | None = None,
+    template_path: Path | None = None,
+) -> tuple[list[dict], int]:
     """
     Генерує placements та повертає (placements, actual_pages).
-    Кожне фото = окрема сторінка.
+    Фото розкладаються по слотах шаблону (data/layouts) з мінімальною обрізкою;
+    без геометрії — по віртуальній сітці до PHOTOS_PER_PAGE фото на сторінку.
 
     Args:
         photos: список фото з інформацією
         pages: бажана кількість сторінок
         verbose: режим детального логування
-        shuffle_internal: перемішувати внутрішні фото для варіативності
+        rng: генератор з seed job — однаковий seed дає однаковий план
+        template_path: шаблон, геометрію якого використовуємо
     """
-    placements = []
-    if not photos:
-        return placements, 4
+    rng = rng or random.Random()
+    log(f"Generating placements for {len(photos)} photos", verbose)
 
-    log(f"Generating placements for {len(photos)} photos (shuffle={shuffle_internal})", verbose)
-
-    # 1) Обкладинка — беремо ВИПАДКОВЕ вертикальне фото, або перше
-    vertical = [p for p in photos if p.get("orientation") == "vertical"]
-    if vertical:
-        cover_photo = random.choice(vertical)
-    else:
-        cover_photo = photos[0]
-
-    placements.append({
-        "label": "COVER_IMAGE",
-        "photo": cover_photo["path"],
-        "filename": cover_photo["filename"],
-        "orientation": cover_photo.get("orientation", "unknown"),
-        "fit": "fill",
-    })
-    log(f"  COVER_IMAGE -> {cover_photo['filename']} ({cover_photo.get('orientation', 'unknown')})", verbose)
-
-    # 2) Внутрішні сторінки — кожне фото на окрему сторінку
-    remaining = [p for p in photos if p["filename"] != cover_photo["filename"]]
-
-    # Вибираємо фото для задньої обкладинки — ВИПАДКОВЕ вертикальне
-    back_candidates = [p for p in remaining if p.get("orientation") == "vertical"]
-    if back_candidates:
-        back_photo = random.choice(back_candidates)
-    elif remaining:
-        back_photo = remaining[-1]
-    else:
-        back_photo = None
-
-    # Внутрішні фото (без cover і back)
-    core = [p for p in remaining if back_photo is None or p["filename"] != back_photo["filename"]]
-
-    # ПЕРЕМІШУЄМО внутрішні фото для варіативності макету
-    if shuffle_internal and len(core) > 1:
-        random.shuffle(core)
-        log(f"  Shuffled {len(core)} internal photos for variation", verbose)
-
-    for idx, photo in enumerate(core):
-        page_num = idx + 1
-        label = f"PAGE_{page_num:02d}_IMG_01"
-        placements.append({
-            "label": label,
-            "photo": photo["path"],
-            "filename": photo["filename"],
-            "orientation": photo.get("orientation", "unknown"),
-            "fit": "fill",
-        })
-        log(f"  {label} -> {photo['filename']} ({photo.get('orientation', 'unknown')})", verbose)
-
-    # 3) Задня обкладинка
-    if back_photo:
-        placements.append({
-            "label": "BACK_IMAGE",
-            "photo": back_photo["path"],
-            "filename": back_photo["filename"],
-            "orientation": back_photo.get("orientation", "unknown"),
-            "fit": "fill",
-        })
-        log(f"  BACK_IMAGE -> {back_photo['filename']} ({back_photo.get('orientation', 'unknown')})", verbose)
-
-    # Розраховуємо реальну кількість сторінок
-    actual_pages = calculate_pages_for_photos(len(photos), verbose)
+    placements, actual_pages = plan_placements(
+        photos, pages, rng, template_path=template_path, max_per_page=PHOTOS_PER_PAGE,
+    )
 
+    for p in placements:
+        log(f"  {p['label']} -> {p['filename']} ({p['orientation']}, crop {p['crop_loss']:.0%})", verbose)
     log(f"Generated {len(placements)} placements for {actual_pages} pages", verbose)
-    log(f"Labels: {[p['label'] for p in placements]}", verbose)
     return placements, actual_pages
 
 
@@ -258,8 +207,62 @@ def generate_texts(theme: str, client_name: str) -> dict:
     }
 
 
-def build_plan(job_id=None, job_path: Path | None = None, verbose=False) -> dict:
-    """Будує compose_plan.json на основі meta/meta.json + фото"""
+PLAN_DIGEST_VERSION = 2  # 2: конкретні пари слот → фото замість двох множин
+
+
+def template_signature(template_path: Path) -> dict:
+    """Шаблон ідентифікуємо відносним шляхом + розміром/mtime (перезбережений .indd → інший digest)."""
+    try:
+        rel = template_path.resolve().relative_to(BASE_DIR.resolve()).as_posix()
+    except ValueError:
+        rel = template_path.as_posix()
+    try:
+        st = template_path.stat()
+        return {"path": rel, "bytes": st.st_size, "mtime_ns": st.st_mtime_ns}
+    except OSError:
+        return {"path": rel}
+
+
+def plan_digest(plan: Plan, photo_hashes: dict[str, str | None] | None = None) -> str:
+    """
+    Канонічний digest плану для кешу рендеру.
+    Не залежить від job_id, generated_at, шляхів та імен файлів: фото — це sha256 вмісту.
+    Хешується саме розкладка (слот, сторінка, фото, fit), тож два плани з однаковим
+    digest рендеряться однаково, навіть якщо випадковий розподіл у них різний.
+    """
+    photo_hashes = photo_hashes or {}
+    meta = plan["meta"]
+    canonical = {
+        "version": PLAN_DIGEST_VERSION,
+        "theme": meta.get("theme"),
+        "category": meta.get("category"),
+        "pages": meta.get("pages"),
+        "client_name": meta.get("client_name"),
+        "seed": meta.get("seed"),
+        "template": template_signature(Path(meta["template"])),
+        "texts": plan["texts"],
+        "placements": sorted(
+            [
+                p["label"],
+                p.get("page"),
+                photo_hashes.get(p["photo"]) or file_sha256(Path(p["photo"])),
+                p.get("fit"),
+            ]
+            for p in plan["placements"]
+        ),
+    }
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_plan(job_id=None, job_path: Path | None = None, verbose=False, timer=None) -> Plan:
+    """
+    Будує план на основі meta/meta.json + фото і повертає його об'єктом.
+    compose_plan.json теж записується (його читає InDesign), але
+    викликачам у тому ж процесі не треба перечитувати файл.
+    timer — orchestrator.timings.StageTimer (етапи analyze_photos і placement).
+    """
+    stage = timer.stage if timer else (lambda name: nullcontext())
 
     # ===== Визначаємо папку job =====
     if job_path:
@@ -299,11 +302,24 @@ def build_plan(job_id=None, job_path: Path | None = None, verbose=False) -> dict
 
     # ===== Аналіз фото =====
     input_dir = job_dir / "input"
-    photos = analyze_photos(input_dir, verbose)
+    with stage("analyze_photos"):
+        photos = analyze_photos(input_dir, verbose)
+        # Порядок — за вмістом, а не за іменами photo_<uuid>: розкладка залежить лише
+        # від того, що хешується в digest (фото + seed), а не від того, як файли назвались
+        for p in photos:
+            if not p.get("sha256"):
+                p["sha256"] = file_sha256(Path(p["path"]))
+        photos.sort(key=lambda p: (p["sha256"], p["filename"]))
+
+    seed = job_seed(job_meta, [p["sha256"] for p in photos], theme, category, pages)
+    log(f"Seed: {seed}", verbose)
     if not photos:
         raise ValueError("No photos found in input folder")
 
-    placements, min_pages = generate_placements(photos, pages, verbose)
+    with stage("placement"):
+        placements, min_pages = generate_placements(
+            photos, pages, verbose, rng=random.Random(seed), template_path=template_path,
+        )
     texts = generate_texts(theme, client_name)
 
     # Використовуємо вибір юзера, але не менше мінімуму для фото
@@ -319,21 +335,21 @@ def build_plan(job_id=None, job_path: Path | None = None, verbose=False) -> dict
             "category": category,
             "pages": final_pages,
             "client_name": client_name,
+            "seed": seed,
             "template": str(template_path.absolute()),
             "output_dir": str((job_dir / "output").absolute()),
         },
         "placements": placements,
         "texts": texts,
     }
+    plan["meta"]["digest"] = plan_digest(plan, {p["path"]: p.get("sha256") for p in photos})
 
-    out_path = job_dir / "meta" / "compose_plan.json"
+    out_path = plan_path_for(job_dir)
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(plan, f, ensure_ascii=False, indent=2)
 
-    print("Plan saved:", out_path)
-    print("Template:", template_path.name)
-    print("Photos:", len(photos))
-    print("Placements:", len(placements))
+    log(f"Plan saved: {out_path} (template={template_path.name}, photos={len(photos)}, "
+        f"placements={len(placements)})", verbose)
 
     return plan
 
@@ -356,6 +372,9 @@ def main():
             verbose=args.verbose,
         )
 
+        print("Template:", Path(plan["meta"]["template"]).name)
+        print("Placements:", len(plan["placements"]))
+
         if args.verbose:
             print(json.dumps(plan, ensure_ascii=False, indent=2))
 
@@ -0,0 +1,249 @@
+"""
+Скомпільований каталог шаблонів і layouts.
+
+Замість того, щоб на кожен план читати templates_map.json і всі data/layouts/*.json,
+build-крок складає їх в один pickle (data/catalog.pickle) з готовими індексами:
+тема → шаблони, (тема, категорія) → шаблон, кількість сторінок → шаблони,
+кількість фото-слотів → шаблони, і слоти по сторінках для layout_engine.
+
+Каталог вантажиться один раз на процес (бот і оркестратор читають той самий файл).
+Застарілість перевіряється за розміром/mtime джерел, а якщо mtime змінився
+(git checkout, копіювання) — за sha256 вмісту; змінився вміст → перекомпіляція.
+
+Збірка вручну:
+    python -m aizine_integration.catalog build
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from aizine_integration.layout_engine import Slot, page_label
+
+BASE_DIR = Path(os.getenv("MAGAZINEBOT_DIR", Path(__file__).parent.parent))
+CATALOG_PATH = BASE_DIR / "data" / "catalog.pickle"
+LAYOUTS_DIR = BASE_DIR / "data" / "layouts"
+TEMPLATES_MAP = BASE_DIR / "data" / "config" / "templates_map.json"
+
+CATALOG_VERSION = 1
+
+DEFAULT_TEMPLATES_MAP = {
+    "custom": {
+        "default": "data/templates/adult18/adult18.indd"
+    }
+}
+
+
+@dataclass
+class TemplateEntry:
+    theme: str
+    name: str | None        # категорія; None для theme → {"default": ...}
+    pages: int | None
+    path: str               # відносно BASE_DIR, як у templates_map.json
+
+
+@dataclass
+class Catalog:
+    version: int
+    sources: dict[str, dict]                     # файл → bytes, mtime_ns, sha256
+    templates_map: dict
+    templates: list[TemplateEntry]
+    by_theme: dict[str, list[int]] = field(default_factory=dict)
+    by_category: dict[tuple[str, str], list[int]] = field(default_factory=dict)
+    by_pages: dict[int, list[int]] = field(default_factory=dict)
+    layouts: dict[str, list[list[Slot]]] = field(default_factory=dict)   # "<theme>/<category>" → слоти
+    by_slot_count: dict[int, list[str]] = field(default_factory=dict)
+
+    # ------------------------------------------------------------
+    def find_template(self, theme: str, category: str | None, pages: int) -> TemplateEntry | None:
+        """Та сама логіка, що й раніше в get_template_path, але по індексах."""
+        ids = self.by_theme.get(theme)
+        if not ids:
+            return None
+
+        default = next((self.templates[i] for i in ids if self.templates[i].name is None), None)
+        if default:
+            return default
+
+        if category:
+            for i in self.by_category.get((theme, category), []):
+                if self.templates[i].pages == pages:
+                    return self.templates[i]
+
+        for i in self.by_pages.get(pages, []):
+            if self.templates[i].theme == theme:
+                return self.templates[i]
+
+        return self.templates[ids[0]]
+
+    def layout_for(self, key: str) -> list[list[Slot]] | None:
+        """Слоти шаблону "<theme>/<category>" або None, якщо геометрії немає."""
+        return self.layouts.get(key)
+
+
+# ================================================================
+# BUILD
+# ================================================================
+def _sources(layouts_dir: Path, templates_map: Path) -> list[Path]:
+    files = sorted(layouts_dir.glob("*.json")) if layouts_dir.exists() else []
+    if templates_map.exists():
+        files.append(templates_map)
+    return files
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _signature(path: Path, known: dict | None = None) -> dict:
+    st = path.stat()
+    if known and known["bytes"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+        return known
+    return {"bytes": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": _sha256(path)}
+
+
+def _parse_layout(data: dict) -> list[list[Slot]]:
+    pages = data.get("pages", [])
+    last_page = len(pages) - 1
+    result = []
+    for idx, page in enumerate(pages):
+        slots = []
+        for n, slot in enumerate(page.get("photo_slots", []), start=1):
+            bounds = slot.get("bounds") or {}
+            if not bounds.get("width") or not bounds.get("height"):
+                continue
+            slots.append(Slot(
+                label=slot.get("label") or page_label(idx, n, last_page),
+                page=idx,
+                width=bounds["width"],
+                height=bounds["height"],
+            ))
+        result.append(slots)
+    return result
+
+
+def compile_catalog(layouts_dir: Path = LAYOUTS_DIR, templates_map: Path = TEMPLATES_MAP) -> Catalog:
+    sources = {str(p.relative_to(BASE_DIR)) if p.is_relative_to(BASE_DIR) else str(p): _signature(p)
+               for p in _sources(layouts_dir, templates_map)}
+
+    if templates_map.exists():
+        tmap = json.loads(templates_map.read_text(encoding="utf-8"))
+    else:
+        tmap = DEFAULT_TEMPLATES_MAP
+
+    catalog = Catalog(version=CATALOG_VERSION, sources=sources, templates_map=tmap, templates=[])
+
+    for theme, block in tmap.items():
+        if isinstance(block, dict) and "default" in block:
+            entries = [TemplateEntry(theme, None, None, block["default"])]
+        else:
+            entries = [
+                TemplateEntry(theme, item.get("name"), item.get("pages"), item["path"])
+                for item in (block if isinstance(block, list) else [])
+            ]
+        for entry in entries:
+            idx = len(catalog.templates)
+            catalog.templates.append(entry)
+            catalog.by_theme.setdefault(theme, []).append(idx)
+            if entry.name:
+                catalog.by_category.setdefault((theme, entry.name), []).append(idx)
+            if entry.pages:
+                catalog.by_pages.setdefault(entry.pages, []).append(idx)
+
+    for path in sorted(layouts_dir.glob("*.json")) if layouts_dir.exists() else []:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        slots = _parse_layout(data)
+        if not any(slots):
+            continue  # без геометрії layout_engine однаково піде у віртуальну сітку
+        key = "/".join(data.get("template", "").split("/")[:2])
+        catalog.layouts[key] = slots
+        catalog.by_slot_count.setdefault(sum(len(s) for s in slots), []).append(key)
+
+    return catalog
+
+
+def write_catalog(catalog: Catalog, out_path: Path = CATALOG_PATH):
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out_path)  # інший процес ніколи не прочитає половину файлу
+
+
+def is_fresh(catalog: Catalog, layouts_dir: Path = LAYOUTS_DIR, templates_map: Path = TEMPLATES_MAP) -> bool:
+    if catalog.version != CATALOG_VERSION:
+        return False
+    current = _sources(layouts_dir, templates_map)
+    names = [str(p.relative_to(BASE_DIR)) if p.is_relative_to(BASE_DIR) else str(p) for p in current]
+    if sorted(names) != sorted(catalog.sources):
+        return False
+    for name, path in zip(names, current):
+        known = catalog.sources[name]
+        if _signature(path, known)["sha256"] != known["sha256"]:
+            return False
+    return True
+
+
+# ================================================================
+# LOAD (раз на процес)
+# ================================================================
+_catalog: Catalog | None = None
+_lock = threading.Lock()
+
+
+def load_catalog(path: Path = CATALOG_PATH) -> Catalog:
+    """Читає скомпільований каталог; якщо його немає або джерела змінились — збирає заново."""
+    try:
+        with open(path, "rb") as f:
+            catalog = pickle.load(f)
+        if isinstance(catalog, Catalog) and is_fresh(catalog):
+            return catalog
+    except (OSError, pickle.UnpicklingError, AttributeError, EOFError):
+        pass
+
+    catalog = compile_catalog()
+    try:
+        write_catalog(catalog, path)
+    except OSError:
+        pass  # read-only розгортання: працюємо з каталогом у пам'яті
+    return catalog
+
+
+def get_catalog() -> Catalog:
+    global _catalog
+    if _catalog is None:
+        with _lock:
+            if _catalog is None:
+                _catalog = load_catalog()
+    return _catalog
+
+
+def reload_catalog() -> Catalog:
+    global _catalog
+    with _lock:
+        _catalog = load_catalog()
+    return _catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile templates_map + layouts into one catalog")
+    parser.add_argument("cmd", choices=["build"])
+    parser.add_argument("--out", default=str(CATALOG_PATH))
+    args = parser.parse_args()
+
+    # Через модуль пакета, а не __main__: інакше pickle посилатиметься на __main__.Catalog
+    from aizine_integration import catalog as module
+
+    catalog = module.compile_catalog()
+    module.write_catalog(catalog, Path(args.out))
+    print(f"[OK] Catalog: {len(catalog.templates)} templates, {len(catalog.layouts)} layouts with slots "
+          f"({len(catalog.sources)} sources) → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
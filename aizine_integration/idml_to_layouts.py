@@ -3,14 +3,21 @@
 IDML → JSON layouts extractor
 --------------------------------
 Витягає структуру сторінок із IDML:
-- фото-фрейми (Rectangles із Graphic)
+- фото-фрейми (Rectangle/Oval/Polygon з графікою або ContentType=GraphicType)
 - текстові фрейми (TextFrames)
-- позиції, розміри, labels
-- сторінки (Page)
-- spreads (Spread)
+- позиції в координатах сторінки (ItemTransform груп і фреймів враховано), розміри, аспект, поворот
+- labels — script label з <Properties><Label> (те саме, що item.label у compose.jsx)
+- фрейми мастер-сторінок і дочірні елементи груп
+- сторінки (Page) у порядку designmap.xml
+
+Інкрементально (--all):
+- data/layouts_manifest.json пам'ятає для кожного IDML розмір/mtime/sha256 і CRC кожного Spread XML
+- незмінений IDML пропускається без читання; змінений — перепарсюються лише змінені spreads,
+  сторінки решти беруться з попереднього JSON
+- IDML обробляються паралельно в пулі процесів, spreads читаються потоково (iterparse)
 
 Запуск:
-    python -m aizine_integration.idml_to_layouts --all
+    python -m aizine_integration.idml_to_layouts --all [--force] [--workers N]
 або
     python -m aizine_integration.idml_to_layouts --idml path.idml --template lavstory/vesilnyi
 """
@@ -18,9 +25,23 @@ IDML → JSON layouts extractor
 import zipfile
 import json
 import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import xml.etree.ElementTree as ET
 
+from aizine_integration.photo_meta import file_sha256
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPLATES_DIR = BASE_DIR / "data" / "templates"
+LAYOUTS_DIR = BASE_DIR / "data" / "layouts"
+# Поза data/layouts: catalog.py читає там кожен *.json як layout
+MANIFEST_PATH = BASE_DIR / "data" / "layouts_manifest.json"
+LEGACY_MANIFEST = "manifest.json"  # старе місце, всередині layouts_dir
+MANIFEST_VERSION = 2  # 2: координати сторінки, script labels, мастери
+
 
 def parse_bounds(bounds):
     """GeometricBounds: top left bottom right"""
@@ -38,81 +59,390 @@ def parse_bounds(bounds):
         return None
 
 
-def extract_idml(idml_path: Path, template_key: str, out_json: Path):
-    pages_data = []
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+# ==========================
+# GEOMETRY
+# ==========================
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+GRAPHIC_FRAMES = {"Rectangle", "Oval", "Polygon"}
+GRAPHIC_CONTENT = {"Image", "PDF", "EPS", "ImportedPage", "WMF", "PICT", "SVG"}
+
+
+def parse_transform(value: str | None) -> tuple[float, ...]:
+    """ItemTransform "a b c d tx ty": x' = a·x + c·y + tx, y' = b·x + d·y + ty."""
+    try:
+        m = tuple(float(x) for x in value.split())
+        return m if len(m) == 6 else IDENTITY
+    except (AttributeError, ValueError):
+        return IDENTITY
+
+
+def compose(outer: tuple, inner: tuple) -> tuple:
+    """outer ∘ inner: спершу inner (елемент → група), потім outer (група → spread)."""
+    a1, b1, c1, d1, x1, y1 = outer
+    a2, b2, c2, d2, x2, y2 = inner
+    return (
+        a1 * a2 + c1 * b2,
+        b1 * a2 + d1 * b2,
+        a1 * c2 + c1 * d2,
+        b1 * c2 + d1 * d2,
+        a1 * x2 + c1 * y2 + x1,
+        b1 * x2 + d1 * y2 + y1,
+    )
+
+
+def apply(m: tuple, x: float, y: float) -> tuple[float, float]:
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def _box(points: list[tuple[float, float]]) -> dict | None:
+    if not points:
+        return None
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    return {"top": min(ys), "left": min(xs), "bottom": max(ys), "right": max(xs)}
+
+
+def _local_points(elem) -> list[tuple[float, float]]:
+    """Точки контуру у власних координатах елемента: PathPointArray, інакше GeometricBounds."""
+    points = []
+    for pp in elem.iter():
+        if _local(pp.tag) == "PathPointType" and pp.attrib.get("Anchor"):
+            try:
+                x, y = (float(v) for v in pp.attrib["Anchor"].split())
+            except ValueError:
+                continue
+            points.append((x, y))
+    if points:
+        return points
+    gb = parse_bounds(elem.attrib.get("GeometricBounds", ""))
+    if gb:
+        return [(gb["left"], gb["top"]), (gb["right"], gb["top"]),
+                (gb["right"], gb["bottom"]), (gb["left"], gb["bottom"])]
+    return []
+
+
+def _properties(elem):
+    return next((c for c in elem if _local(c.tag) == "Properties"), None)
+
+
+def read_label(elem) -> str | None:
+    """Script label (item.label у compose.jsx): <Properties><Label><KeyValuePair Key="Label" Value=.../>."""
+    props = _properties(elem)
+    if props is None:
+        return None
+    for child in props:
+        if _local(child.tag) != "Label":
+            continue
+        for kv in child:
+            if _local(kv.tag) == "KeyValuePair" and kv.attrib.get("Key") == "Label":
+                return kv.attrib.get("Value") or None
+    return None
+
+
+def _is_graphic_frame(elem) -> bool:
+    if _local(elem.tag) not in GRAPHIC_FRAMES:
+        return False
+    if elem.attrib.get("ContentType") == "GraphicType":
+        return True
+    return any(_local(c.tag) in GRAPHIC_CONTENT for c in elem)
+
+
+# ==========================
+# SPREAD PARSING
+# ==========================
+def _collect_items(elem, parent: tuple, out: list[dict]):
+    """Фото- і текстові фрейми піддерева з бокс-ом у координатах spread; групи розгортаються."""
+    if elem.attrib.get("Visible") == "false":
+        return
+    tag = _local(elem.tag)
+    m = compose(parent, parse_transform(elem.attrib.get("ItemTransform")))
+
+    if tag == "Group":
+        for child in elem:
+            _collect_items(child, m, out)
+        return
+
+    if tag == "TextFrame":
+        kind = "text"
+    elif _is_graphic_frame(elem):
+        kind = "photo"
+    else:
+        return
+
+    box = _box([apply(m, x, y) for x, y in _local_points(elem)])
+    if box is None or box["right"] <= box["left"] or box["bottom"] <= box["top"]:
+        return
+    out.append({
+        "kind": kind,
+        "id": elem.attrib.get("Self"),
+        "label": read_label(elem),
+        "box": box,
+        "rotation": round(math.degrees(math.atan2(m[1], m[0])), 2),
+        "overrides": elem.attrib.get("OverriddenMasterPageItem"),
+    })
+
+
+def _overlap(a: dict, b: dict) -> float:
+    w = min(a["right"], b["right"]) - max(a["left"], b["left"])
+    h = min(a["bottom"], b["bottom"]) - max(a["top"], b["top"])
+    return w * h if w > 0 and h > 0 else 0.0
+
+
+def _slot(item: dict, page_box: dict, source: str) -> dict:
+    box = item["box"]
+    bounds = {
+        "top": round(box["top"] - page_box["top"], 3),
+        "left": round(box["left"] - page_box["left"], 3),
+        "bottom": round(box["bottom"] - page_box["top"], 3),
+        "right": round(box["right"] - page_box["left"], 3),
+    }
+    bounds["width"] = round(bounds["right"] - bounds["left"], 3)
+    bounds["height"] = round(bounds["bottom"] - bounds["top"], 3)
+    return {
+        "id": item["id"],
+        "label": item["label"],
+        "bounds": bounds,
+        "aspect": round(bounds["width"] / bounds["height"], 4),
+        "rotation": item["rotation"],
+        "source": source,
+    }
 
-    with zipfile.ZipFile(idml_path, 'r') as z:
-        for name in z.namelist():
-            if "Spreads/Spread" in name and name.endswith(".xml"):
-                xml_bytes = z.read(name)
-                root = ET.fromstring(xml_bytes)
-
-                spread_id = Path(name).stem
-
-                # Збираємо елементи сторінок
-                for page in root.findall(".//Page"):
-                    page_id = page.attrib.get("Self")
-                    page_bounds = parse_bounds(page.attrib.get("GeometricBounds", ""))
-
-                    photos = []
-                    texts = []
-
-                    # Фото-фрейми
-                    for rect in page.findall(".//Rectangle"):
-                        gb = rect.attrib.get("GeometricBounds")
-                        if not gb:
-                            continue
-                        bounds = parse_bounds(gb)
-
-                        # Перевіряємо чи в середині є <Image> або <Graphic>
-                        graphic = rect.find(".//Image")
-                        if graphic is None:
-                            graphic = rect.find(".//Graphic")
-
-                        if graphic is not None:
-                            label = rect.attrib.get("XMLContent") or \
-                                    (rect.find(".//Properties") is not None and rect.find(".//Properties").find("Label"))
-                            photos.append({
-                                "bounds": bounds,
-                                "label": label if isinstance(label, str) else None
-                            })
-
-                    # Текстові фрейми
-                    for tf in page.findall(".//TextFrame"):
-                        gb = tf.attrib.get("GeometricBounds")
-                        if not gb:
-                            continue
-                        bounds = parse_bounds(gb)
-
-                        label = tf.attrib.get("XMLContent") or None
-                        texts.append({
-                            "bounds": bounds,
-                            "label": label
-                        })
-
-                    pages_data.append({
-                        "page_id": page_id,
-                        "spread": spread_id,
-                        "bounds": page_bounds,
-                        "photo_slots": photos,
-                        "text_slots": texts
-                    })
 
+def parse_spread(stream, spread_id: str) -> list[dict]:
+    """
+    Сторінки одного Spread/MasterSpread XML з фреймами в координатах сторінки.
+    Page і фрейми в IDML — сусіди всередині <Spread>, тож фрейм належить сторінці,
+    з якою найбільше перетинається. Читається потоково: кожен дочірній елемент
+    spread звільняється одразу після обробки.
+    """
+    pages = []
+    items: list[dict] = []
+    stack: list[str] = []
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            stack.append(_local(elem.tag))
+            continue
+        stack.pop()
+        if not stack or stack[-1] not in ("Spread", "MasterSpread"):
+            continue
+
+        if _local(elem.tag) == "Page":
+            m = parse_transform(elem.attrib.get("ItemTransform"))
+            gb = parse_bounds(elem.attrib.get("GeometricBounds", ""))
+            corners = [(gb["left"], gb["top"]), (gb["right"], gb["bottom"])] if gb else []
+            pages.append({
+                "page_id": elem.attrib.get("Self"),
+                "name": elem.attrib.get("Name"),
+                "spread": spread_id,
+                "master": elem.attrib.get("AppliedMaster") or None,
+                "bounds": gb,
+                "box": _box([apply(m, x, y) for x, y in corners]),
+                "photo_slots": [],
+                "text_slots": [],
+            })
+        else:
+            _collect_items(elem, IDENTITY, items)
+        elem.clear()
+
+    for item in items:
+        best = max(
+            (p for p in pages if p["box"]),
+            key=lambda p: _overlap(item["box"], p["box"]),
+            default=None,
+        )
+        if best is None or _overlap(item["box"], best["box"]) == 0:
+            continue  # фрейм на монтажному столі
+        slot = _slot(item, best["box"], "page")
+        slot["overrides"] = item["overrides"]
+        best["photo_slots" if item["kind"] == "photo" else "text_slots"].append(slot)
+
+    return pages
+
+
+def apply_masters(pages: list[dict], masters: dict[str, list[dict]]) -> list[dict]:
+    """
+    Додає фрейми мастер-сторінок (AppliedMaster). Лівій сторінці розвороту відповідає
+    перша сторінка мастера, правій — остання; перевизначені на сторінці (OverriddenMasterPageItem)
+    або з тим самим label фрейми мастера не дублюються. Мастер на основі мастера теж враховується.
+    """
+    def master_page(page: dict) -> dict | None:
+        candidates = masters.get(page.get("master") or "")
+        if not candidates:
+            return None
+        left = page["box"] is not None and page["box"]["right"] <= 0  # лівіше корінця
+        return candidates[0] if left else candidates[-1]
+
+    def inherited(page: dict, depth: int = 0) -> tuple[list[dict], list[dict]]:
+        mp = master_page(page)
+        if mp is None or depth > 8:
+            return [], []
+        photo, text = inherited(mp, depth + 1)
+        return photo + mp["photo_slots"], text + mp["text_slots"]
+
+    for page in pages:
+        overridden = {s.get("overrides") for s in page["photo_slots"] + page["text_slots"]}
+        for key, extra in zip(("photo_slots", "text_slots"), inherited(page)):
+            labels = {s["label"] for s in page[key] if s["label"]}
+            for slot in extra:
+                if slot["id"] in overridden or (slot["label"] and slot["label"] in labels):
+                    continue
+                page[key].append(dict(slot, source="master"))
+    return pages
+
+
+def _finish(page: dict) -> dict:
+    """Службові поля геть, фрейми в порядку читання (зверху вниз, зліва направо)."""
+    page = {k: v for k, v in page.items() if k != "box"}
+    for key in ("photo_slots", "text_slots"):
+        page[key] = sorted(
+            ({k: v for k, v in s.items() if k != "overrides"} for s in page[key]),
+            key=lambda s: (round(s["bounds"]["top"]), s["bounds"]["left"]),
+        )
+    return page
+
+
+def zip_members(z: zipfile.ZipFile, prefix: str) -> dict[str, str]:
+    """XML-члени з prefix → підпис (CRC32 + розмір з каталогу zip, без розпакування)."""
+    return {
+        info.filename: f"{info.CRC:08x}:{info.file_size}"
+        for info in z.infolist()
+        if info.filename.startswith(prefix) and info.filename.endswith(".xml")
+    }
+
+
+def load_masters(z: zipfile.ZipFile, names) -> dict[str, list[dict]]:
+    """MasterSpread Self → його сторінки з фреймами."""
+    masters = {}
+    for name in names:
+        with z.open(name) as stream:
+            self_id = next(
+                (el.attrib.get("Self") for _, el in ET.iterparse(stream, events=("start",))
+                 if _local(el.tag) == "MasterSpread" and "Self" in el.attrib),  # не обгортка idPkg:
+                None,
+            )
+        with z.open(name) as stream:
+            pages = parse_spread(stream, Path(name).stem)
+        if self_id:
+            masters[self_id] = pages
+    return masters
+
+
+def spread_order(z: zipfile.ZipFile, members: dict[str, str]) -> list[str]:
+    """Порядок spreads з designmap.xml (порядок сторінок документа), інакше — як у zip."""
+    try:
+        root = ET.fromstring(z.read("designmap.xml"))
+    except (KeyError, ET.ParseError):
+        return [n for n in z.namelist() if n in members]
+    ordered = [
+        el.attrib["src"] for el in root
+        if _local(el.tag) == "Spread" and el.attrib.get("src") in members
+    ]
+    return ordered + [n for n in z.namelist() if n in members and n not in ordered]
+
+
+def _write_json(out_json: Path, data: dict) -> bool:
+    """Пише JSON лише якщо вміст змінився (mtime каталогу не смикається даремно)."""
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    if out_json.exists() and out_json.read_text(encoding="utf-8") == text:
+        return False
     out_json.parent.mkdir(parents=True, exist_ok=True)
-    out_json.write_text(json.dumps({
+    tmp = out_json.with_name(out_json.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, out_json)
+    return True
+
+
+def extract_idml(idml_path: Path, template_key: str, out_json: Path, previous: dict | None = None) -> dict:
+    """
+    Витягає layout одного IDML. previous — запис manifest з минулого запуску:
+    spreads з тим самим CRC не парсяться, їх сторінки беруться з попереднього out_json.
+    Повертає новий запис manifest.
+    """
+    started = time.perf_counter()
+    old_spreads = (previous or {}).get("spreads", {})
+
+    old_pages: dict[str, list[dict]] = {}
+    if old_spreads and out_json.exists():
+        for page in json.loads(out_json.read_text(encoding="utf-8")).get("pages", []):
+            old_pages.setdefault(page.get("spread"), []).append(page)
+
+    pages_data = []
+    parsed = 0
+    with zipfile.ZipFile(idml_path, 'r') as z:
+        members = zip_members(z, "Spreads/")
+        master_members = zip_members(z, "MasterSpreads/")
+        if (previous or {}).get("masters") != master_members:
+            old_pages = {}  # змінився мастер — змінились і сторінки, що на ньому базуються
+        masters = None
+
+        for name in spread_order(z, members):
+            spread_id = Path(name).stem
+            if old_spreads.get(name) == members[name] and spread_id in old_pages:
+                pages_data.extend(old_pages[spread_id])
+                continue
+            if masters is None:
+                masters = load_masters(z, master_members)
+            with z.open(name) as stream:
+                pages = apply_masters(parse_spread(stream, spread_id), masters)
+            pages_data.extend(_finish(page) for page in pages)
+            parsed += 1
+
+    written = _write_json(out_json, {"template": template_key, "pages": pages_data})
+
+    st = idml_path.stat()
+    return {
         "template": template_key,
-        "pages": pages_data
-    }, indent=2, ensure_ascii=False), encoding="utf-8")
+        "out": out_json.name,
+        "bytes": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": file_sha256(idml_path),
+        "spreads": members,
+        "masters": master_members,
+        "parsed_spreads": parsed,
+        "written": written,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
 
-    print(f"[OK] Saved: {out_json}")
 
+def _extract_job(args: tuple) -> tuple[str, dict]:
+    rel, idml_path, template_key, out_json, previous = args
+    return rel, extract_idml(Path(idml_path), template_key, Path(out_json), previous)
 
-def extract_all():
-    base = Path("data/templates")
-    idml_files = list(base.rglob("*.idml"))
+
+def load_manifest(path: Path = MANIFEST_PATH) -> dict:
+    if path.exists():
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") == MANIFEST_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+    return {"version": MANIFEST_VERSION, "templates": {}}
+
+
+def extract_all(force: bool = False, workers: int | None = None, base: Path = TEMPLATES_DIR,
+                layouts_dir: Path = LAYOUTS_DIR) -> dict:
+    idml_files = sorted(base.rglob("*.idml"))
+    manifest_path = layouts_dir.parent / MANIFEST_PATH.name
+    legacy_path = layouts_dir / LEGACY_MANIFEST
+    if legacy_path.exists():
+        if not manifest_path.exists():
+            legacy_path.replace(manifest_path)
+        else:
+            legacy_path.unlink()
+    manifest = load_manifest(manifest_path)
+    known = manifest["templates"]
 
     print(f"Знайдено IDML файлів: {len(idml_files)}")
 
+    todo = []
+    entries = {}
     for fp in idml_files:
         # обрізаємо шлях: templates\<theme>\<category>\*.idml
         rel = fp.relative_to(base)
@@ -120,10 +450,39 @@ def extract_all():
         category = rel.parts[1]
 
         template_key = f"{theme}/{category}"
+        rel_key = rel.as_posix()
+
+        out_file = layouts_dir / f"{theme}_{category}.json"
+
+        previous = None if force else known.get(rel_key)
+        if previous and previous.get("out") == out_file.name and out_file.exists():
+            st = fp.stat()
+            if previous["bytes"] == st.st_size and previous["mtime_ns"] == st.st_mtime_ns:
+                entries[rel_key] = previous
+                continue
+            if previous["sha256"] == file_sha256(fp):  # торкнулись, але вміст той самий
+                entries[rel_key] = dict(previous, mtime_ns=st.st_mtime_ns)
+                continue
+
+        todo.append((rel_key, str(fp), template_key, str(out_file), previous))
+
+    print(f"Без змін: {len(entries)}, до обробки: {len(todo)}")
+
+    if len(todo) > 1 and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_extract_job, todo))
+    else:
+        results = [_extract_job(job) for job in todo]
 
-        out_file = Path("data/layouts") / f"{theme}_{category}.json"
+    for rel_key, entry in results:
+        entries[rel_key] = entry
+        status = "OK" if entry["written"] else "unchanged"
+        print(f"[{status}] {entry['out']}: {entry['parsed_spreads']}/{len(entry['spreads'])} spreads "
+              f"parsed in {entry['seconds']:.2f}s")
 
-        extract_idml(fp, template_key, out_file)
+    manifest = {"version": MANIFEST_VERSION, "templates": entries}
+    _write_json(manifest_path, manifest)
+    return manifest
 
 
 if __name__ == "__main__":
@@ -132,10 +491,12 @@ if __name__ == "__main__":
     parser.add_argument("--template")
     parser.add_argument("--out")
     parser.add_argument("--all", action="store_true")
+    parser.add_argument("--force", action="store_true", help="ігнорувати manifest і перепарсити все")
+    parser.add_argument("--workers", type=int, default=None)
     args = parser.parse_args()
 
     if args.all:
-        extract_all()
+        extract_all(force=args.force, workers=args.workers)
     else:
         if not args.idml or not args.template:
             print("Використання:\n"
@@ -144,3 +505,4 @@ if __name__ == "__main__":
 
         out = Path(args.out) if args.out else Path("layout.json")
         extract_idml(Path(args.idml), args.template, out)
+        print(f"[OK] Saved: {out}")
@@ -0,0 +1,155 @@
+"""
+Швидке читання розмірів фото тільки із заголовків (без декодування):
+- JPEG: SOFn + EXIF Orientation (APP1)
+- PNG : IHDR
+- TIFF: IFD0 (ImageWidth / ImageLength / Orientation)
+
+Для решти форматів read_image_header повертає None, а read_image_size
+падає назад на Pillow.
+"""
+
+import struct
+from pathlib import Path
+
+# EXIF Orientation 5..8 — кадр повернутий на 90°, ширина/висота міняються місцями
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_TAG_WIDTH = 0x0100
+_TAG_HEIGHT = 0x0101
+_TAG_ORIENTATION = 0x0112
+
+
+def _tiff_tags(data: bytes, wanted: set[int]) -> dict[int, int]:
+    """Читає числові теги з IFD0 TIFF-структури (TIFF-файл або EXIF-блок)."""
+    if len(data) < 8:
+        return {}
+    if data[:2] == b"II":
+        endian = "<"
+    elif data[:2] == b"MM":
+        endian = ">"
+    else:
+        return {}
+
+    (ifd_offset,) = struct.unpack_from(endian + "I", data, 4)
+    if ifd_offset + 2 > len(data):
+        return {}
+    (count,) = struct.unpack_from(endian + "H", data, ifd_offset)
+
+    tags = {}
+    for n in range(count):
+        entry = ifd_offset + 2 + n * 12
+        if entry + 12 > len(data):
+            break
+        tag, typ, _cnt = struct.unpack_from(endian + "HHI", data, entry)
+        if tag not in wanted:
+            continue
+        if typ == 3:    # SHORT
+            (value,) = struct.unpack_from(endian + "H", data, entry + 8)
+        elif typ == 4:  # LONG
+            (value,) = struct.unpack_from(endian + "I", data, entry + 8)
+        else:
+            continue
+        tags[tag] = value
+    return tags
+
+
+def _read_jpeg(f) -> tuple[int, int, int] | None:
+    orientation = 1
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # маркери без довжини
+        if marker == 0xD9:
+            return None
+
+        raw_len = f.read(2)
+        if len(raw_len) < 2:
+            return None
+        (length,) = struct.unpack(">H", raw_len)
+
+        if marker == 0xE1 and orientation == 1:
+            segment = f.read(length - 2)
+            if segment[:6] == b"Exif\x00\x00":
+                orientation = _tiff_tags(segment[6:], {_TAG_ORIENTATION}).get(_TAG_ORIENTATION, 1)
+        elif marker in _SOF_MARKERS:
+            segment = f.read(5)
+            if len(segment) < 5:
+                return None
+            height, width = struct.unpack(">HH", segment[1:5])
+            return width, height, orientation
+        else:
+            f.seek(length - 2, 1)
+
+
+def _read_png(f) -> tuple[int, int, int] | None:
+    f.seek(8)
+    chunk = f.read(16)
+    if len(chunk) < 16 or chunk[4:8] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", chunk[8:16])
+    return width, height, 1
+
+
+def _read_tiff(f) -> tuple[int, int, int] | None:
+    # IFD0 зазвичай на початку файлу; 64 КБ вистачає з запасом
+    data = f.read(65536)
+    tags = _tiff_tags(data, {_TAG_WIDTH, _TAG_HEIGHT, _TAG_ORIENTATION})
+    if _TAG_WIDTH not in tags or _TAG_HEIGHT not in tags:
+        return None
+    return tags[_TAG_WIDTH], tags[_TAG_HEIGHT], tags.get(_TAG_ORIENTATION, 1)
+
+
+def read_image_header(path: Path) -> tuple[int, int, int] | None:
+    """(width, height, exif_orientation) як записано у файлі, або None."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(8)
+            if head[:2] == b"\xff\xd8":
+                return _read_jpeg(f)
+            if head == b"\x89PNG\r\n\x1a\n":
+                return _read_png(f)
+            if head[:4] in (b"II*\x00", b"MM\x00*"):
+                f.seek(0)
+                return _read_tiff(f)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def display_size(width: int, height: int, orientation: int) -> tuple[int, int]:
+    """Розмір з урахуванням EXIF-повороту (як фото побачить людина)."""
+    if orientation in ROTATED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+
+def read_image_size(path: Path) -> tuple[int, int, int]:
+    """(width, height, exif_orientation): заголовок, а для дивних форматів — Pillow."""
+    header = read_image_header(path)
+    if header:
+        return header
+
+    from PIL import Image
+    with Image.open(path) as img:
+        w, h = img.size
+        orientation = img.getexif().get(_TAG_ORIENTATION, 1)
+    return w, h, orientation
+
+
+def classify_orientation(width: int, height: int) -> str:
+    ratio = height / width if width else 1
+    if ratio > 1.2:
+        return "vertical"
+    if ratio < 0.8:
+        return "horizontal"
+    return "square"
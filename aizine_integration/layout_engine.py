@@ -1,87 +1,250 @@
-import json
-from pathlib import Path
+"""
+Layout-aware placement engine.
+
+Розкладає фото по слотах шаблону так, щоб сумарна обрізка була мінімальною:
+- геометрія слотів береться з data/layouts/<theme>_<category>.json (idml_to_layouts) через catalog
+- якщо у шаблону немає photo_slots — будуємо віртуальну сітку (кілька фото на сторінку),
+  тож 50 фото не вимагають 50 сторінок
+- обкладинка і задня сторінка заповнюються завжди (найкраще за формою фото),
+  внутрішні слоти — оптимальним призначенням по аспекту (DP по відсортованих аспектах, O(n·m))
+- rng (seed job) розв'язує нічиї: однаковий seed → однаковий план
+"""
+
+import logging
+import math
 import random
+from dataclasses import dataclass
+from pathlib import Path
 
-LAYOUTS_DIR = Path("data/layouts")
-
-
-def load_all_layouts():
-    layouts = {}
-    for file in LAYOUTS_DIR.glob("*.json"):
-        with file.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-        layouts[file.stem] = data
-    return layouts
-
-
-def choose_layouts(theme: str, pages_count: int, photos_count: int):
-    """Вибирає сторінки з JSON-Layout файлів автоматично"""
-
-    layouts = load_all_layouts()
-
-    # фільтруємо по темі
-    items = [l for name, l in layouts.items() if name.startswith(theme)]
-    if not items:
-        raise ValueError(f"No layouts found for theme '{theme}'")
-
-    chosen = []
-    remaining_photos = photos_count
-
-    # обираємо COVER
-    cover = [p for p in items[0]["pages"] if "cover" in p["type"].lower()]
-    if cover:
-        chosen.append(cover[0])
-        if "photo_slots" in cover[0]:
-            remaining_photos -= len(cover[0]["photo_slots"])
-
-    # обираємо інші сторінки
-    pool = items[0]["pages"]
-
-    for p in pool:
-        if len(chosen) >= pages_count:
-            break
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPLATES_DIR = BASE_DIR / "data" / "templates"
 
-        # не додаємо 2-гу обкладинку
-        if "cover" in p["type"].lower():
-            continue
+logger = logging.getLogger(__name__)
 
-        chosen.append(p)
+# Сторінка за замовчуванням (pt), як у шаблонах 623.6×822
+PAGE_SIZE = (623.6, 822.0)
 
-        if "photo_slots" in p:
-            remaining_photos -= len(p["photo_slots"])
 
-        if remaining_photos <= 0:
-            break
+@dataclass(frozen=True)
+class Slot:
+    label: str
+    page: int       # 0 = обкладинка
+    width: float
+    height: float
 
-    return chosen
+    @property
+    def aspect(self) -> float:
+        return self.width / self.height if self.height else 1.0
 
 
-def build_page_plan(selected_pages, photos):
-    plan = []
-    photo_index = 0
+def crop_loss(photo_aspect: float, slot_aspect: float) -> float:
+    """Частка площі фото, яку обріже FILL_PROPORTIONALLY."""
+    return 1.0 - min(photo_aspect, slot_aspect) / max(photo_aspect, slot_aspect)
 
-    for page in selected_pages:
-        page_item = {
-            "page_id": page["id"],
-            "type": page["type"],
-            "images": [],
-            "texts": [],
-        }
 
-        # вставляємо фото
-        for slot in page.get("photo_slots", []):
-            if photo_index >= len(photos):
+def _cost(photo_aspect: float, slot_aspect: float) -> float:
+    # Квадрат log-різниці: монотонний з crop_loss і опуклий — тому сортоване призначення оптимальне
+    return math.log(photo_aspect / slot_aspect) ** 2
+
+
+def photo_aspect(photo: dict) -> float:
+    w, h = photo.get("width"), photo.get("height")
+    return w / h if w and h else 1.0
+
+
+# ==========================
+# SLOT SOURCES
+# ==========================
+def grid_shape(count: int) -> tuple[int, int]:
+    """(cols, rows) сітки для count фото на сторінці: 2 — одне під одним, далі 2 колонки."""
+    if count <= 2:
+        return 1, max(1, count)
+    return 2, -(-count // 2)
+
+
+def page_label(page: int, n: int, last_page: int) -> str:
+    if page == 0:
+        return "COVER_IMAGE" if n == 1 else f"COVER_IMAGE_{n:02d}"
+    if page == last_page:
+        return "BACK_IMAGE" if n == 1 else f"BACK_IMAGE_{n:02d}"
+    return f"PAGE_{page:02d}_IMG_{n:02d}"
+
+
+def template_key(template_path: Path) -> str | None:
+    """data/templates/<theme>/<category>/x.indd → "<theme>/<category>" (ключ у layouts JSON)."""
+    try:
+        parts = Path(template_path).resolve().relative_to(TEMPLATES_DIR.resolve()).parts
+    except ValueError:
+        return None
+    return "/".join(parts[:2]) if len(parts) >= 3 else None
+
+
+def load_layout(template_path: Path) -> list[list[Slot]] | None:
+    """Слоти по сторінках шаблону (зі скомпільованого каталогу) або None, якщо геометрії немає."""
+    from aizine_integration.catalog import get_catalog  # catalog імпортує Slot звідси
+
+    key = template_key(template_path)
+    return get_catalog().layout_for(key) if key else None
+
+
+def pages_for_photos(photo_count: int, max_per_page: int = 4) -> int:
+    """Мінімум сторінок: обкладинка + задня по 1 фото, всередині до max_per_page; парне, ≥ 4."""
+    inner = max(0, photo_count - 2)
+    total = 2 + -(-inner // max(1, max_per_page))
+    total = max(total, 4)
+    return total + total % 2
+
+
+def grid_slots(pages: int, photo_count: int, rng: random.Random, page_size=PAGE_SIZE) -> list[list[Slot]]:
+    """Віртуальні слоти: фото рівномірно по внутрішніх сторінках, зайві — на випадкові сторінки."""
+    last_page = pages - 1
+    inner_pages = pages - 2
+    inner_photos = max(0, photo_count - 2)
+
+    counts = [0] * inner_pages
+    if inner_pages:
+        if inner_photos <= inner_pages:
+            counts[:inner_photos] = [1] * inner_photos
+        else:
+            base, extra = divmod(inner_photos, inner_pages)
+            counts = [base] * inner_pages
+            for i in rng.sample(range(inner_pages), extra):
+                counts[i] += 1
+
+    w, h = page_size
+    layout: list[list[Slot]] = [[Slot(page_label(0, 1, last_page), 0, w, h)]]
+    for i, count in enumerate(counts, start=1):
+        cols, rows = grid_shape(count)
+        layout.append([Slot(page_label(i, n, last_page), i, w / cols, h / rows) for n in range(1, count + 1)])
+    layout.append([Slot(page_label(last_page, 1, last_page), last_page, w, h)])
+    return layout
+
+
+# ==========================
+# ASSIGNMENT
+# ==========================
+def assign(photo_aspects: list[float], slot_aspects: list[float]) -> list[tuple[int, int]]:
+    """
+    Оптимальне призначення фото → слот (мінімум сумарної _cost), кожен елемент меншої
+    множини отримує пару. Для опуклої функції від різниці log-аспектів оптимальне
+    призначення зберігає порядок сортування, тож достатньо DP O(n·m) замість Угорського алгоритму.
+    Повертає пари (індекс фото, індекс слота).
+    """
+    swap = len(photo_aspects) > len(slot_aspects)
+    small, large = (slot_aspects, photo_aspects) if swap else (photo_aspects, slot_aspects)
+    n, m = len(small), len(large)
+    if n == 0:
+        return []
+
+    si = sorted(range(n), key=lambda i: small[i])
+    li = sorted(range(m), key=lambda j: large[j])
+    xs = [small[i] for i in si]
+    ys = [large[j] for j in li]
+
+    inf = float("inf")
+    # dp[i][j] — мінімальна вартість для перших i елементів small серед перших j елементів large
+    dp = [[0.0] * (m + 1)] + [[inf] * (m + 1) for _ in range(n)]
+    for i in range(1, n + 1):
+        row, prev = dp[i], dp[i - 1]
+        x = xs[i - 1]
+        for j in range(i, m - (n - i) + 1):
+            take = prev[j - 1] + _cost(x, ys[j - 1])
+            row[j] = take if take < row[j - 1] else row[j - 1]
+
+    pairs = []
+    i, j = n, m
+    while i > 0:
+        if dp[i][j] == dp[i][j - 1] and j > i:
+            j -= 1
+        else:
+            pairs.append((si[i - 1], li[j - 1]))
+            i, j = i - 1, j - 1
+
+    return [(b, a) for a, b in pairs] if swap else pairs
+
+
+def plan_placements(
+    photos: list[dict],
+    pages: int,
+    rng: random.Random,
+    template_path: Path | None = None,
+    max_per_page: int = 4,
+) -> tuple[list[dict], int]:
+    """
+    Повертає (placements, pages): pages завжди парне і не менше вибраного, кожне фото має слот.
+    Геометрія шаблону, якщо вона є і вміщує всі фото, інакше віртуальна сітка.
+    Кожен placement: label, page (1-based), photo, filename, orientation, fit, crop_loss.
+    """
+    if not photos:
+        return [], max(pages, 4)
+
+    layout = load_layout(template_path) if template_path else None
+    if layout is not None:
+        # Найкоротший парний префікс сторінок шаблону (не менше вибраного), у який влазять усі фото
+        capacity, fit = 0, None
+        for idx, page_slots in enumerate(layout):
+            capacity += len(page_slots)
+            if idx + 1 >= pages and (idx + 1) % 2 == 0 and capacity >= len(photos):
+                fit = idx + 1
                 break
-            page_item["images"].append({
-                "file": photos[photo_index],
-                "slot": slot
-            })
-            photo_index += 1
-
-        # текстові поля
-        for slot in page.get("text_slots", []):
-            page_item["texts"].append(slot)
-
-        plan.append(page_item)
-
-    return plan
+        if fit is None:
+            # Шаблон закороткий або замалий — фото не губимо, а беремо віртуальну сітку
+            logger.warning(
+                "Template %s: %s pages / %s slots can't hold %s photos on %s+ even pages, using grid",
+                template_path, len(layout), capacity, len(photos), pages,
+            )
+            layout = None
+        else:
+            pages = fit
+            layout = layout[:pages]
+    if layout is None:
+        pages = max(pages, pages_for_photos(len(photos), max_per_page))
+        pages += pages % 2
+        layout = grid_slots(pages, len(photos), rng)
+
+    # Нічиї між однаковими аспектами розв'язує seed
+    order = list(range(len(photos)))
+    rng.shuffle(order)
+    pool = [photos[i] for i in order]
+    aspects = [photo_aspect(p) for p in pool]
+
+    slots = [slot for page_slots in layout for slot in page_slots]
+    chosen: dict[int, int] = {}  # індекс слота → індекс фото в pool
+
+    # Обкладинка і задня — завжди з фото, найкращим для першого слота цих сторінок
+    for page in {0, pages - 1}:
+        first = next((k for k, slot in enumerate(slots) if slot.page == page), None)
+        free = [i for i in range(len(pool)) if i not in chosen.values()]
+        if first is not None and free:
+            chosen[first] = min(free, key=lambda i: _cost(aspects[i], slots[first].aspect))
+
+    rest_slots = [k for k in range(len(slots)) if k not in chosen]
+    rest_photos = [i for i in range(len(pool)) if i not in chosen.values()]
+    pairs = assign([aspects[i] for i in rest_photos], [slots[k].aspect for k in rest_slots])
+    for pi, si in pairs:
+        chosen[rest_slots[si]] = rest_photos[pi]
+
+    # Слоти однакової форми взаємозамінні — перемішуємо фото між ними, щоб журнал
+    # не йшов від найвужчого фото до найширшого
+    groups: dict[tuple[float, float], list[int]] = {}
+    for k in chosen:
+        if 0 < slots[k].page < pages - 1:
+            groups.setdefault((round(slots[k].width, 1), round(slots[k].height, 1)), []).append(k)
+    for group in groups.values():
+        picked = [chosen[k] for k in group]
+        rng.shuffle(picked)
+        chosen.update(zip(group, picked))
+
+    placements = []
+    for k in sorted(chosen):
+        slot, photo = slots[k], pool[chosen[k]]
+        placements.append({
+            "label": slot.label,
+            "page": slot.page + 1,
+            "photo": photo["path"],
+            "filename": photo["filename"],
+            "orientation": photo.get("orientation", "unknown"),
+            "fit": "fill",
+            "crop_loss": round(crop_loss(aspects[chosen[k]], slot.aspect), 3),
+        })
+    return placements, pages
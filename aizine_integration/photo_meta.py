@@ -0,0 +1,142 @@
+"""
+Метадані фото, які рахуються ще під час завантаження (bot.save_photo),
+щоб build_plan на «✅ Досить, далі» лише читав готовий індекс.
+
+Індекс: jobs/<id>/meta/photos_index.json
+    {"version": 1, "photos": {"<filename>": {...meta...}}}
+
+meta: bytes, sha256, width, height, exif_orientation, orientation,
+      dominant_color ("#rrggbb"), sharpness (дисперсія країв, більше = різкіше)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import weakref
+from pathlib import Path
+
+from aizine_integration.image_header import classify_orientation, display_size, read_image_size
+
+INDEX_NAME = "photos_index.json"
+INDEX_VERSION = 1
+THUMB_SIZE = (256, 256)
+
+# Weak: lock індексу живе, поки його тримає хоч один потік — записи jobs не накопичуються
+_locks: weakref.WeakValueDictionary[Path, threading.Lock] = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+
+
+def _index_lock(index_path: Path) -> threading.Lock:
+    with _locks_guard:
+        lock = _locks.get(index_path)
+        if lock is None:
+            lock = _locks[index_path] = threading.Lock()
+        return lock
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _pixel_stats(path: Path) -> dict:
+    """Домінантний колір і різкість по зменшеній копії (JPEG draft — без повного декоду)."""
+    from PIL import Image, ImageFilter, ImageOps, ImageStat
+
+    with Image.open(path) as img:
+        img.draft("RGB", THUMB_SIZE)
+        thumb = ImageOps.exif_transpose(img.convert("RGB"))
+        thumb.thumbnail(THUMB_SIZE)
+
+    small = thumb.quantize(colors=8)
+    palette = small.getpalette()
+    count, idx = max(small.getcolors())
+    r, g, b = palette[idx * 3: idx * 3 + 3]
+
+    edges = thumb.convert("L").filter(ImageFilter.FIND_EDGES)
+    sharpness = ImageStat.Stat(edges).var[0]
+
+    return {
+        "dominant_color": f"#{r:02x}{g:02x}{b:02x}",
+        "sharpness": round(sharpness, 1),
+    }
+
+
+def compute_photo_meta(path: Path, sha256: str | None = None) -> dict:
+    """Повний аналіз одного фото."""
+    header = read_image_size(path)
+    w, h = display_size(*header)
+    meta = {
+        "bytes": path.stat().st_size,
+        "sha256": sha256 or file_sha256(path),
+        "width": w,
+        "height": h,
+        "exif_orientation": header[2],
+        "orientation": classify_orientation(w, h),
+    }
+    try:
+        meta.update(_pixel_stats(path))
+    except Exception:
+        pass
+    return meta
+
+
+def load_index(meta_dir: Path) -> dict[str, dict]:
+    """filename → meta (порожній dict, якщо індексу немає або він іншої версії)."""
+    index_path = meta_dir / INDEX_NAME
+    try:
+        data = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != INDEX_VERSION:
+        return {}
+    return data.get("photos", {})
+
+
+def _write_index(index_path: Path, photos: dict[str, dict]):
+    tmp = index_path.with_suffix(".tmp")
+    tmp.write_text(
+        json.dumps({"version": INDEX_VERSION, "photos": photos}, ensure_ascii=False, indent=1),
+        encoding="utf-8",
+    )
+    os.replace(tmp, index_path)
+
+
+def index_photo(
+    meta_dir: Path,
+    photo_path: Path,
+    sha256: str | None = None,
+    known_meta: dict | None = None,
+) -> tuple[dict, bool]:
+    """
+    Рахує метадані фото і додає в індекс job.
+    Повертає (meta, cache_hit): однакове фото (той самий sha256) не аналізується вдруге.
+    known_meta — вже пораховані метадані цього вмісту (напр. з PhotoStore іншого job).
+    """
+    sha256 = sha256 or file_sha256(photo_path)
+    index_path = meta_dir / INDEX_NAME
+
+    with _index_lock(index_path):
+        photos = load_index(meta_dir)
+        cached = next((m for m in photos.values() if m.get("sha256") == sha256), None) or known_meta
+
+    if cached:
+        meta, cache_hit = dict(cached), True
+    else:
+        try:
+            meta = compute_photo_meta(photo_path, sha256)
+        except Exception:
+            # Фото все одно має потрапити в індекс (це реєстр фото job); розміри добере build_plan
+            meta = {"bytes": photo_path.stat().st_size, "sha256": sha256}
+        cache_hit = False
+
+    with _index_lock(index_path):
+        photos = load_index(meta_dir)
+        photos[photo_path.name] = meta
+        _write_index(index_path, photos)
+
+    return meta, cache_hit
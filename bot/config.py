@@ -21,6 +21,11 @@ class Config:
     # Telegram
     bot_token: str = os.getenv("BOT_TOKEN", "")
     admin_chat_id: int = int(os.getenv("ADMIN_CHAT_ID", "0"))
+    telegram_api_server: str = os.getenv("TELEGRAM_API_SERVER", "")  # локальний/фейковий Bot API (бенчмарки)
+
+    # Outbound: ліміти Telegram на відправку
+    send_global_rate: float = float(os.getenv("SEND_GLOBAL_RATE", "30"))  # повідомлень/с на бота
+    send_chat_rate: float = float(os.getenv("SEND_CHAT_RATE", "1"))       # повідомлень/с в один чат
 
     # InDesign
     indesign_path: str = os.getenv(
@@ -28,6 +33,17 @@ class Config:
         r"C:\Program Files\Adobe\Adobe InDesign 2024\InDesign.exe",
     )
 
+    # Renderer: com (InDesign Desktop) / socket (render host) / stub (Pillow, без InDesign)
+    renderer: str = os.getenv("RENDERER", "com")
+    renderer_host: str = os.getenv("RENDERER_HOST", "127.0.0.1")
+    renderer_port: int = int(os.getenv("RENDERER_PORT", "18383"))
+
+    # Warm sessions (RENDERER=session): indesign або stand-in бекенд (stub)
+    renderer_session_host: str = os.getenv("RENDERER_SESSION_HOST", "indesign")
+    renderer_pool_size: int = int(os.getenv("RENDERER_POOL_SIZE", "1"))
+    renderer_max_jobs: int = int(os.getenv("RENDERER_MAX_JOBS", "20"))              # перезапуск після N job
+    renderer_max_rss_growth_mb: int = int(os.getenv("RENDERER_MAX_RSS_GROWTH_MB", "0"))  # 0 = не стежити
+
     # Paths
     base_dir: Path = Path(__file__).parent.parent
     templates_dir: Path = Path(os.getenv("TEMPLATES_DIR", "")) or base_dir / "data" / "templates"
@@ -36,11 +52,35 @@ class Config:
 
     # Limits
     max_photos: int = int(os.getenv("MAX_PHOTOS", "50"))
-    generation_timeout: int = int(os.getenv("GENERATION_TIMEOUT", "300"))
+    download_concurrency: int = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))  # паралельних завантажень фото
+    generation_timeout: int = int(os.getenv("GENERATION_TIMEOUT", "300"))  # дедлайн рендеру, секунд
+    job_timeout: int = int(os.getenv("JOB_TIMEOUT", "900"))                # весь пайплайн job (watchdog)
+
+    # FSM storage: sqlite (переживає рестарт) або memory
+    fsm_storage: str = os.getenv("FSM_STORAGE", "sqlite")
+    fsm_flush_interval: float = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))  # write-behind, секунд
+
+    # Render cache: бюджет диска на готові результати (0 = вимкнено)
+    render_cache_mb: int = int(os.getenv("RENDER_CACHE_MB", "2048"))
+
+    # Preview: процеси для растеризації розворотів
+    preview_workers: int = int(os.getenv("PREVIEW_WORKERS", str(min(4, os.cpu_count() or 1))))
+    preview_dpi: int = int(os.getenv("PREVIEW_DPI", "150"))
+
+    # output/magazine.zip (пакується паралельно з превью; 0 = не створювати)
+    make_zip: bool = os.getenv("MAKE_ZIP", "1") != "0"
+
+    # Queue / workers
+    queue_workers: int = int(os.getenv("QUEUE_WORKERS", "2"))            # паралельних job у пайплайні
+    render_concurrency: int = int(os.getenv("RENDER_CONCURRENCY", "1"))  # одночасних сесій InDesign
+    queue_max_attempts: int = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))  # спроб job, перерваних рестартом
 
     # Logging
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
 
+    # Метрики етапів (Prometheus textfile); порожньо = jobs/_metrics/magazinebot.prom
+    metrics_file: str = os.getenv("METRICS_FILE", "")
+
     def __post_init__(self):
         """Створюємо папки якщо не існують"""
         self.jobs_dir.mkdir(parents=True, exist_ok=True)
@@ -56,7 +96,7 @@ class Config:
         if not self.admin_chat_id:
             errors.append("ADMIN_CHAT_ID не встановлено")
 
-        if not Path(self.indesign_path).exists():
+        if self.renderer in ("com", "session") and not Path(self.indesign_path).exists():
             errors.append(f"InDesign не знайдено: {self.indesign_path}")
 
         return errors
@@ -138,6 +178,11 @@ MESSAGES = {
         "Спробуй ще раз або напиши адміну."
     ),
     "cancelled": "❌ Замовлення скасовано.",
+    "job_interrupted": (
+        "😔 Не вдалося згенерувати журнал: генерацію кілька разів перервав перезапуск.\n\n"
+        "Натисни /start, щоб спробувати ще раз, або напиши адміну."
+    ),
+    "still_processing": "⏳ Журнал ще генерується — зачекай на результат, потім можна перемішати.",
     "admin_new_order": (
         "🆕 Нове замовлення!\n\n"
         "ID: `{job_id}`\n"
@@ -0,0 +1,150 @@
+# bot/delivery_cache.py
+# Кеш доставки: sha256 артефакту (PDF, INDD, JPEG розвороту) → file_id, який повернув Telegram.
+# Повторна відправка того ж вмісту (/resend, адмін, повторне замовлення з тим самим результатом)
+# іде по file_id без upload. Перегенерація job скидає його записи (evict_job).
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+
+from aizine_integration.photo_meta import file_sha256
+from bot.sender import OutboundSender
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path        TEXT PRIMARY KEY,
+    job_id      TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    file_id     TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_sha ON artifacts (sha256, kind);
+CREATE INDEX IF NOT EXISTS artifacts_job ON artifacts (job_id);
+CREATE TABLE IF NOT EXISTS deliveries (
+    chat_id       INTEGER NOT NULL,
+    job_id        TEXT NOT NULL,
+    delivered_at  REAL NOT NULL,
+    PRIMARY KEY (chat_id, job_id)
+);
+"""
+
+DOCUMENT = "document"
+PHOTO = "photo"
+
+
+def _file_id(message: Message, kind: str) -> str | None:
+    if kind == DOCUMENT and message.document:
+        return message.document.file_id
+    if kind == PHOTO and message.photo:
+        return message.photo[-1].file_id
+    return None
+
+
+class DeliveryCache:
+    def __init__(self, db_path: Path):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ------------------------------------------------------------
+    def lookup(self, sha256: str, kind: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT file_id FROM artifacts WHERE sha256 = ? AND kind = ? ORDER BY updated_at DESC LIMIT 1",
+                (sha256, kind),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, path: Path, job_id: str, sha256: str, kind: str, file_id: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts (path, job_id, sha256, kind, file_id, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(path), job_id, sha256, kind, file_id, time.time()),
+            )
+
+    def forget_file_id(self, file_id: str):
+        """Telegram відхилив file_id (видалений бот/файл) — більше не пропонуємо його."""
+        with self._lock:
+            self._db.execute("DELETE FROM artifacts WHERE file_id = ?", (file_id,))
+
+    def evict_job(self, job_id: str) -> int:
+        """Артефакти job перегенеровуються — старі file_id до них більше не відносяться."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM artifacts WHERE job_id = ?", (job_id,))
+        return cur.rowcount
+
+    def record_delivery(self, chat_id: int, job_id: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO deliveries (chat_id, job_id, delivered_at) VALUES (?, ?, ?)",
+                (chat_id, job_id, time.time()),
+            )
+
+    def last_job(self, chat_id: int) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id FROM deliveries WHERE chat_id = ? ORDER BY delivered_at DESC LIMIT 1",
+                (chat_id,),
+            ).fetchone()
+        return row[0] if row else None
+
+    # ------------------------------------------------------------
+    async def send_document(self, sender: OutboundSender, chat_id: int, path: Path, job_id: str, **kwargs) -> Message:
+        """send_document по file_id, якщо такий вміст уже доставлявся; інакше upload і запам'ятовуємо."""
+        sha256 = await asyncio.to_thread(file_sha256, path)
+        file_id = self.lookup(sha256, DOCUMENT)
+        if file_id:
+            try:
+                return await sender.send_document(chat_id, file_id, **kwargs)
+            except TelegramBadRequest as e:
+                logger.warning("[DELIVERY] Cached file_id rejected for %s: %s", path.name, e)
+                self.forget_file_id(file_id)
+
+        msg = await sender.send_document(chat_id, FSInputFile(str(path)), **kwargs)
+        file_id = _file_id(msg, DOCUMENT)
+        if file_id:
+            self.record(path, job_id, sha256, DOCUMENT, file_id)
+        return msg
+
+    async def send_album(
+        self, sender: OutboundSender, chat_id: int, job_id: str, photos: list[tuple[Path, str]],
+    ) -> list[Message]:
+        """Альбом розворотів: вже доставлені JPEG — по file_id, решта — upload."""
+        hashes = await asyncio.to_thread(lambda: [file_sha256(path) for path, _ in photos])
+        cached = [self.lookup(sha256, PHOTO) for sha256 in hashes]
+        media = [
+            (file_id or FSInputFile(str(path)), caption)
+            for (path, caption), file_id in zip(photos, cached)
+        ]
+        try:
+            messages = await sender.send_album(chat_id, media)
+        except TelegramBadRequest as e:
+            if not any(cached):
+                raise
+            logger.warning("[DELIVERY] Cached album rejected, re-uploading: %s", e)
+            for file_id in filter(None, cached):
+                self.forget_file_id(file_id)
+            cached = [None] * len(photos)
+            messages = await sender.send_album(chat_id, [(FSInputFile(str(p)), c) for p, c in photos])
+
+        for (path, _), sha256, file_id, msg in zip(photos, hashes, cached, messages):
+            new_id = _file_id(msg, PHOTO)
+            if new_id and not file_id:
+                self.record(path, job_id, sha256, PHOTO, new_id)
+        return messages
@@ -0,0 +1,134 @@
+# bot/downloads.py
+# Планувальник завантаження фото: альбом качається паралельно (обмежено семафором),
+# а користувач бачить одне повідомлення прогресу, яке редагується на місці.
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from aiogram.types import ReplyKeyboardMarkup
+
+from bot.sender import OutboundSender
+
+logger = logging.getLogger(__name__)
+
+# job() → загальна кількість фото в замовленні після збереження, або None якщо фото пропущено
+DownloadJob = Callable[[], Awaitable[int | None]]
+
+
+@dataclass
+class _Batch:
+    """Одна "хвиля" фото від користувача (альбом або кілька швидких повідомлень)."""
+    chat_id: int
+    queued: int = 0
+    saved: int = 0
+    skipped: int = 0
+    failed: int = 0
+    total: int = 0
+    message_id: int | None = None
+    last_text: str = ""
+    flusher: asyncio.Task | None = None
+    tasks: set[asyncio.Task] = field(default_factory=set)
+
+    @property
+    def pending(self) -> int:
+        return self.queued - self.saved - self.skipped - self.failed
+
+
+class DownloadScheduler:
+    def __init__(
+        self,
+        sender: OutboundSender,
+        limit: int,
+        concurrency: int = 4,
+        debounce: float = 1.5,
+        reply_markup: ReplyKeyboardMarkup | None = None,
+    ):
+        self.sender = sender
+        self.limit = limit
+        self.debounce = debounce
+        self.reply_markup = reply_markup
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._batches: dict[int, _Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, chat_id: int, job: DownloadJob):
+        """Ставить завантаження в чергу і одразу повертає керування хендлеру."""
+        batch = self._batches.get(chat_id)
+        if batch is None:
+            batch = self._batches[chat_id] = _Batch(chat_id)
+        batch.queued += 1
+
+        task = asyncio.create_task(self._run(batch, job))
+        self._tasks.add(task)
+        batch.tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(batch.tasks.discard)
+
+        if batch.flusher is None:
+            batch.flusher = asyncio.create_task(self._flush_loop(batch))
+
+    async def wait(self, chat_id: int):
+        """Чекає, поки докачаються всі фото цього чату (перед переходом до вибору теми)."""
+        batch = self._batches.get(chat_id)
+        while batch is not None and batch.tasks:
+            await asyncio.gather(*batch.tasks, return_exceptions=True)
+
+    async def drain(self):
+        """Чекає завершення всіх завантажень і фінальних повідомлень прогресу."""
+        while self._tasks or any(b.flusher for b in self._batches.values()):
+            await asyncio.gather(*self._tasks, *(b.flusher for b in self._batches.values() if b.flusher),
+                                 return_exceptions=True)
+
+    async def _run(self, batch: _Batch, job: DownloadJob):
+        try:
+            async with self._sem:
+                total = await job()
+        except Exception:
+            logger.exception("[DL] Photo download failed (chat=%s)", batch.chat_id)
+            batch.failed += 1
+            return
+
+        if total is None:
+            batch.skipped += 1
+        else:
+            batch.saved += 1
+            batch.total = max(batch.total, total)
+
+    def _progress_text(self, batch: _Batch) -> str:
+        text = f"📸 Фото прийнято ({batch.total}/{self.limit})"
+        if batch.pending:
+            text += f"\n⏳ Завантажую ще {batch.pending}…"
+        if batch.skipped:
+            text += f"\n⚠️ Досягнуто ліміт {self.limit} фото, {batch.skipped} пропущено."
+        if batch.failed:
+            text += f"\n😔 Не вдалося завантажити: {batch.failed}"
+        return text
+
+    async def _flush_loop(self, batch: _Batch):
+        """Оновлює прогрес не частіше ніж раз на debounce секунд, поки хвиля не завершиться."""
+        try:
+            while True:
+                await asyncio.sleep(self.debounce)
+                finished = batch.pending == 0
+                await self._flush(batch)
+                if finished and batch.pending == 0:  # поки оновлювали, могли прийти нові фото
+                    break
+        finally:
+            batch.flusher = None
+            if self._batches.get(batch.chat_id) is batch and batch.pending == 0:
+                del self._batches[batch.chat_id]
+
+    async def _flush(self, batch: _Batch):
+        text = self._progress_text(batch)
+        if text == batch.last_text or not (batch.saved or batch.skipped or batch.failed):
+            return
+        try:
+            if batch.message_id is None:
+                msg = await self.sender.send_message(batch.chat_id, text, reply_markup=self.reply_markup)
+                batch.message_id = msg.message_id
+            else:
+                await self.sender.edit_message_text(text, chat_id=batch.chat_id, message_id=batch.message_id)
+            batch.last_text = text
+        except Exception as e:
+            logger.warning("[DL] Progress update failed (chat=%s): %s", batch.chat_id, e)
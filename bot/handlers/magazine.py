@@ -5,6 +5,7 @@
 
 import asyncio
 import json
+import threading
 import uuid
 import logging
 from pathlib import Path
@@ -12,10 +13,17 @@ from pathlib import Path
 from aiogram import Router, F
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery, FSInputFile
-
-from bot.config import settings
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.types import Message, CallbackQuery
+
+from bot.config import MESSAGES, settings
+from bot.delivery_cache import DeliveryCache
+from bot.downloads import DownloadScheduler
+from bot.photo_registry import PhotoRegistry
+from bot.preview import PreviewRasterizer
+from bot.sender import MEDIA_GROUP_LIMIT, OutboundSender
 from bot.states import MagazineFSM
+from bot.workers import RenderWorkerPool
 from bot.keyboards import (
     photos_done_kb,
     styles_kb,
@@ -23,11 +31,20 @@ from bot.keyboards import (
     for_her_themes_kb,
     adult18_themes_kb,
     pages_kb,
+    reshuffle_kb,
+    cancel_kb,
 )
 
+from orchestrator.job_queue import PENDING, PROCESSING, QueuedJob
+from orchestrator.photo_store import PhotoStore
+from orchestrator.render_cache import RenderCache
+from orchestrator.timings import NO_TIMER, StageMetrics, StageTimer, finish_timer, timer_for
+from orchestrator.watchdog import job_processes, supervise
+from aizine_integration.build_plan import build_plan, calculate_pages_for_photos
+from aizine_integration.photo_meta import index_photo
+from orchestrator.renderers import get_renderer
 from orchestrator.run_job import (
-    run_build_plan,
-    run_indesign,
+    plan_path,
     verify_output,
     make_zip,
 )
@@ -35,6 +52,47 @@ from orchestrator.run_job import (
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Скільки InDesign-сесій можуть працювати одночасно (решта чекає тут)
+_render_slots = threading.BoundedSemaphore(max(1, settings.render_concurrency))
+
+# Спільне content-addressed сховище фото (дедуплікація між jobs)
+photo_store = PhotoStore(settings.jobs_dir / "_store")
+
+# Хто з фото вже в замовленні (замість списку photos у FSM, який губив фото з альбомів)
+photo_registry = PhotoRegistry(settings.max_photos)
+
+# file_id уже доставлених PDF/INDD/розворотів — повторна відправка без upload
+delivery_cache = DeliveryCache(settings.jobs_dir / "delivery.sqlite3")
+
+# Пул процесів для растеризації превью (спільний для всіх замовлень)
+preview_rasterizer = PreviewRasterizer(workers=settings.preview_workers, dpi=settings.preview_dpi)
+
+# Гістограми етапів пайплайна (Prometheus textfile)
+stage_metrics = StageMetrics(settings.metrics_file or settings.jobs_dir / "_metrics" / "magazinebot.prom")
+
+renderer = get_renderer(
+    settings.renderer,
+    host=settings.renderer_host,
+    port=settings.renderer_port,
+    timeout=settings.generation_timeout,
+    session_host=settings.renderer_session_host,
+    pool_size=settings.renderer_pool_size,
+    max_jobs=settings.renderer_max_jobs,
+    max_rss_growth_mb=settings.renderer_max_rss_growth_mb,
+)
+
+# Готові рендери за digest плану (окремо для кожного рендерера: stub-PDF ≠ InDesign-PDF)
+render_cache = RenderCache(
+    settings.jobs_dir / "_render_cache" / renderer.name,
+    budget_bytes=settings.render_cache_mb * 1024 * 1024,
+)
+
+
+def job_photo_count(data: dict) -> int:
+    if not data.get("job_id"):
+        return 0
+    return photo_registry.count(data["job_id"], Path(data["job_dirs"]["meta"]))
+
 
 # =============================
 # JOB DIRECTORIES
@@ -65,25 +123,64 @@ def write_job_json(job_dirs, job_id, theme: str, category: str, pages: int, user
         "pages": pages,
         "photo_count": photo_count,
         "client_name": user,
+        # seed не зберігаємо: build_plan виводить його з фото і параметрів (той самий вхід → той самий план)
+        "reshuffle": 0,
     }
 
     with (job_dirs["meta"] / "job.json").open("w", encoding="utf-8") as f:
         json.dump(meta, f, ensure_ascii=False, indent=2)
 
 
+def bump_job_seed(job_id: str) -> int:
+    """«Інший макет»: зсув seed → інший розподіл фото (і новий ключ кешу рендеру). Повертає зсув."""
+    path = settings.jobs_dir / job_id / "meta" / "job.json"
+    meta = json.loads(path.read_text(encoding="utf-8"))
+    key = "seed" if meta.get("seed") is not None else "reshuffle"  # старі job мають явний seed
+    meta[key] = (int(meta.get(key, 0)) + 1) % (1 << 31)
+    path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return meta[key]
+
+
 # =============================
 # PIPELINE
 # =============================
-def run_pipeline(job_id: str) -> Path:
-    """Запускає весь процес створення журналу."""
-    plan_path = run_build_plan(job_id)
-    run_indesign(str(plan_path))
+def run_pipeline(job_id: str, timer: StageTimer = NO_TIMER) -> tuple[Path, str]:
+    """Запускає весь процес створення журналу. Повертає (PDF, digest плану)."""
+    with timer.stage("plan"):
+        plan = build_plan(job_id=job_id, timer=timer)
+    digest = plan["meta"]["digest"]
+    output_dir = settings.jobs_dir / job_id / "output"
+    job_processes.check(job_id)  # скасували, поки будувався план
+
+    with timer.stage("render_cache"):
+        cache_hit = render_cache.restore(digest, output_dir)
+    timer.note("render_cache_hit", cache_hit)
+    if cache_hit:
+        # Ті самі байти, що й у кеші — їхні file_id лишаються дійсними
+        logger.info("Render cache hit for %s (%s)", job_id, digest[:12])
+    else:
+        delivery_cache.evict_job(job_id)  # PDF/INDD/розвороти будуть новими
+        render_cache.detach(output_dir)  # output/ може містити hardlinks на кеш
+        with _render_slots:
+            job_processes.check(job_id)  # скасували, поки чекали на слот InDesign
+            with timer.stage("render"):
+                renderer.render(plan_path(job_id), plan)
 
     # 🔥 ВИПРАВЛЕНО: verify_output повертає тільки PDF
-    pdf = verify_output(job_id)
+    with timer.stage("verify"):
+        pdf = verify_output(job_id)
+    if not cache_hit:
+        render_cache.put(digest, output_dir)  # у кеш — лише перевірений рендер
+    return pdf, digest
+
 
-    make_zip(job_id)
-    return pdf
+def package_zip(job_id: str, timer: StageTimer = NO_TIMER):
+    """output/magazine.zip — у фоні, поки растеризуються превью; архів не доставляється, тож збій лише логуємо."""
+    try:
+        with timer.stage("zip"):
+            make_zip(job_id)
+    except OSError as e:
+        logger.warning("Could not package ZIP for %s: %s", job_id, e)
 
 
 # =============================
@@ -91,6 +188,9 @@ def run_pipeline(job_id: str) -> Path:
 # =============================
 @router.message(F.text == "/start")
 async def cmd_start(message: Message, state: FSMContext):
+    data = await state.get_data()
+    if data.get("job_id") and await state.get_state() != MagazineFSM.processing.state:
+        photo_registry.forget(data["job_id"])  # попереднє замовлення покинуте до старту
     await state.clear()
     await state.set_state(MagazineFSM.waiting_photos)
 
@@ -103,33 +203,43 @@ async def cmd_start(message: Message, state: FSMContext):
 
 
 # =============================
-# UNIVERSAL PHOTO SAVER
+# /resend — повторно надіслати останній журнал
 # =============================
-async def save_photo(message: Message, state: FSMContext):
-    """Зберігає одне фото у jobs/<id>/input/"""
+@router.message(F.text == "/resend")
+async def cmd_resend(message: Message, sender: OutboundSender):
+    job_id = delivery_cache.last_job(message.chat.id)
+    pdf = settings.jobs_dir / job_id / "output" / "final.pdf" if job_id else None
+    if pdf is None or not pdf.exists():
+        await message.answer("Ще немає готових журналів 🙂 Натисни /start")
+        return
+    await send_magazine_files(sender, message.chat.id, job_id, pdf)
 
-    data = await state.get_data()
-    job_id = data.get("job_id")
-
-    if not job_id:
-        job_id = f"{message.from_user.id}_{uuid.uuid4().hex[:6]}"
-        job_dirs = create_dirs(job_id)
-        await state.update_data(
-            job_id=job_id,
-            job_dirs={k: str(v) for k, v in job_dirs.items()},
-            photos=[],
-        )
-        data = await state.get_data()  # refresh data after update
 
-    job_dirs = {k: Path(v) for k, v in data["job_dirs"].items()}
-    photos = data.get("photos", [])
+# =============================
+# UNIVERSAL PHOTO SAVER
+# =============================
+async def save_photo(message: Message, state: FSMContext) -> int | None:
+    """
+    Зберігає одне фото у jobs/<id>/input/.
+    Повертає кількість фото в замовленні (None — фото пропущено).
+    Прогрес користувачу показує DownloadScheduler.
+    """
+
+    # Перше фото альбому: job має створитися рівно один раз
+    async with photo_registry.lock(f"user:{message.from_user.id}"):
+        data = await state.get_data()
+        job_id = data.get("job_id")
+
+        if not job_id:
+            job_id = f"{message.from_user.id}_{uuid.uuid4().hex[:6]}"
+            job_dirs = create_dirs(job_id)
+            await state.update_data(
+                job_id=job_id,
+                job_dirs={k: str(v) for k, v in job_dirs.items()},
+            )
+            data = await state.get_data()  # refresh data after update
 
-    if len(photos) >= settings.max_photos:
-        await message.answer(
-            f"⚠️ Досягнуто ліміт {settings.max_photos} фото.\n"
-            "Натисни «✅ Досить, далі», щоб продовжити."
-        )
-        return
+    job_dirs = {k: Path(v) for k, v in data["job_dirs"].items()}
 
     file = None
     ext = ".jpg"
@@ -138,27 +248,60 @@ async def save_photo(message: Message, state: FSMContext):
         file = message.photo[-1]
     elif message.document:
         if not (message.document.mime_type or "").startswith("image"):
-            return
+            return None
         file = message.document
         ext = Path(message.document.file_name or "").suffix or ".jpg"
 
     if not file:
-        return
+        return None
+
+    if not await photo_registry.reserve(job_id, job_dirs["meta"]):
+        return None
+
+    try:
+        dest = await _store_photo(message, file, ext, job_id, job_dirs)
+    except Exception:
+        await photo_registry.release(job_id)
+        raise
+
+    return await photo_registry.commit(job_id, dest.name)
+
 
+async def _store_photo(message: Message, file, ext: str, job_id: str, job_dirs: dict[str, Path]) -> Path:
+    """Завантажує (або бере зі сховища) фото, кладе в input/ і індексує."""
     # Use UUID to avoid race condition with albums (media groups)
     unique_id = uuid.uuid4().hex[:8]
     dest = job_dirs["input"] / f"photo_{unique_id}{ext}"
-    await message.bot.download(file, destination=dest)
 
-    photos.append(dest.name)
-    await state.update_data(photos=photos)
-
-    logger.info("Saved photo %s (total=%s)", dest.name, len(photos))
+    # Таке фото вже є у сховищі (повторне замовлення) — не качаємо з Telegram.
+    # StageTimer job ще не існує (він стартує з пайплайном) — час збирає реєстр.
+    sha256 = photo_store.lookup_file_id(file.file_unique_id)
+    if sha256 is None:
+        tmp = photo_store.tmp_path(ext)
+        with photo_registry.timed(job_id, "download"):
+            await message.bot.download(file, destination=tmp, chunk_size=256 * 1024)
+            sha256 = await asyncio.to_thread(photo_store.ingest, tmp, ext, file.file_unique_id)
+    else:
+        logger.info("Photo %s already in store, skipping download", file.file_unique_id)
+    await asyncio.to_thread(photo_store.link, sha256, dest, job_id)
+
+    # Метадані одразу в meta/photos_index.json — build_plan потім лише читає індекс
+    try:
+        with photo_registry.timed(job_id, "analyze_photos"):
+            meta, cache_hit = await asyncio.to_thread(
+                index_photo, job_dirs["meta"], dest, sha256, photo_store.get_meta(sha256),
+            )
+        if not cache_hit and "width" in meta:
+            photo_store.set_meta(sha256, meta)
+        logger.info(
+            "Saved photo %s (%sx%s %s, cache_hit=%s)",
+            dest.name, meta.get("width"), meta.get("height"), meta.get("orientation"), cache_hit,
+        )
+    except Exception as e:
+        # Не критично: build_plan проаналізує фото сам
+        logger.warning("Photo indexing failed for %s: %s", dest.name, e)
 
-    await message.answer(
-        f"📸 Фото прийнято ({len(photos)}/{settings.max_photos})",
-        reply_markup=photos_done_kb(),
-    )
+    return dest
 
 
 # =============================
@@ -168,14 +311,15 @@ async def save_photo(message: Message, state: FSMContext):
     StateFilter(MagazineFSM.waiting_photos),
     F.photo | F.document,
 )
-async def handle_photo(message: Message, state: FSMContext):
+async def handle_photo(message: Message, state: FSMContext, downloads: DownloadScheduler):
     logger.info(
         "Got content: photo=%s doc=%s media_group_id=%s",
         bool(message.photo),
         bool(message.document),
         message.media_group_id,
     )
-    await save_photo(message, state)
+    # Не чекаємо завантаження в хендлері: альбом качається паралельно
+    downloads.submit(message.chat.id, lambda: save_photo(message, state))
 
 
 # =============================
@@ -185,13 +329,17 @@ async def handle_photo(message: Message, state: FSMContext):
     StateFilter(MagazineFSM.waiting_photos),
     F.text.contains("Досить"),
 )
-async def done_photos(message: Message, state: FSMContext):
+async def done_photos(message: Message, state: FSMContext, downloads: DownloadScheduler):
+    # Фото з альбому ще можуть докачуватися
+    await downloads.wait(message.chat.id)
+
     data = await state.get_data()
-    if not data.get("photos"):
+    photo_count = job_photo_count(data)
+    if not photo_count:
         await message.answer("Спочатку надішли хоч одне фото 🙂")
         return
 
-    logger.info(f"[FLOW] Photos done, count={len(data.get('photos', []))}. Showing styles keyboard")
+    logger.info(f"[FLOW] Photos done, count={photo_count}. Showing styles keyboard")
     await state.set_state(MagazineFSM.waiting_style)
     await message.answer("✨ Обери тематику:", reply_markup=styles_kb())
 
@@ -259,11 +407,12 @@ async def chosen_category(callback: CallbackQuery, state: FSMContext):
 
     # Розраховуємо рекомендовану кількість сторінок
     data = await state.get_data()
-    photo_count = len(data.get("photos", []))
+    photo_count = job_photo_count(data)
 
-    # Рекомендація: photo_count округлене до найближчого доступного
+    # Рекомендація: найменший варіант, у який фото влазять (кілька фото на сторінку)
     options = [12, 16, 20, 24, 32, 36, 40, 50]
-    recommended = min(options, key=lambda x: abs(x - photo_count)) if photo_count > 0 else 16
+    needed = calculate_pages_for_photos(photo_count)
+    recommended = next((x for x in options if x >= needed), options[-1]) if photo_count > 0 else 16
 
     logger.info(f"[FLOW] Showing pages keyboard, photo_count={photo_count}, recommended={recommended}")
 
@@ -282,7 +431,7 @@ async def chosen_category(callback: CallbackQuery, state: FSMContext):
     StateFilter(MagazineFSM.waiting_pages),
     F.data.startswith("pages:"),
 )
-async def chosen_pages(callback: CallbackQuery, state: FSMContext):
+async def chosen_pages(callback: CallbackQuery, state: FSMContext, render_pool: RenderWorkerPool):
     await callback.answer()
 
     pages = int(callback.data.split(":", 1)[1])
@@ -292,131 +441,235 @@ async def chosen_pages(callback: CallbackQuery, state: FSMContext):
     job_id = data["job_id"]
     job_dirs = {k: Path(v) for k, v in data["job_dirs"].items()}
     username = callback.from_user.full_name
-    photo_count = len(data.get("photos", []))
+    photo_count = job_photo_count(data)
     theme = data.get("theme", "adult18")
     category = data.get("category", "adult18_shablon")
 
     write_job_json(job_dirs, job_id, theme, category, pages, username, photo_count)
 
     await state.set_state(MagazineFSM.processing)
-    await callback.message.edit_text("⏳ Генерую журнал… це займе 1–3 хвилини")
 
-    async def task():
-        try:
-            pdf = await asyncio.to_thread(run_pipeline, job_id)
+    # Таймер job живе від старту пайплайна до finish_job; прийом фото — окремими етапами
+    timer = timer_for(job_id, settings.jobs_dir)
+    for stage, seconds in photo_registry.upload_timings(job_id).items():
+        timer.add(stage, seconds)
+    photo_registry.forget(job_id)
+
+    position = render_pool.submit(
+        job_id,
+        chat_id=callback.message.chat.id,
+        user_id=callback.from_user.id,
+    )
+    if position > 1:
+        await callback.message.edit_text(
+            f"🕒 Замовлення в черзі: {position}-е.\n"
+            "Я напишу, коли почну генерацію.",
+            reply_markup=cancel_kb(job_id),
+        )
+    else:
+        await callback.message.edit_text("✅ Замовлення прийнято!")
+
+
+# =============================
+# QUEUE WORKER: PIPELINE + DELIVERY
+# =============================
+async def process_job(sender: OutboundSender, storage: BaseStorage, job: QueuedJob):
+    """Виконує job з черги і надсилає результат у чат (працює і після рестарту)."""
+    chat_id = job.chat_id
+    state = FSMContext(
+        storage=storage,
+        key=StorageKey(bot_id=sender.bot.id, chat_id=chat_id, user_id=job.user_id),
+    )
+
+    if job.attempts > 1:
+        text = "⏳ Продовжую генерацію журналу після перезапуску…"
+    else:
+        text = "⏳ Генерую журнал… це займе 1–3 хвилини"
+    await sender.send_message(chat_id, text, reply_markup=cancel_kb(job.job_id))
 
-            # Надсилаємо превью по розворотах
-            await send_spreads_preview(callback, pdf)
+    timer = timer_for(job.job_id, settings.jobs_dir)
+    timer.note("renderer", renderer.name)
 
-            # Потім надсилаємо повний PDF
-            await callback.message.answer_document(
-                FSInputFile(str(pdf)),
-                caption="📕 Повний PDF журналу:",
+    try:
+        # Watchdog: завислий рендер вбивається, а воркер не чекає на потік
+        pdf, digest = await supervise(
+            job.job_id, asyncio.to_thread(run_pipeline, job.job_id, timer), timeout=settings.job_timeout,
+        )
+
+        # ZIP пакується в потоці паралельно з растеризацією превью (CPU різних ядер, PDF лише читається)
+        zip_task = None
+        if settings.make_zip:
+            zip_task = asyncio.create_task(asyncio.to_thread(package_zip, job.job_id, timer))
+
+        # Надсилаємо превью по розворотах
+        await send_spreads_preview(sender, chat_id, pdf, job.job_id, timer)
+        await asyncio.to_thread(render_cache.put_spreads, digest, pdf.parent / "spreads")
+
+        # Потім повний PDF та INDD для редагування
+        with timer.stage("upload"):
+            await send_magazine_files(sender, chat_id, job.job_id, pdf)
+        delivery_cache.record_delivery(chat_id, job.job_id)
+
+        if settings.admin_chat_id:
+            # Адміну — той самий file_id, без повторного upload
+            await delivery_cache.send_document(
+                sender, settings.admin_chat_id, pdf, job.job_id,
+                caption=f"🆕 Готове замовлення {job.job_id} (chat {chat_id})",
             )
 
-            # Надсилаємо INDD для редагування
-            indd = pdf.with_suffix(".indd")
-            if indd.exists():
-                await callback.message.answer_document(
-                    FSInputFile(str(indd)),
-                    caption="📝 INDD файл для редагування:",
-                )
+        if zip_task is not None:
+            await zip_task  # до finish_job: етап zip має потрапити в timings.json
+
+    except asyncio.CancelledError:
+        # Бот зупиняється (job повернеться в чергу після рестарту) або користувач
+        # натиснув «Скасувати» — стан тоді прибирає cancel_job
+        raise
+    except Exception as e:
+        logger.exception("Magazine generation failed", exc_info=e)
+        await sender.send_message(chat_id, f"😔 Сталася помилка: {e}")
+        timer.note("error", str(e))
+        await finish_job(state, job.job_id)
+        raise
+
+    await finish_job(state, job.job_id)
+    # Кнопка — лише після finish_job: раніше натискання встигало перезапустити job у роботі
+    await sender.send_message(
+        chat_id,
+        "Хочеш інше розташування фото?",
+        reply_markup=reshuffle_kb(job.job_id),
+    )
 
+
+async def report_failed_jobs(sender: OutboundSender, storage: BaseStorage, jobs: list[QueuedJob]):
+    """Job-и, які воркер ронив max_attempts разів (requeue_running): кажемо користувачу і скидаємо стан."""
+    for job in jobs:
+        state = FSMContext(
+            storage=storage,
+            key=StorageKey(bot_id=sender.bot.id, chat_id=job.chat_id, user_id=job.user_id),
+        )
+        try:
+            await sender.send_message(job.chat_id, MESSAGES["job_interrupted"])
         except Exception as e:
-            logger.exception("Magazine generation failed", exc_info=e)
-            await callback.message.answer(f"😔 Сталася помилка: {e}")
-        finally:
-            await state.clear()
+            logger.warning("Could not notify chat %s about failed %s: %s", job.chat_id, job.job_id, e)
+        await finish_job(state, job.job_id)
 
-    asyncio.create_task(task())
-    await asyncio.sleep(0.1)
+
+async def record_timings(job_id: str):
+    """meta/timings.json + гістограми; таймер job більше не потрібен."""
+    timer = finish_timer(job_id)
+    if timer is None:
+        return
+    try:
+        await asyncio.to_thread(timer.save)
+        await asyncio.to_thread(stage_metrics.observe_job, timer)
+        logger.info(
+            "[TIMINGS] %s: %s", job_id,
+            ", ".join(f"{name} {sec:.2f}s" for name, sec in timer.stages().items()),
+        )
+    except OSError as e:
+        logger.warning("Could not write timings for %s: %s", job_id, e)
+
+
+async def finish_job(state: FSMContext, job_id: str):
+    await record_timings(job_id)
+    photo_registry.forget(job_id)
+    # Перемішування старого замовлення не повинно скинути нове, яке користувач уже почав
+    if (await state.get_data()).get("job_id") == job_id:
+        await state.clear()
 
 
 # =============================
-# SEND SPREADS PREVIEW
+# CANCEL: у черзі або під час генерації
 # =============================
-async def send_spreads_preview(callback: CallbackQuery, pdf_path: Path):
-    """Надсилає превью журналу по розворотах (2 сторінки)."""
-    try:
-        from pdf2image import convert_from_path
+@router.callback_query(F.data.startswith("cancel:"))
+async def cancel_job(callback: CallbackQuery, state: FSMContext, render_pool: RenderWorkerPool):
+    job_id = callback.data.split(":", 1)[1]
+    if not job_id.startswith(f"{callback.from_user.id}_") or not render_pool.cancel(job_id):
+        await callback.answer("Замовлення вже не виконується", show_alert=True)
+        return
 
-        output_dir = pdf_path.parent
-        spreads_dir = output_dir / "spreads"
-        spreads_dir.mkdir(exist_ok=True)
+    logger.info(f"[FLOW] Cancelled {job_id}")
+    await callback.answer()
+    await callback.message.edit_text(MESSAGES["cancelled"])
+    await finish_job(state, job_id)
 
-        # Конвертуємо PDF в зображення
-        pages = convert_from_path(str(pdf_path), dpi=150)
 
-        if not pages:
+# =============================
+# RESHUFFLE: той самий job з новим seed
+# =============================
+@router.callback_query(F.data.startswith("reshuffle:"))
+async def reshuffle_job(callback: CallbackQuery, render_pool: RenderWorkerPool):
+    job_id = callback.data.split(":", 1)[1]
+    job_json = settings.jobs_dir / job_id / "meta" / "job.json"
+    if not job_id.startswith(f"{callback.from_user.id}_") or not job_json.exists():
+        await callback.answer("Замовлення не знайдено 😔", show_alert=True)
+        return
+    if render_pool.queue.status(job_id) in (PENDING, PROCESSING):
+        await callback.answer(MESSAGES["still_processing"], show_alert=True)
+        return
+
+    seed = await asyncio.to_thread(bump_job_seed, job_id)
+    if not render_pool.submit(job_id, chat_id=callback.message.chat.id, user_id=callback.from_user.id):
+        await callback.answer(MESSAGES["still_processing"], show_alert=True)
+        return
+
+    logger.info(f"[FLOW] Reshuffle {job_id}: seed shift {seed}")
+    await callback.answer("🔀 Перемішую фото…")
+    await callback.message.edit_reply_markup(reply_markup=None)
+
+
+# =============================
+# SEND SPREADS PREVIEW
+# =============================
+async def send_magazine_files(sender: OutboundSender, chat_id: int, job_id: str, pdf: Path):
+    """PDF і INDD (якщо є); вже доставлені файли йдуть по file_id."""
+    await delivery_cache.send_document(sender, chat_id, pdf, job_id, caption="📕 Повний PDF журналу:")
+
+    indd = pdf.with_suffix(".indd")
+    if indd.exists():
+        await delivery_cache.send_document(sender, chat_id, indd, job_id, caption="📝 INDD файл для редагування:")
+
+
+async def send_spreads_preview(
+    sender: OutboundSender, chat_id: int, pdf_path: Path, job_id: str, timer: StageTimer = NO_TIMER,
+):
+    """
+    Надсилає превью журналу по розворотах (2 сторінки).
+    Розвороти растеризуються паралельно в пулі процесів і відправляються альбомами
+    по 10 (sendMediaGroup) — кожен альбом одразу, як готовий.
+    """
+    try:
+        spreads_dir = pdf_path.parent / "spreads"
+
+        sent = 0
+        album: list[tuple[Path, str]] = []
+        # Растеризація в пулі процесів — event loop інших користувачів не блокується
+        spreads = preview_rasterizer.stream(pdf_path, spreads_dir)
+        while True:
+            with timer.stage("rasterize"):  # лише очікування наступного розвороту
+                item = await anext(spreads, None)
+            if item is None:
+                break
+            album.append(item)
+            if len(album) == MEDIA_GROUP_LIMIT:
+                if sent == 0:
+                    await sender.send_message(chat_id, "📖 Превью по розворотах:")
+                with timer.stage("upload"):
+                    sent += len(await delivery_cache.send_album(sender, chat_id, job_id, album))
+                album = []
+
+        if album:
+            if sent == 0:
+                await sender.send_message(chat_id, "📖 Превью по розворотах:")
+            with timer.stage("upload"):
+                sent += len(await delivery_cache.send_album(sender, chat_id, job_id, album))
+
+        if not sent:
             logger.warning("No pages converted from PDF")
-            return
-
-        await callback.message.answer("📖 Превью по розворотах:")
-
-        # Створюємо розвороти (по 2 сторінки)
-        spread_num = 1
-        i = 0
-
-        while i < len(pages):
-            if i == 0:
-                # Перша сторінка (обкладинка) - окремо
-                spread_path = spreads_dir / f"spread_{spread_num:02d}.jpg"
-                pages[0].save(str(spread_path), "JPEG", quality=85)
-                await callback.message.answer_photo(
-                    FSInputFile(str(spread_path)),
-                    caption=f"📄 Обкладинка"
-                )
-                i += 1
-                spread_num += 1
-            elif i == len(pages) - 1:
-                # Остання сторінка (задня обкладинка) - окремо
-                spread_path = spreads_dir / f"spread_{spread_num:02d}.jpg"
-                pages[i].save(str(spread_path), "JPEG", quality=85)
-                await callback.message.answer_photo(
-                    FSInputFile(str(spread_path)),
-                    caption=f"📄 Задня обкладинка"
-                )
-                i += 1
-                spread_num += 1
-            else:
-                # Внутрішні сторінки - по 2 (розворот)
-                from PIL import Image
-
-                left_page = pages[i]
-                right_page = pages[i + 1] if i + 1 < len(pages) - 1 else None
-
-                if right_page:
-                    # Об'єднуємо 2 сторінки в розворот
-                    width = left_page.width + right_page.width
-                    height = max(left_page.height, right_page.height)
-                    spread = Image.new("RGB", (width, height), "white")
-                    spread.paste(left_page, (0, 0))
-                    spread.paste(right_page, (left_page.width, 0))
-
-                    spread_path = spreads_dir / f"spread_{spread_num:02d}.jpg"
-                    spread.save(str(spread_path), "JPEG", quality=85)
-                    await callback.message.answer_photo(
-                        FSInputFile(str(spread_path)),
-                        caption=f"📖 Розворот {spread_num - 1} (стор. {i + 1}-{i + 2})"
-                    )
-                    i += 2
-                else:
-                    # Непарна сторінка
-                    spread_path = spreads_dir / f"spread_{spread_num:02d}.jpg"
-                    left_page.save(str(spread_path), "JPEG", quality=85)
-                    await callback.message.answer_photo(
-                        FSInputFile(str(spread_path)),
-                        caption=f"📄 Сторінка {i + 1}"
-                    )
-                    i += 1
-                spread_num += 1
-
-            # Невелика затримка щоб не перевантажувати Telegram
-            await asyncio.sleep(0.3)
 
     except ImportError:
         logger.warning("pdf2image not installed, skipping spreads preview")
-        await callback.message.answer("📕 Журнал готовий! (превью розворотів недоступне)")
+        await sender.send_message(chat_id, "📕 Журнал готовий! (превью розворотів недоступне)")
     except Exception as e:
         logger.warning(f"Failed to generate spreads preview: {e}")
-        await callback.message.answer("📕 Журнал готовий!")
+        await sender.send_message(chat_id, "📕 Журнал готовий!")
@@ -117,3 +117,27 @@ def pages_kb(recommended: int) -> InlineKeyboardMarkup:
         rows.append([InlineKeyboardButton(text=label, callback_data=f"pages:{p}")])
 
     return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+# ===============================
+# Під час генерації
+# ===============================
+def cancel_kb(job_id: str) -> InlineKeyboardMarkup:
+    """Скасувати замовлення в черзі або під час генерації"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="❌ Скасувати", callback_data=f"cancel:{job_id}")],
+        ]
+    )
+
+
+# ===============================
+# Після доставки журналу
+# ===============================
+def reshuffle_kb(job_id: str) -> InlineKeyboardMarkup:
+    """Перемішати фото (новий seed розкладки) для того самого замовлення"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="🔀 Інший макет", callback_data=f"reshuffle:{job_id}")],
+        ]
+    )
@@ -1,14 +1,33 @@
 # bot/main.py
 import asyncio
 import logging
+from functools import partial
 
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from bot.config import settings
-from bot.handlers.magazine import router as magazine_router
+from bot.downloads import DownloadScheduler
+from bot.sender import OutboundSender
+from bot.storage import SQLiteStorage
+from bot.keyboards import photos_done_kb
+from bot.handlers.magazine import (
+    router as magazine_router,
+    process_job,
+    report_failed_jobs,
+    renderer,
+    preview_rasterizer,
+    delivery_cache,
+    render_cache,
+)
+from bot.workers import RenderWorkerPool
+from aizine_integration.catalog import get_catalog
+from orchestrator.job_queue import JobQueue
+from orchestrator.sessions import PooledRenderer
 
 
 async def main():
@@ -18,16 +37,72 @@ async def main():
     )
 
     # ✅ Правильний спосіб встановити parse_mode в Aiogram 3.7+
+    session = None
+    if settings.telegram_api_server:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_server))
     bot = Bot(
         token=settings.bot_token,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
+    # Усі фонові повідомлення (прогрес, превью, файли) — через один sender з лімітами Telegram
+    sender = OutboundSender(bot, global_rate=settings.send_global_rate, chat_rate=settings.send_chat_rate)
 
-    dp = Dispatcher(storage=MemoryStorage())
+    if settings.fsm_storage == "memory":
+        storage = MemoryStorage()
+    else:
+        # Незавершені замовлення переживають рестарт; файл можуть ділити кілька процесів
+        storage = SQLiteStorage(settings.jobs_dir / "fsm.sqlite3", flush_interval=settings.fsm_flush_interval)
+
+    dp = Dispatcher(storage=storage)
     dp.include_router(magazine_router)
 
+    # Durable черга + обмежений пул воркерів замість fire-and-forget задач
+    render_pool = RenderWorkerPool(
+        JobQueue(settings.jobs_dir / "queue.sqlite3", max_attempts=settings.queue_max_attempts),
+        partial(process_job, sender, dp.storage),
+        workers=settings.queue_workers,
+    )
+    dp["render_pool"] = render_pool
+    dp["sender"] = sender
+    dp["downloads"] = DownloadScheduler(
+        sender,
+        limit=settings.max_photos,
+        concurrency=settings.download_concurrency,
+        reply_markup=photos_done_kb(),
+    )
+    # Каталог шаблонів/layouts — один раз на процес, до першого замовлення
+    await asyncio.to_thread(get_catalog)
+    failed = await render_pool.start()
+    if failed:
+        # Ці job-и більше не повернуться в чергу — інакше користувач чекав би вічно
+        asyncio.create_task(report_failed_jobs(sender, dp.storage, failed))
+
+    if isinstance(renderer, PooledRenderer):
+        # Піднімаємо InDesign заздалегідь, щоб перший job не чекав cold start
+        asyncio.create_task(asyncio.to_thread(renderer.pool.warm_up))
+
+    async def stop_workers():
+        # Job у роботі ще пише стан (finish_job) і шле повідомлення — зупиняємо воркери,
+        # поки FSM storage і сесія бота відкриті
+        await render_pool.stop()
+        await sender.close()
+
+    # aiogram реєструє закриття FSM storage у Dispatcher.__init__, тож наш хук — першим
+    dp.shutdown.register(stop_workers)
+    dp.shutdown.handlers.insert(0, dp.shutdown.handlers.pop())
+
     logging.info("Bot started. Waiting for updates...")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await render_pool.stop()  # no-op, якщо вже зупинено в stop_workers
+        render_pool.queue.close()
+        delivery_cache.close()
+        render_cache.close()
+        if isinstance(renderer, PooledRenderer):
+            await asyncio.to_thread(renderer.close)
+        preview_rasterizer.shutdown()
 
 
 if __name__ == "__main__":
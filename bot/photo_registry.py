@@ -0,0 +1,113 @@
+# bot/photo_registry.py
+# Атомарний реєстр фото замовлення.
+# Джерело правди — meta/photos_index.json (поповнюється інкрементально в photo_meta.index_photo),
+# а не список photos у FSM: конкурентні повідомлення альбому більше не перезаписують один одного.
+# Тут же — таймінги прийому фото: StageTimer job створюється лише при старті пайплайна.
+import asyncio
+import time
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from aizine_integration.photo_meta import load_index
+
+
+# Замовлення без нових фото стільки часу вважається покинутим — його записи прибираються
+ABANDON_AFTER = 24 * 3600
+
+
+class PhotoRegistry:
+    def __init__(self, limit: int, abandon_after: float = ABANDON_AFTER):
+        self.limit = limit
+        self.abandon_after = abandon_after
+        # Weak: lock живе, поки його тримає або чекає хоч одна корутина — ключі user:<id>
+        # не накопичуються на весь час роботи процесу
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+        self._names: dict[str, list[str]] = {}
+        self._reserved: dict[str, int] = defaultdict(int)
+        self._window: dict[str, list[float]] = {}          # job_id → [перше фото, останнє фото]
+        self._timings: dict[str, dict[str, float]] = {}    # job_id → download / analyze_photos, секунди
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """Lock на довільний ключ (job_id або user:<id> для створення job)."""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def _ensure_loaded(self, job_id: str, meta_dir: Path) -> list[str]:
+        # Один раз на процес читаємо індекс (напр. після рестарту), далі — тільки інкременти
+        names = self._names.get(job_id)
+        if names is None:
+            names = self._names[job_id] = list(load_index(meta_dir))
+        return names
+
+    async def reserve(self, job_id: str, meta_dir: Path) -> bool:
+        """Бронює місце під фото; False — ліміт уже вичерпано (з урахуванням тих, що качаються)."""
+        self._prune(keep=job_id)
+        async with self.lock(job_id):
+            now = time.time()
+            self._window.setdefault(job_id, [now, now])
+            names = self._ensure_loaded(job_id, meta_dir)
+            if len(names) + self._reserved[job_id] >= self.limit:
+                return False
+            self._reserved[job_id] += 1
+            return True
+
+    async def commit(self, job_id: str, filename: str) -> int:
+        """Фото збережене і проіндексоване; повертає кількість фото в замовленні."""
+        async with self.lock(job_id):
+            self._reserved[job_id] -= 1
+            window = self._window.setdefault(job_id, [time.time(), 0.0])
+            window[1] = time.time()
+            names = self._names.setdefault(job_id, [])
+            if filename not in names:
+                names.append(filename)
+            return len(names)
+
+    async def release(self, job_id: str):
+        """Завантаження не вдалося — звільняємо заброньоване місце."""
+        async with self.lock(job_id):
+            self._reserved[job_id] -= 1
+
+    def photos(self, job_id: str, meta_dir: Path) -> list[str]:
+        return list(self._ensure_loaded(job_id, meta_dir))
+
+    def count(self, job_id: str, meta_dir: Path) -> int:
+        return len(self._ensure_loaded(job_id, meta_dir))
+
+    @contextmanager
+    def timed(self, job_id: str, stage: str):
+        """Як StageTimer.stage, але для фото, що приходять до старту пайплайна."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = self._timings.setdefault(job_id, {})
+            stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - t0
+
+    def upload_timings(self, job_id: str) -> dict[str, float]:
+        """receive_photos (від першого до останнього фото) + сумарні download / analyze_photos."""
+        stages = dict(self._timings.get(job_id, {}))
+        window = self._window.get(job_id)
+        if window and window[1] >= window[0]:
+            stages = {"receive_photos": window[1] - window[0], **stages}
+        return stages
+
+    def forget(self, job_id: str):
+        """Звільняє пам'ять після завершення чи скидання замовлення (індекс на диску лишається)."""
+        self._names.pop(job_id, None)
+        self._reserved.pop(job_id, None)
+        self._window.pop(job_id, None)
+        self._timings.pop(job_id, None)
+
+    def _prune(self, keep: str):
+        """Покинуті замовлення (користувач пішов, не натиснувши «Досить») не живуть вічно."""
+        deadline = time.time() - self.abandon_after
+        stale = [
+            job_id for job_id, (first, last) in self._window.items()
+            if job_id != keep and max(first, last) < deadline and not self._reserved.get(job_id)
+        ]
+        for job_id in stale:
+            self.forget(job_id)
@@ -0,0 +1,125 @@
+# bot/preview.py
+# Превью журналу по розворотах: сторінки растеризуються по одній (генератор),
+# тож у пам'яті одночасно максимум один розворот — незалежно від кількості сторінок.
+# PreviewRasterizer виносить растеризацію в пул процесів (chunk = один розворот).
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+JPEG_QUALITY = 85
+
+
+def spread_layout(page_count: int) -> list[tuple[list[int], str]]:
+    """
+    Розкладка сторінок (1-based) по розворотах з підписами:
+    обкладинка окремо, задня обкладинка окремо, внутрішні — парами.
+    """
+    layout = []
+    spread_num = 1
+    i = 0
+    while i < page_count:
+        if i == 0:
+            layout.append(([1], "📄 Обкладинка"))
+            i += 1
+        elif i == page_count - 1:
+            layout.append(([i + 1], "📄 Задня обкладинка"))
+            i += 1
+        elif i + 1 < page_count - 1:
+            layout.append(([i + 1, i + 2], f"📖 Розворот {spread_num - 1} (стор. {i + 1}-{i + 2})"))
+            i += 2
+        else:
+            layout.append(([i + 1], f"📄 Сторінка {i + 1}"))
+            i += 1
+        spread_num += 1
+    return layout
+
+
+def pdf_page_count(pdf_path: Path) -> int:
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(str(pdf_path))["Pages"])
+
+
+def render_spread(pdf_path: Path, pages: list[int], out_path: Path, dpi: int = 150) -> Path:
+    """Растеризує 1–2 сторінки, склеює в розворот і зберігає JPEG."""
+    from pdf2image import convert_from_path
+    from PIL import Image
+
+    images = convert_from_path(str(pdf_path), dpi=dpi, first_page=pages[0], last_page=pages[-1])
+    try:
+        if len(images) == 1:
+            images[0].save(str(out_path), "JPEG", quality=JPEG_QUALITY)
+        else:
+            left, right = images[0], images[1]
+            spread = Image.new("RGB", (left.width + right.width, max(left.height, right.height)), "white")
+            spread.paste(left, (0, 0))
+            spread.paste(right, (left.width, 0))
+            spread.save(str(out_path), "JPEG", quality=JPEG_QUALITY)
+            spread.close()
+    finally:
+        for img in images:
+            img.close()
+    return out_path
+
+
+def iter_spreads(pdf_path: Path, spreads_dir: Path, dpi: int = 150) -> Iterator[tuple[Path, str]]:
+    """Генератор (шлях до JPEG, підпис) — наступний розворот рендериться тільки на запит."""
+    spreads_dir.mkdir(parents=True, exist_ok=True)
+    for n, (pages, caption) in enumerate(spread_layout(pdf_page_count(pdf_path)), start=1):
+        out = spreads_dir / f"spread_{n:02d}.jpg"
+        yield render_spread(pdf_path, pages, out, dpi), caption
+
+
+class PreviewRasterizer:
+    """
+    Спільний пул процесів для всіх превью: розвороти рендеряться паралельно
+    (first_page/last_page на розворот), а віддаються строго по порядку.
+    Кількість одночасно запланованих розворотів на одне превью обмежена,
+    щоб великий журнал не забив пул і не тримав на диску зайве.
+    """
+
+    def __init__(self, workers: int = 2, dpi: int = 150):
+        self.workers = max(1, workers)
+        self.dpi = dpi
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def stream(self, pdf_path: Path, spreads_dir: Path) -> AsyncIterator[tuple[Path, str]]:
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        spreads_dir.mkdir(parents=True, exist_ok=True)
+
+        page_count = await loop.run_in_executor(pool, pdf_page_count, pdf_path)
+        layout = spread_layout(page_count)
+        window = self.workers * 2
+
+        pdf_mtime = pdf_path.stat().st_mtime
+        futures: dict[int, asyncio.Future] = {}
+        next_submit = 0
+        try:
+            for n, (_pages, caption) in enumerate(layout):
+                while next_submit < len(layout) and next_submit < n + window:
+                    pages = layout[next_submit][0]
+                    out = spreads_dir / f"spread_{next_submit + 1:02d}.jpg"
+                    if out.exists() and out.stat().st_mtime >= pdf_mtime:
+                        # Розворот уже є для цього PDF (напр. з кешу рендеру)
+                        futures[next_submit] = loop.create_future()
+                        futures[next_submit].set_result(out)
+                    else:
+                        futures[next_submit] = loop.run_in_executor(
+                            pool, render_spread, pdf_path, pages, out, self.dpi,
+                        )
+                    next_submit += 1
+                yield await futures.pop(n), caption
+        finally:
+            for fut in futures.values():
+                fut.cancel()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
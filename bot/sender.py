@@ -0,0 +1,197 @@
+# bot/sender.py
+# Єдина точка вихідних повідомлень у Telegram:
+# - ліміти Telegram: ~30 повідомлень/с на бота і ~1/с в один чат (token bucket з невеликим burst)
+# - TelegramRetryAfter: чекаємо стільки, скільки сказав Telegram, і повторюємо той самий запит
+# - порядок у межах чату зберігається (одна черга + один воркер на чат)
+# - кілька текстів підряд в один чат склеюються в одне повідомлення
+# - альбом у чаті — один запит (як і на практиці поводиться Telegram), а в глобальному
+#   ліміті бота коштує стільки токенів, скільки в ньому фото
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InputMediaPhoto, Message
+
+logger = logging.getLogger(__name__)
+
+TEXT_LIMIT = 4096
+MEDIA_GROUP_LIMIT = 10
+
+
+class RateLimiter:
+    """Token bucket: rate токенів/с, не більше burst підряд; pause() — глобальна пауза після 429."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def idle(self) -> bool:
+        """Bucket знову повний — він нічим не відрізняється від щойно створеного."""
+        now = time.monotonic()
+        return now >= self._paused_until and self._tokens + (now - self._updated) * self.rate >= self.burst
+
+    async def acquire(self, cost: int = 1):
+        """cost > burst береться в борг: наступні запити чекають, поки він відновиться."""
+        need = min(cost, self.burst)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= need:
+                    self._tokens -= cost
+                    return
+                await asyncio.sleep((need - self._tokens) / self.rate)
+
+
+@dataclass
+class _Outgoing:
+    method: str
+    kwargs: dict[str, Any]
+    future: asyncio.Future
+    coalesce: bool = False
+
+
+@dataclass
+class _Chat:
+    limiter: RateLimiter
+    queue: list[_Outgoing] = field(default_factory=list)
+    worker: asyncio.Task | None = None
+
+
+class OutboundSender:
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: int = 3,
+        max_retries: int = 5,
+    ):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = RateLimiter(global_rate, burst=max(1, int(global_rate)))
+        self._chats: OrderedDict[int, _Chat] = OrderedDict()  # LRU: найдавніші чати — спереду
+
+    # ------------------------------------------------------------
+    # Публічні методи: повертають те ж, що й відповідні методи Bot
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> Message:
+        # Без клавіатури/особливих параметрів текст можна склеїти з сусідніми
+        return await self._submit(chat_id, "send_message", dict(text=text, **kwargs), coalesce=not kwargs)
+
+    async def send_photo(self, chat_id: int, photo, **kwargs) -> Message:
+        return await self._submit(chat_id, "send_photo", dict(photo=photo, **kwargs))
+
+    async def send_document(self, chat_id: int, document, **kwargs) -> Message:
+        return await self._submit(chat_id, "send_document", dict(document=document, **kwargs))
+
+    async def send_media_group(self, chat_id: int, media: list, **kwargs) -> list[Message]:
+        return await self._submit(chat_id, "send_media_group", dict(media=media, **kwargs))
+
+    async def edit_message_text(self, text: str, chat_id: int, message_id: int, **kwargs):
+        return await self._submit(chat_id, "edit_message_text", dict(text=text, message_id=message_id, **kwargs))
+
+    async def send_album(self, chat_id: int, photos: list[tuple[Any, str]]) -> list[Message]:
+        """Фото з підписами альбомами по 10 (одне фото — звичайним send_photo)."""
+        messages: list[Message] = []
+        for start in range(0, len(photos), MEDIA_GROUP_LIMIT):
+            chunk = photos[start:start + MEDIA_GROUP_LIMIT]
+            if len(chunk) == 1:
+                photo, caption = chunk[0]
+                messages.append(await self.send_photo(chat_id, photo, caption=caption))
+            else:
+                media = [InputMediaPhoto(media=photo, caption=caption) for photo, caption in chunk]
+                messages.extend(await self.send_media_group(chat_id, media))
+        return messages
+
+    async def close(self):
+        """Дочікується відправки всього, що вже в черзі, і зупиняє воркери."""
+        await asyncio.gather(*(c.worker for c in self._chats.values() if c.worker), return_exceptions=True)
+
+    # ------------------------------------------------------------
+    async def _submit(self, chat_id: int, method: str, kwargs: dict, coalesce: bool = False):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            self._prune()
+            chat = self._chats[chat_id] = _Chat(RateLimiter(self.chat_rate, self.chat_burst))
+        else:
+            self._chats.move_to_end(chat_id)
+        future = asyncio.get_running_loop().create_future()
+        chat.queue.append(_Outgoing(method, kwargs, future, coalesce))
+        if chat.worker is None:
+            chat.worker = asyncio.create_task(self._worker(chat_id, chat))
+        return await future
+
+    def _prune(self):
+        """Прибирає чати без черги, чий bucket уже відновився (інакше — запис на кожен чат назавжди)."""
+        while self._chats:
+            chat = next(iter(self._chats.values()))
+            if chat.worker is not None or chat.queue or not chat.limiter.idle():
+                break
+            self._chats.popitem(last=False)
+
+    def _next(self, chat: _Chat) -> list[_Outgoing]:
+        """Бере наступний запит; тексти, що йдуть підряд, об'єднує в один."""
+        batch = [chat.queue.pop(0)]
+        if batch[0].coalesce:
+            size = len(batch[0].kwargs["text"])
+            while chat.queue and chat.queue[0].coalesce:
+                size += 2 + len(chat.queue[0].kwargs["text"])
+                if size > TEXT_LIMIT:
+                    break
+                batch.append(chat.queue.pop(0))
+        return batch
+
+    async def _worker(self, chat_id: int, chat: _Chat):
+        try:
+            while chat.queue:
+                batch = self._next(chat)
+                kwargs = dict(batch[0].kwargs)
+                if len(batch) > 1:
+                    kwargs["text"] = "\n\n".join(item.kwargs["text"] for item in batch)
+                try:
+                    result = await self._call(chat_id, chat, batch[0].method, kwargs)
+                except Exception as e:
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    continue
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_result(result)
+        finally:
+            # Запис чату лишається, поки bucket не відновиться (_prune): ліміт переживає паузу
+            chat.worker = None
+
+    async def _call(self, chat_id: int, chat: _Chat, method: str, kwargs: dict):
+        # Альбом за ціною фото лише глобально: у чаті 10 токенів при 1/с — 10 с на кожен альбом
+        cost = len(kwargs["media"]) if method == "send_media_group" else 1
+        for attempt in range(self.max_retries + 1):
+            await chat.limiter.acquire()
+            await self._global.acquire(cost)
+            try:
+                return await getattr(self.bot, method)(chat_id=chat_id, **kwargs)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("[SEND] %s flood control (chat=%s), retry in %ss", method, chat_id, e.retry_after)
+                chat.limiter.pause(e.retry_after)
+                # Telegram не каже, який ліміт перевищено — притримуємо і решту чатів
+                self._global.pause(e.retry_after)
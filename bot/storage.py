@@ -0,0 +1,160 @@
+# bot/storage.py
+# Персистентне FSM-сховище (SQLite) замість MemoryStorage:
+# - переживає рестарт/деплой посеред замовлення
+# - кілька процесів бота можуть працювати з одним файлом (WAL)
+# - write-behind: серія update_data під час альбому пишеться одним комітом раз на flush_interval
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Mapping
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key         TEXT PRIMARY KEY,
+    state       TEXT,
+    data        TEXT NOT NULL DEFAULT '{}',
+    updated_at  REAL NOT NULL
+);
+"""
+
+
+def _key(key: StorageKey) -> str:
+    return ":".join(str(part) for part in (
+        key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny,
+    ))
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, db_path: Path, flush_interval: float = 0.5, max_dirty: int = 200):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+        # key → [state, data]; тільки ще не записані зміни цього процесу
+        self._dirty: dict[str, list] = {}
+        self._inflight: dict[str, list] = {}  # батч, який зараз пишеться в потоці
+        self._flusher: asyncio.Task | None = None  # живе, поки батч не записано
+        self._writing: asyncio.Future | None = None  # запис батчу в потоці (close() його дочікується)
+
+    # ------------------------------------------------------------
+    def _load(self, k: str) -> list:
+        record = self._dirty.get(k)
+        if record is not None:
+            return record
+        record = self._inflight.get(k)
+        if record is not None:
+            return [record[0], dict(record[1])]
+        with self._lock:
+            row = self._db.execute("SELECT state, data FROM fsm WHERE key = ?", (k,)).fetchone()
+        if row is None:
+            return [None, {}]
+        return [row[0], json.loads(row[1])]
+
+    def _mark_dirty(self, k: str, record: list):
+        self._dirty[k] = record
+        if len(self._dirty) >= self.max_dirty:
+            self._flush_now()
+        elif self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.flush_interval)
+            batch, self._dirty = self._dirty, {}
+            self._inflight.update(batch)
+            self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, batch))
+            self._writing.add_done_callback(lambda _: self._written(batch))
+            # shield: скасування flusher-а в close() не перериває запис — close() його дочікується
+            await asyncio.shield(self._writing)
+        finally:
+            self._flusher = None
+        if self._dirty:  # зміни, що прийшли під час запису, — наступним батчем
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    def _written(self, batch: dict[str, list]):
+        for k, record in batch.items():
+            if self._inflight.get(k) is record:
+                del self._inflight[k]
+
+    def _flush_now(self):
+        batch, self._dirty = self._dirty, {}
+        self._write(batch)
+
+    def _write(self, batch: dict[str, list]):
+        if not batch:
+            return
+        now = time.time()
+        rows, empty = [], []
+        for k, (state, data) in batch.items():
+            if state is None and not data:
+                empty.append((k,))  # state.clear() — запис не потрібен
+            else:
+                rows.append((k, state, json.dumps(data, ensure_ascii=False), now))
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    """
+                    INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+                    """,
+                    rows,
+                )
+                self._db.executemany("DELETE FROM fsm WHERE key = ?", empty)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                logger.exception("[FSM] Flush failed, %s records lost", len(batch))
+
+    # ------------------------------------------------------------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = _key(key)
+        record = self._load(k)
+        record[0] = state.state if isinstance(state, State) else state
+        self._mark_dirty(k, record)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return self._load(_key(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        k = _key(key)
+        record = self._load(k)
+        record[1] = json.loads(json.dumps(data))  # копія + перевірка, що дані серіалізуються
+        self._mark_dirty(k, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict(self._load(_key(key))[1])
+
+    async def close(self) -> None:
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+        if self._writing is not None:
+            # Батч уже пишеться в потоці: _db.close() під ним обірвав би коміт
+            await asyncio.gather(self._writing, return_exceptions=True)
+        self._flush_now()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,118 @@
+# bot/workers.py
+# Пул render-воркерів поверх durable черги (orchestrator.job_queue)
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from orchestrator.job_queue import JobQueue, QueuedJob, CANCELLED, COMPLETED, FAILED
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[QueuedJob], Awaitable[None]]
+
+
+class RenderWorkerPool:
+    """
+    N асинхронних воркерів забирають job з черги по одному.
+    handler(job) виконує пайплайн і доставку; будь-який бекенд
+    (у т.ч. фейковий рендерер) підставляється через handler.
+    """
+
+    def __init__(self, queue: JobQueue, handler: JobHandler, workers: int = 1, poll_interval: float = 2.0):
+        self.queue = queue
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+        self._running: dict[str, asyncio.Task] = {}  # job_id → задача handler
+        self._cancelled: set[str] = set()
+
+    async def start(self) -> list[QueuedJob]:
+        """Запускає воркери; повертає job-и, які після рестарту позначено failed."""
+        restored, failed = self.queue.requeue_running()
+        if restored:
+            logger.info("[QUEUE] Restored %s unfinished jobs after restart", restored)
+        if failed:
+            logger.warning(
+                "[QUEUE] %s jobs interrupted %s times, marked failed: %s",
+                len(failed), self.queue.max_attempts, ", ".join(job.job_id for job in failed),
+            )
+
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"render-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info("[QUEUE] Started %s render workers", self.workers)
+        self.wake()
+        return failed
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        self._wakeup.set()
+
+    def submit(self, job_id: str, chat_id: int, user_id: int, priority: int = 0, payload: dict | None = None) -> int:
+        """Ставить job у чергу, повертає позицію в черзі (0 — job ще виконується)."""
+        position = self.queue.enqueue(job_id, chat_id, user_id, priority, payload)
+        if position == 0:
+            logger.info("[QUEUE] %s is still processing, not re-enqueued", job_id)
+            return 0
+        logger.info("[QUEUE] Enqueued %s (priority=%s, position=%s)", job_id, priority, position)
+        self.wake()
+        return position
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Скасування користувачем: job у черзі просто знімається; job в роботі —
+        задача handler скасовується, і воркер одразу бере наступний.
+        """
+        if self.queue.cancel(job_id):
+            logger.info("[QUEUE] Cancelled pending %s", job_id)
+            return True
+        task = self._running.get(job_id)
+        if task is None or task.done():
+            return False
+        self._cancelled.add(job_id)
+        task.cancel()
+        logger.info("[QUEUE] Cancelling running %s", job_id)
+        return True
+
+    async def _worker(self, n: int):
+        while not self._stopping:
+            job = self.queue.claim()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.info("[QUEUE] worker-%s took %s (attempt %s)", n, job.job_id, job.attempts)
+            task = asyncio.create_task(self.handler(job), name=f"job-{job.job_id}")
+            self._running[job.job_id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                if job.job_id in self._cancelled and not asyncio.current_task().cancelling():
+                    self.queue.finish(job.job_id, CANCELLED)
+                    continue
+                # Зупинка бота: job лишається processing і повернеться в чергу при старті
+                raise
+            except Exception as e:
+                logger.exception("[QUEUE] Job %s failed", job.job_id)
+                self.queue.finish(job.job_id, FAILED, error=str(e))
+            else:
+                self.queue.finish(job.job_id, COMPLETED)
+            finally:
+                self._running.pop(job.job_id, None)
+                self._cancelled.discard(job.job_id)
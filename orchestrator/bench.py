@@ -0,0 +1,539 @@
+"""
+MagazineBot Orchestrator — bench.py
+Локальні бенчмарки пайплайна (без Telegram і без InDesign).
+
+Запуск:
+    python -m orchestrator.bench plan --runs 10
+        build_plan: окремий процес (старий шлях) vs in-process
+    python -m orchestrator.bench send --spreads 26 --flood 0
+        превью на локальному фейковому Bot API: send_photo + sleep vs альбоми через OutboundSender
+        (--flood N — кожен N-й запит отримує 429 retry_after)
+    python -m orchestrator.bench stress --jobs 8 --renderer session
+        N job паралельно (build_plan + рендер stub або теплі stub-сесії): кожен PDF має
+        містити job_id і digest саме свого плану — перевірка, що handoff плану не спільний
+    python -m orchestrator.bench hang --timeout 2
+        watchdog на скрипті, що навмисно зависає (з дочірнім процесом): дедлайн stage,
+        скасування з іншого потоку і supervise() — скільки чекає воркер і чи вбите все дерево
+    python -m orchestrator.bench layout [--idml path.idml]
+        idml_to_layouts → catalog → plan_placements по слотах шаблону (а не віртуальній сітці):
+        кожне фото в слоті з label шаблону, сторінок парно; забагато фото — fallback у сітку.
+        Без --idml — згенерований IDML (мастер, група, labels), бо data/templates без .idml
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from orchestrator import run_job
+from orchestrator.run_job import JOBS_DIR, log
+
+SAMPLE_JOB = JOBS_DIR / "example_job"
+
+
+@contextmanager
+def sample_jobs(count: int, source: Path = SAMPLE_JOB):
+    """Копії тестового job у тимчасовій JOBS_DIR (щоб не чіпати робочі jobs/)."""
+    tmp = Path(tempfile.mkdtemp(prefix="magazinebot_bench_"))
+    ids = []
+    try:
+        for n in range(count):
+            job_id = f"bench_{n:03d}"
+            shutil.copytree(source, tmp / job_id, ignore=shutil.ignore_patterns("output", "compose_plan.json"))
+            (tmp / job_id / "output").mkdir(exist_ok=True)
+            ids.append(job_id)
+        yield tmp, ids
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@contextmanager
+def patched_jobs_dir(jobs_dir: Path):
+    """Перенаправляє JOBS_DIR оркестратора і build_plan на тимчасову папку."""
+    import os
+    from aizine_integration import build_plan as bp
+
+    saved = run_job.JOBS_DIR, bp.JOBS_DIR, os.environ.get("JOBS_DIR")
+    run_job.JOBS_DIR = bp.JOBS_DIR = jobs_dir
+    os.environ["JOBS_DIR"] = str(jobs_dir)  # для дочірніх процесів build_plan.py
+    try:
+        yield
+    finally:
+        run_job.JOBS_DIR, bp.JOBS_DIR = saved[0], saved[1]
+        if saved[2] is None:
+            os.environ.pop("JOBS_DIR", None)
+        else:
+            os.environ["JOBS_DIR"] = saved[2]
+
+
+def report(name: str, samples: list[float]):
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))]
+    log(f"{name:<24} n={len(samples_ms):<4} mean={statistics.mean(samples_ms):8.1f} ms  "
+        f"median={statistics.median(samples_ms):8.1f} ms  p95={p95:8.1f} ms")
+
+
+def timed(fn, job_ids: list[str]) -> list[float]:
+    samples = []
+    for job_id in job_ids:
+        t0 = time.perf_counter()
+        fn(job_id)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def bench_plan(runs: int):
+    import contextlib
+    import io
+
+    with sample_jobs(runs) as (tmp, ids), patched_jobs_dir(tmp):
+        quiet = io.StringIO()
+        with contextlib.redirect_stdout(quiet):
+            before = timed(run_job.run_build_plan_subprocess, ids)
+            after = timed(run_job.run_build_plan, ids)
+        report("build_plan subprocess", before)
+        report("build_plan in-process", after)
+
+
+FAKE_TOKEN = "123456:BENCH"
+
+
+async def _fake_bot_api(flood_every: int, retry_after: int):
+    """Мінімальний Bot API на aiohttp: рахує запити і відповідає фейковими Message."""
+    from aiohttp import web
+
+    stats = {"requests": 0, "flood": 0}
+    message_id = 0
+
+    def message(chat_id) -> dict:
+        nonlocal message_id
+        message_id += 1
+        return {"message_id": message_id, "date": int(time.time()), "chat": {"id": int(chat_id), "type": "private"}}
+
+    async def handler(request: web.Request):
+        stats["requests"] += 1
+        if flood_every and stats["requests"] % flood_every == 0:
+            stats["flood"] += 1
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests",
+                "parameters": {"retry_after": retry_after},
+            })
+        form = await request.post()
+        method = request.match_info["method"]
+        if method == "sendMediaGroup":
+            media = json.loads(form["media"])
+            result = [message(form["chat_id"]) for _ in media]
+        else:
+            result = message(form["chat_id"])
+        return web.json_response({"ok": True, "result": result})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/bot{token}/{method}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", stats
+
+
+async def _bench_send(spreads: int, flood_every: int, retry_after: int):
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.types import FSInputFile
+    from PIL import Image
+
+    from bot.sender import OutboundSender
+
+    runner, base, stats = await _fake_bot_api(flood_every, retry_after)
+    tmp = Path(tempfile.mkdtemp(prefix="magazinebot_bench_"))
+    try:
+        paths = []
+        for n in range(spreads):
+            path = tmp / f"spread_{n + 1:02d}.jpg"
+            Image.new("RGB", (600, 400), (n * 9 % 256, 120, 200)).save(path, "JPEG")
+            paths.append(path)
+
+        bot = Bot(FAKE_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+        try:
+            # Старий шлях: кожен розворот окремо + sleep(0.3); 429 валить відправку
+            stats["requests"] = 0
+            t0 = time.perf_counter()
+            failed = 0
+            for n, path in enumerate(paths):
+                try:
+                    await bot.send_photo(1, FSInputFile(str(path)), caption=f"Розворот {n}")
+                except Exception:
+                    failed += 1
+                await asyncio.sleep(0.3)
+            log(f"{'send_photo + sleep':<24} {time.perf_counter() - t0:6.2f} s  "
+                f"requests={stats['requests']}  failed={failed}")
+
+            # Новий шлях: альбоми по 10 через OutboundSender
+            stats["requests"] = 0
+            sender = OutboundSender(bot)
+            t0 = time.perf_counter()
+            await sender.send_message(1, "📖 Превью по розворотах:")
+            sent = await sender.send_album(1, [(FSInputFile(str(p)), f"Розворот {n}") for n, p in enumerate(paths)])
+            await sender.close()
+            log(f"{'OutboundSender albums':<24} {time.perf_counter() - t0:6.2f} s  "
+                f"requests={stats['requests']}  delivered={len(sent)}")
+        finally:
+            await bot.session.close()
+    finally:
+        await runner.cleanup()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_send(spreads: int, flood_every: int, retry_after: int):
+    asyncio.run(_bench_send(spreads, flood_every, retry_after))
+
+
+def _pdf_info(pdf: Path) -> tuple[int, str, str]:
+    """(сторінок, Title, Subject) з PDF, який зберіг Pillow (без сторонніх бібліотек)."""
+    import re
+    data = pdf.read_bytes()
+    pages = len(re.findall(rb"/Type\s*/Page\b", data))
+
+    def field(name: bytes) -> str:
+        m = re.search(rb"/" + name + rb"\s*\(([^)]*)\)", data)
+        if not m:
+            return ""
+        raw = m.group(1)
+        return raw[2:].decode("utf-16-be") if raw.startswith(b"\xfe\xff") else raw.decode("latin-1")
+
+    return pages, field(b"Title"), field(b"Subject")
+
+
+def bench_stress(jobs: int, renderer_name: str):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from aizine_integration.build_plan import build_plan
+    from orchestrator.renderers import get_renderer
+
+    renderer = get_renderer(renderer_name, session_host="stub", pool_size=jobs, max_jobs=1000)
+    if hasattr(renderer, "pool"):
+        renderer.pool.warm_up()
+
+    with sample_jobs(jobs) as (tmp, ids), patched_jobs_dir(tmp):
+        # Різні сторінки, імена й seed: чужий план дав би інший PDF
+        for n, job_id in enumerate(ids):
+            meta_path = tmp / job_id / "meta" / "job.json"
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            meta.update(pages=12 + 2 * (n % 8), client_name=f"Client {n}", seed=1000 + n)
+            meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+        def one(job_id: str) -> dict:
+            plan = build_plan(job_id=job_id)
+            renderer.render(run_job.plan_path(job_id), plan)
+            return plan
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            plans = dict(zip(ids, pool.map(one, ids)))
+        elapsed = time.perf_counter() - t0
+
+        mismatched = []
+        for job_id, plan in plans.items():
+            pages, title, subject = _pdf_info(tmp / job_id / "output" / "final.pdf")
+            if (pages, title, subject) != (plan["meta"]["pages"], job_id, plan["meta"]["digest"]):
+                mismatched.append(f"{job_id}: pdf=({pages}, {title}, {subject[:12]}) "
+                                  f"plan=({plan['meta']['pages']}, {job_id}, {plan['meta']['digest'][:12]})")
+
+    if hasattr(renderer, "close"):
+        renderer.close()
+
+    log(f"{jobs} parallel jobs via {renderer.name}: {elapsed:.2f} s, "
+        f"{jobs - len(mismatched)}/{jobs} rendered their own plan")
+    for line in mismatched:
+        log(f"  MISMATCH {line}")
+    if mismatched:
+        raise SystemExit(1)
+
+
+# Зависає сам і запускає нащадка, що теж зависає; друкує pid нащадка
+HANG_SCRIPT = """
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(3600)"])
+print(child.pid, flush=True)
+time.sleep(3600)
+"""
+
+
+def _alive(pid: int) -> bool:
+    import os
+    if os.name == "nt":
+        return False  # без psutil не перевіряємо; taskkill /T вбиває дерево
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # зомбі (ще не прибраний init) вважаємо мертвим
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+def bench_hang(timeout: float):
+    import sys
+    import threading
+
+    from orchestrator.job_log import JobLog, run_streamed, stop
+    from orchestrator.watchdog import JobCancelled, StageTimeout, job_processes, supervise
+
+    cmd = [sys.executable, "-c", HANG_SCRIPT]
+
+    def child_pid(job_log: JobLog) -> int | None:
+        try:
+            for line in job_log.path.read_text(encoding="utf-8").splitlines():
+                msg = json.loads(line)
+                if msg["stream"] == "stdout" and msg["msg"].isdigit():
+                    return int(msg["msg"])
+        except OSError:
+            pass
+        return None
+
+    def check_tree(name: str, job_log: JobLog, elapsed: float, error: Exception | None):
+        time.sleep(0.3)  # лог пишеться потоком-слухачем
+        pid = child_pid(job_log)
+        leaked = pid is not None and _alive(pid)
+        log(f"{name:<12} {elapsed:6.2f} s  → {type(error).__name__ if error else 'no error'}; "
+            f"grandchild {pid} {'LEAKED' if leaked else 'killed'}")
+
+    with tempfile.TemporaryDirectory(prefix="magazinebot_hang_") as tmp:
+        # 1) дедлайн stage
+        job_log = JobLog("hang_timeout", Path(tmp) / "hang_timeout")
+        t0 = time.perf_counter()
+        error = None
+        try:
+            run_streamed(cmd, job_log, "hang", timeout=timeout)
+        except StageTimeout as e:
+            error = e
+        check_tree("timeout", job_log, time.perf_counter() - t0, error)
+
+        # 2) скасування з іншого потоку (кнопка «Скасувати»)
+        job_log = JobLog("hang_cancel", Path(tmp) / "hang_cancel")
+        job_processes.reset(job_log.job_id)
+        result: dict = {}
+
+        def worker():
+            try:
+                run_streamed(cmd, job_log, "hang")
+            except JobCancelled as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        time.sleep(timeout)
+        t0 = time.perf_counter()
+        job_processes.cancel(job_log.job_id)
+        thread.join()
+        check_tree("cancel", job_log, time.perf_counter() - t0, result.get("error"))
+
+        # 3) supervise: воркер звільняється, не чекаючи потоку
+        job_log = JobLog("hang_supervise", Path(tmp) / "hang_supervise")
+
+        async def supervised():
+            try:
+                await supervise(
+                    job_log.job_id, asyncio.to_thread(run_streamed, cmd, job_log, "hang"), timeout=timeout,
+                )
+            except StageTimeout as e:
+                return e
+
+        t0 = time.perf_counter()
+        error = asyncio.run(supervised())
+        check_tree("supervise", job_log, time.perf_counter() - t0, error)
+        stop()
+
+
+# Сторінка шаблону (pt) і фото-фрейми по сторінках: (top, left, bottom, right), label
+SAMPLE_PAGE = (822.0, 623.6)
+SAMPLE_FRAMES = [
+    [((0, 0, 822, 623.6), "COVER_IMAGE")],
+    [((40, 40, 400, 583.6), "PAGE_01_IMG_01"), ((440, 40, 780, 300), "PAGE_01_IMG_02"),
+     ((440, 320, 780, 583.6), "PAGE_01_IMG_03")],
+    [((40, 40, 780, 583.6), "PAGE_02_IMG_01")],
+    [((40, 40, 400, 300), "PAGE_03_IMG_01"), ((40, 320, 400, 583.6), "PAGE_03_IMG_02")],
+    [((40, 40, 780, 300), "PAGE_04_IMG_01"), ((40, 320, 780, 583.6), "PAGE_04_IMG_02")],
+    [((100, 40, 700, 583.6), "PAGE_05_IMG_01")],
+    [((40, 40, 780, 583.6), None)],  # лише з мастера
+    [((0, 0, 822, 623.6), "BACK_IMAGE")],
+]
+
+
+def _rect(self_id: str, box: tuple, label: str | None, dx: float, dy: float) -> str:
+    top, left, bottom, right = box
+    props = f'<Properties><Label><KeyValuePair Key="Label" Value="{label}"/></Label></Properties>' if label else ""
+    return (f'<Rectangle Self="{self_id}" ContentType="GraphicType" ItemTransform="1 0 0 1 {dx} {dy}" '
+            f'GeometricBounds="{top} {left} {bottom} {right}">{props}</Rectangle>')
+
+
+def sample_idml(path: Path) -> Path:
+    """
+    IDML як з InDesign: обкладинка і задня — окремі spreads, решта — розвороти з лівою
+    сторінкою лівіше корінця; фрейми в координатах spread, один у групі, один з мастера.
+    """
+    import zipfile
+
+    ns = 'xmlns:idPkg="http://ns.adobe.com/AdobeInDesign/idml/1.0/packaging"'
+    height, width = SAMPLE_PAGE
+    spreads: list[list[int]] = [[0]] + [[i, i + 1] for i in range(1, len(SAMPLE_FRAMES) - 1, 2)]
+    spreads.append([len(SAMPLE_FRAMES) - 1])
+
+    files = {}
+    for s_idx, page_ids in enumerate(spreads):
+        body = []
+        for pos, page in enumerate(page_ids):
+            dx = -width if len(page_ids) == 2 and pos == 0 else 0  # ліва сторінка розвороту
+            master = ' AppliedMaster="m1"' if SAMPLE_FRAMES[page][0][1] is None else ""
+            body.append(f'<Page Self="p{page}" Name="{page + 1}"{master} ItemTransform="1 0 0 1 {dx} {-height / 2}" '
+                        f'GeometricBounds="0 0 {height} {width}"/>')
+            frames = [(box, label) for box, label in SAMPLE_FRAMES[page] if label]
+            rects = [_rect(f"r{page}_{n}", box, label, dx, -height / 2) for n, (box, label) in enumerate(frames)]
+            if len(rects) > 1:
+                rects = [f'<Group Self="g{page}">{"".join(rects[:2])}</Group>'] + rects[2:]
+            body.extend(rects)
+        files[f"Spreads/Spread_s{s_idx}.xml"] = (
+            f'<idPkg:Spread {ns}><Spread Self="s{s_idx}">{"".join(body)}</Spread></idPkg:Spread>'
+        )
+
+    master_box = next(box for box, label in SAMPLE_FRAMES[-2] if label is None)
+    files["MasterSpreads/MasterSpread_m1.xml"] = (
+        f'<idPkg:MasterSpread {ns}><MasterSpread Self="m1">'
+        f'<Page Self="mp1" ItemTransform="1 0 0 1 0 {-height / 2}" GeometricBounds="0 0 {height} {width}"/>'
+        f'{_rect("mr1", master_box, "MASTER_IMAGE", 0, -height / 2)}'
+        f'</MasterSpread></idPkg:MasterSpread>'
+    )
+    files["designmap.xml"] = (
+        f'<Document {ns}>' + "".join(f'<idPkg:Spread src="Spreads/Spread_s{i}.xml"/>' for i in range(len(spreads)))
+        + '</Document>'
+    )
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("mimetype", "application/vnd.adobe.indesign-idml-package")
+        for name, text in files.items():
+            z.writestr(name, text)
+    return path
+
+
+def _sample_photos(count: int) -> list[dict]:
+    shapes = [(4000, 3000), (3000, 4000), (3000, 3000), (6000, 2000)]
+    photos = []
+    for n in range(count):
+        w, h = shapes[n % len(shapes)]
+        photos.append({"path": f"/bench/photo_{n:03d}.jpg", "filename": f"photo_{n:03d}.jpg",
+                       "width": w, "height": h, "orientation": "landscape" if w > h else "portrait"})
+    return photos
+
+
+def bench_layout(idml: str | None, runs: int):
+    import logging
+    import random
+
+    from aizine_integration import catalog as catalog_module
+    from aizine_integration.idml_to_layouts import extract_idml
+    from aizine_integration.layout_engine import TEMPLATES_DIR, logger as engine_logger, plan_placements
+
+    key = "bench/template"
+    template_path = TEMPLATES_DIR / "bench" / "template" / "bench.indd"
+    failures = []
+
+    with tempfile.TemporaryDirectory(prefix="magazinebot_layout_") as tmp:
+        tmp = Path(tmp)
+        source = Path(idml) if idml else sample_idml(tmp / "sample.idml")
+        extract_idml(source, key, tmp / "layouts" / "bench.json")
+        catalog = catalog_module.compile_catalog(tmp / "layouts", tmp / "templates_map.json")
+        layout = catalog.layout_for(key)
+        if not layout:
+            log(f"{source.name}: no photo slots extracted")
+            raise SystemExit(1)
+        capacity = sum(len(page) for page in layout)
+        log(f"{source.name}: {len(layout)} pages, {capacity} photo slots")
+
+        labels = {slot.label for page in layout for slot in page}
+        saved, catalog_module._catalog = catalog_module._catalog, catalog  # load_layout бере get_catalog()
+        level = engine_logger.level
+        engine_logger.setLevel(logging.ERROR)  # fallback у сітку тут очікуваний — без warning на кожен run
+        try:
+            # (фото, сторінок) → чи мав спрацювати шаблон; останній — більше фото, ніж слотів
+            cases = [(4, 4, True), (capacity // 2, 4, True), (capacity, 2, True), (capacity + 5, 4, False)]
+            for count, pages, from_template in cases:
+                photos = _sample_photos(count)
+                samples = []
+                for run in range(runs):
+                    t0 = time.perf_counter()
+                    placements, got_pages = plan_placements(photos, pages, random.Random(run), template_path)
+                    samples.append(time.perf_counter() - t0)
+
+                used = {p["label"] for p in placements}
+                on_template = used <= labels
+                name = f"{count} photos / {pages}+ pages"
+                problems = []
+                if len(placements) != count or len({p["filename"] for p in placements}) != count:
+                    problems.append(f"{len(placements)} placements for {count} photos")
+                if got_pages % 2 or got_pages < pages:
+                    problems.append(f"{got_pages} pages")
+                if on_template != from_template:
+                    problems.append("template slots expected" if from_template else "grid fallback expected")
+                report(name, samples)
+                log(f"{'':<24} → {got_pages} pages, {'template' if on_template else 'grid'}"
+                    f"{'; ' + ', '.join(problems) if problems else ''}")
+                failures += [f"{name}: {p}" for p in problems]
+        finally:
+            catalog_module._catalog = saved
+            engine_logger.setLevel(level)
+
+    if failures:
+        for line in failures:
+            log(f"  FAIL {line}")
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MagazineBot pipeline benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("plan", help="per-job planning latency")
+    p.add_argument("--runs", type=int, default=10)
+
+    p = sub.add_parser("send", help="spread preview delivery against a fake Bot API")
+    p.add_argument("--spreads", type=int, default=26)
+    p.add_argument("--flood", type=int, default=0, help="every N-th request gets 429")
+    p.add_argument("--retry-after", type=int, default=1)
+
+    p = sub.add_parser("stress", help="N parallel jobs, each must render its own plan")
+    p.add_argument("--jobs", type=int, default=8)
+    p.add_argument("--renderer", default="session", choices=["stub", "session"])
+
+    p = sub.add_parser("hang", help="watchdog: stage timeout, cancel and supervise on a hanging script")
+    p.add_argument("--timeout", type=float, default=2)
+
+    p = sub.add_parser("layout", help="plan_placements on template slots extracted from an IDML")
+    p.add_argument("--idml", help="real template IDML (default: a generated sample)")
+    p.add_argument("--runs", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.cmd == "plan":
+        bench_plan(args.runs)
+    elif args.cmd == "send":
+        bench_send(args.spreads, args.flood, args.retry_after)
+    elif args.cmd == "stress":
+        bench_stress(args.jobs, args.renderer)
+    elif args.cmd == "hang":
+        bench_hang(args.timeout)
+    elif args.cmd == "layout":
+        bench_layout(args.idml, args.runs)
+
+
+if __name__ == "__main__":
+    main()
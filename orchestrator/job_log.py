@@ -0,0 +1,212 @@
+"""
+MagazineBot Orchestrator — job_log.py
+Структуровані логи job без блокування робочих потоків:
+- вивід subprocess (build_plan.py, PowerShell/InDesign) читається порядково, поки процес працює,
+  а не одним blob після завершення; кожен рядок — запис з job_id, stage і stream
+- записи йдуть через QueueHandler → QueueListener (окремий потік): файли пише лише він,
+  тож робочий потік не чекає на диск, а рядки паралельних job не перемішуються
+- jobs/<id>/meta/log.jsonl — по JSON-об'єкту на рядок; у консоль — лише підсумки і stderr
+- ліміти обсягу: довжина рядка і кількість рядків на stage; решта рахується й відкидається,
+  в пам'яті лишається тільки хвіст для повідомлення про помилку
+
+Рівень консолі: ORCH_CONSOLE_LEVEL (INFO за замовчуванням; DEBUG — показувати і stdout).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import subprocess
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+
+from orchestrator.watchdog import JobCancelled, StageTimeout, job_processes, process_group_kwargs, wait_process
+
+LOGGER_NAME = "magazinebot.job"
+
+MAX_LINE_CHARS = 2000          # довший рядок обрізається
+MAX_LINES_PER_STAGE = 5000     # далі рядки stage лише рахуються
+TAIL_LINES = 40                # хвіст у пам'яті для тексту помилки
+MAX_OPEN_FILES = 32
+
+
+class JsonlFileHandler(logging.Handler):
+    """Пише записи з атрибутом jsonl у відповідний файл. Викликається лише з потоку QueueListener."""
+
+    def __init__(self, max_open: int = MAX_OPEN_FILES):
+        super().__init__(logging.DEBUG)
+        self.max_open = max_open
+        self._files: OrderedDict[str, object] = OrderedDict()
+
+    def _file(self, path: str):
+        f = self._files.pop(path, None)
+        if f is None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            f = open(path, "a", encoding="utf-8")
+            while len(self._files) >= self.max_open:
+                self._files.popitem(last=False)[1].close()
+        self._files[path] = f
+        return f
+
+    def emit(self, record: logging.LogRecord):
+        path = getattr(record, "jsonl", None)
+        if not path:
+            return
+        try:
+            entry = {
+                "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                "job_id": getattr(record, "job_id", None),
+                "stage": getattr(record, "stage", None),
+                "stream": getattr(record, "stream", "event"),
+                "level": record.levelname,
+                "msg": record.getMessage(),
+            }
+            f = self._file(path)
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        super().close()
+
+
+class _ConsoleFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return f"[ORCH] [{getattr(record, 'job_id', '-')}/{getattr(record, 'stage', '-')}] {record.getMessage()}"
+
+
+_listener: logging.handlers.QueueListener | None = None
+_listener_lock = threading.Lock()
+
+
+def get_logger() -> logging.Logger:
+    """Логер job; при першому виклику запускає потік-слухач черги."""
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                console = logging.StreamHandler()
+                console.setLevel(os.getenv("ORCH_CONSOLE_LEVEL", "INFO").upper())
+                console.setFormatter(_ConsoleFormatter())
+
+                records: queue.SimpleQueue = queue.SimpleQueue()
+                logger.addHandler(logging.handlers.QueueHandler(records))
+                logger.setLevel(logging.DEBUG)
+                logger.propagate = False  # бот має свій root-логер; рядки subprocess туди не дублюються
+
+                _listener = logging.handlers.QueueListener(
+                    records, JsonlFileHandler(), console, respect_handler_level=True,
+                )
+                _listener.start()
+                atexit.register(stop)
+    return logger
+
+
+def stop():
+    """Дописує чергу і закриває файли (atexit; явно — у тестах/бенчмарках)."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+class JobLog:
+    """Логи одного job: події і порядкові потоки subprocess у meta/log.jsonl."""
+
+    def __init__(self, job_id: str, job_dir: Path):
+        self.job_id = job_id
+        self.path = Path(job_dir) / "meta" / "log.jsonl"
+        self.logger = get_logger()
+
+    def _extra(self, stage: str, stream: str) -> dict:
+        return {"job_id": self.job_id, "stage": stage, "stream": stream, "jsonl": str(self.path)}
+
+    def event(self, stage: str, msg: str, level: int = logging.INFO):
+        self.logger.log(level, msg, extra=self._extra(stage, "event"))
+
+    def pump(self, stage: str, stream_name: str, lines, level: int = logging.DEBUG,
+             max_lines: int = MAX_LINES_PER_STAGE) -> deque:
+        """
+        Передає рядки (файл, pipe) у лог по одному. Понад max_lines — лише рахує.
+        Повертає хвіст останніх рядків (для тексту помилки).
+        """
+        tail: deque = deque(maxlen=TAIL_LINES)
+        written = dropped = 0
+        extra = self._extra(stage, stream_name)
+        for raw in lines:
+            line = raw.rstrip("\r\n")
+            if len(line) > MAX_LINE_CHARS:
+                line = line[:MAX_LINE_CHARS] + f"… (+{len(line) - MAX_LINE_CHARS} chars)"
+            tail.append(line)
+            if written < max_lines:
+                self.logger.log(level, line, extra=extra)
+                written += 1
+            else:
+                dropped += 1
+        if dropped:
+            self.event(stage, f"{stream_name}: {dropped} lines over limit dropped", logging.WARNING)
+        return tail
+
+
+def job_log_for_plan(plan_path: Path) -> JobLog:
+    """jobs/<id>/meta/compose_plan.json → JobLog цього job."""
+    job_dir = Path(plan_path).parent.parent
+    return JobLog(job_dir.name, job_dir)
+
+
+def run_streamed(
+    cmd: list[str], job_log: JobLog, stage: str, timeout: float | None = None, **popen_kwargs,
+) -> tuple[int, list[str]]:
+    """
+    Запускає процес і стрімить stdout (DEBUG) і stderr (WARNING) у лог job порядково.
+    timeout — дедлайн stage (StageTimeout); job_processes.cancel(job_id) вбиває процес (JobCancelled).
+    Повертає (код виходу, хвіст stdout+stderr).
+    """
+    job_log.event(stage, "$ " + " ".join(str(c) for c in cmd), logging.DEBUG)
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        **process_group_kwargs(),
+        **popen_kwargs,
+    )
+    tails: dict[str, deque] = {}
+
+    def reader(name, stream, level):
+        with stream:
+            tails[name] = job_log.pump(stage, name, stream, level)
+
+    threads = [
+        threading.Thread(target=reader, args=("stdout", proc.stdout, logging.DEBUG), daemon=True),
+        threading.Thread(target=reader, args=("stderr", proc.stderr, logging.WARNING), daemon=True),
+    ]
+    for t in threads:
+        t.start()
+    try:
+        with job_processes.track(job_log.job_id, proc):
+            returncode = wait_process(proc, timeout, job_log.job_id, stage)
+    except (StageTimeout, JobCancelled) as e:
+        job_log.event(stage, str(e), logging.ERROR)
+        raise
+    finally:
+        for t in threads:
+            t.join(timeout=10)  # нащадок, що втік з групи, може тримати pipe — не висимо на ньому
+
+    job_log.event(stage, f"exit code {returncode}", logging.INFO if returncode == 0 else logging.ERROR)
+    return returncode, list(tails.get("stdout", [])) + list(tails.get("stderr", []))
@@ -0,0 +1,214 @@
+"""
+MagazineBot Orchestrator — job_queue.py
+Durable черга замовлень (SQLite у jobs/queue.sqlite3):
+- FIFO з пріоритетом (більший priority → раніше)
+- переживає рестарт бота (processing → pending при старті); job, на якому процес
+  падав max_attempts разів, більше не повертається в чергу (failed)
+- позиція в черзі для повідомлень користувачу
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Статуси збігаються з bot.config.JobStatus
+PENDING = "pending"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id      TEXT NOT NULL UNIQUE,
+    chat_id     INTEGER NOT NULL,
+    user_id     INTEGER NOT NULL,
+    priority    INTEGER NOT NULL DEFAULT 0,
+    status      TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    payload     TEXT NOT NULL DEFAULT '{}',
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, id);
+"""
+
+
+@dataclass
+class QueuedJob:
+    id: int
+    job_id: str
+    chat_id: int
+    user_id: int
+    priority: int
+    status: str
+    attempts: int
+    payload: dict = field(default_factory=dict)
+
+
+class JobQueue:
+    """Потокобезпечна черга поверх одного SQLite-файлу."""
+
+    def __init__(self, db_path: Path, max_attempts: int = 3):
+        self.db_path = Path(db_path)
+        self.max_attempts = max(1, max_attempts)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ------------------------------------------------------------
+    def enqueue(self, job_id: str, chat_id: int, user_id: int, priority: int = 0, payload: dict | None = None) -> int:
+        """
+        Додає (або повторно ставить) job у чергу, повертає позицію (1 = наступний).
+        Job, який зараз виконується, не перезаписується — повертається 0: інакше воркер
+        по завершенні позначив би completed уже новий запит (і той би загубився).
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO jobs (job_id, chat_id, user_id, priority, status, payload, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET
+                    priority = excluded.priority,
+                    status = excluded.status,
+                    attempts = 0,
+                    payload = excluded.payload,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+                WHERE jobs.status != ?
+                """,
+                (job_id, chat_id, user_id, priority, PENDING,
+                 json.dumps(payload or {}, ensure_ascii=False), now, now, PROCESSING),
+            )
+        return self.position(job_id)
+
+    def position(self, job_id: str) -> int:
+        """Позиція серед pending (0 — job не в черзі)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, priority FROM jobs WHERE job_id = ? AND status = ?",
+                (job_id, PENDING),
+            ).fetchone()
+            if row is None:
+                return 0
+            (ahead,) = self._db.execute(
+                """
+                SELECT COUNT(*) FROM jobs
+                WHERE status = ? AND (priority > ? OR (priority = ? AND id <= ?))
+                """,
+                (PENDING, row["priority"], row["priority"], row["id"]),
+            ).fetchone()
+        return ahead
+
+    def claim(self) -> QueuedJob | None:
+        """Атомарно бере наступний job (pending → processing)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, id LIMIT 1",
+                    (PENDING,),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (PROCESSING, time.time(), row["id"]),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        return QueuedJob(
+            id=row["id"],
+            job_id=row["job_id"],
+            chat_id=row["chat_id"],
+            user_id=row["user_id"],
+            priority=row["priority"],
+            status=PROCESSING,
+            attempts=row["attempts"] + 1,
+            payload=json.loads(row["payload"] or "{}"),
+        )
+
+    def finish(self, job_id: str, status: str = COMPLETED, error: str | None = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        """Скасовує job, який ще чекає в черзі (pending → cancelled)."""
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, PENDING),
+            )
+        return cur.rowcount > 0
+
+    def status(self, job_id: str) -> str | None:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def pending_count(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (PENDING,)).fetchone()
+        return count
+
+    def requeue_running(self) -> tuple[int, list[QueuedJob]]:
+        """
+        Після рестарту: незавершені processing-job повертаються в чергу, крім тих,
+        що вже вичерпали max_attempts (job, який валить воркер, не крутиться вічно).
+        Повертає (скільки повернуто в чергу, job-и, позначені failed — їхнім чатам треба сказати).
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = ? AND attempts >= ?",
+                    (PROCESSING, self.max_attempts),
+                ).fetchall()
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ? AND attempts >= ?",
+                    (FAILED, f"Interrupted {self.max_attempts} times, giving up", now,
+                     PROCESSING, self.max_attempts),
+                )
+                restored = self._db.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?",
+                    (PENDING, now, PROCESSING),
+                ).rowcount
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        failed = [
+            QueuedJob(
+                id=row["id"],
+                job_id=row["job_id"],
+                chat_id=row["chat_id"],
+                user_id=row["user_id"],
+                priority=row["priority"],
+                status=FAILED,
+                attempts=row["attempts"],
+                payload=json.loads(row["payload"] or "{}"),
+            )
+            for row in rows
+        ]
+        return restored, failed
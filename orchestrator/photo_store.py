@@ -0,0 +1,219 @@
+"""
+MagazineBot Orchestrator — photo_store.py
+Content-addressed сховище фото (jobs/_store):
+- blobs/<sha[:2]>/<sha><ext> — один файл на унікальний вміст
+- jobs/<id>/input/photo_*.jpg — hardlink на blob (або копія, якщо ФС не вміє)
+- file_unique_id Telegram → sha256, щоб повторно надіслане фото не качати взагалі
+- refs (job_id, filename) → sha256: refcount = кількість refs; gc видаляє blob без refs,
+  якщо його не чіпали GC_GRACE секунд (між ingest/lookup і link ref ще немає)
+
+Запуск GC (після видалення старих jobs/<id>):
+    python -m orchestrator.photo_store gc
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from orchestrator.run_job import JOBS_DIR, log
+from aizine_integration.photo_meta import file_sha256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256      TEXT PRIMARY KEY,
+    ext         TEXT NOT NULL,
+    bytes       INTEGER NOT NULL,
+    meta        TEXT,
+    created_at  REAL NOT NULL,
+    touched_at  REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS file_ids (
+    file_unique_id  TEXT PRIMARY KEY,
+    sha256          TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    job_id      TEXT NOT NULL,
+    filename    TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    PRIMARY KEY (job_id, filename)
+);
+CREATE INDEX IF NOT EXISTS refs_sha ON refs (sha256);
+"""
+
+# Blob без refs молодший за це (від ingest чи повторного lookup) gc не чіпає: job ось-ось його прилінкує
+GC_GRACE = 3600
+
+
+class PhotoStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.blobs_dir = self.root / "blobs"
+        self.tmp_dir = self.root / "tmp"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "store.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(blobs)")}
+        if "touched_at" not in columns:  # сховище зі старої версії
+            self._db.execute("ALTER TABLE blobs ADD COLUMN touched_at REAL NOT NULL DEFAULT 0")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ------------------------------------------------------------
+    def blob_path(self, sha256: str, ext: str) -> Path:
+        return self.blobs_dir / sha256[:2] / f"{sha256}{ext}"
+
+    def tmp_path(self, ext: str = "") -> Path:
+        """Куди качати нове фото перед ingest (та сама ФС, що й blobs → rename без копії)."""
+        return self.tmp_dir / f"{uuid.uuid4().hex}{ext}"
+
+    def lookup_file_id(self, file_unique_id: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT f.sha256 FROM file_ids f JOIN blobs b ON b.sha256 = f.sha256 WHERE f.file_unique_id = ?",
+                (file_unique_id,),
+            ).fetchone()
+            if row is not None:
+                self._touch(row["sha256"])  # blob міг лишитись без refs — захищаємо до link
+        return row["sha256"] if row else None
+
+    def _touch(self, sha256: str):
+        """Під self._lock: відкладає gc цього blob на GC_GRACE."""
+        self._db.execute("UPDATE blobs SET touched_at = ? WHERE sha256 = ?", (time.time(), sha256))
+
+    def ingest(self, src: Path, ext: str, file_unique_id: str | None = None) -> str:
+        """Переносить файл у сховище (src зникає), повертає sha256."""
+        sha256 = file_sha256(src)
+        blob = self.blob_path(sha256, ext)
+
+        with self._lock:
+            row = self._db.execute("SELECT ext FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is None:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(src, blob)
+                now = time.time()
+                self._db.execute(
+                    "INSERT INTO blobs (sha256, ext, bytes, created_at, touched_at) VALUES (?, ?, ?, ?, ?)",
+                    (sha256, ext, blob.stat().st_size, now, now),
+                )
+            else:
+                src.unlink(missing_ok=True)  # такий вміст уже є
+                self._touch(sha256)
+            if file_unique_id:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO file_ids (file_unique_id, sha256) VALUES (?, ?)",
+                    (file_unique_id, sha256),
+                )
+        return sha256
+
+    def link(self, sha256: str, dest: Path, job_id: str) -> Path:
+        """Кладе blob у папку job (hardlink або копія) і реєструє посилання."""
+        with self._lock:
+            row = self._db.execute("SELECT ext FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            raise KeyError(f"Blob not found: {sha256}")
+
+        blob = self.blob_path(sha256, row["ext"])
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(blob, dest)
+        except OSError:
+            shutil.copy2(blob, dest)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO refs (job_id, filename, sha256) VALUES (?, ?, ?)",
+                (job_id, dest.name, sha256),
+            )
+        return dest
+
+    def refcount(self, sha256: str) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM refs WHERE sha256 = ?", (sha256,)).fetchone()
+        return count
+
+    # ------------------------------------------------------------
+    # Глобальний кеш метаданих (photo_meta) по вмісту — спільний для всіх jobs
+    def get_meta(self, sha256: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute("SELECT meta FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return json.loads(row["meta"]) if row and row["meta"] else None
+
+    def set_meta(self, sha256: str, meta: dict):
+        with self._lock:
+            self._db.execute(
+                "UPDATE blobs SET meta = ? WHERE sha256 = ?",
+                (json.dumps(meta, ensure_ascii=False), sha256),
+            )
+
+    # ------------------------------------------------------------
+    def release_job(self, job_id: str) -> int:
+        """Знімає всі посилання job (після видалення його папки)."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM refs WHERE job_id = ?", (job_id,))
+        return cur.rowcount
+
+    def gc(self, jobs_dir: Path | None = None, grace: float = GC_GRACE) -> tuple[int, int]:
+        """
+        Звільняє refs jobs, чиїх файлів уже немає, і видаляє blobs без refs,
+        яких не торкались grace секунд (бот може працювати паралельно з gc).
+        Повертає (видалено blobs, звільнено байт).
+        """
+        jobs_dir = Path(jobs_dir or self.root.parent)
+        with self._lock:
+            refs = self._db.execute("SELECT job_id, filename FROM refs").fetchall()
+        stale = [
+            (r["job_id"], r["filename"]) for r in refs
+            if not (jobs_dir / r["job_id"] / "input" / r["filename"]).exists()
+        ]
+
+        with self._lock:
+            self._db.executemany("DELETE FROM refs WHERE job_id = ? AND filename = ?", stale)
+            orphans = self._db.execute(
+                """
+                SELECT sha256, ext, bytes FROM blobs
+                WHERE sha256 NOT IN (SELECT sha256 FROM refs) AND max(created_at, touched_at) < ?
+                """,
+                (time.time() - grace,),
+            ).fetchall()
+            for row in orphans:
+                self.blob_path(row["sha256"], row["ext"]).unlink(missing_ok=True)
+            self._db.executemany("DELETE FROM blobs WHERE sha256 = ?", [(r["sha256"],) for r in orphans])
+            self._db.executemany("DELETE FROM file_ids WHERE sha256 = ?", [(r["sha256"],) for r in orphans])
+
+        # Недокачані тимчасові файли старші за годину
+        for tmp in self.tmp_dir.iterdir():
+            if time.time() - tmp.stat().st_mtime > 3600:
+                tmp.unlink(missing_ok=True)
+
+        return len(orphans), sum(r["bytes"] for r in orphans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MagazineBot photo store")
+    parser.add_argument("cmd", choices=["gc"])
+    parser.add_argument("--jobs-dir", default=str(JOBS_DIR))
+    parser.add_argument("--grace", type=float, default=GC_GRACE, help="seconds an unreferenced blob is kept")
+    args = parser.parse_args()
+
+    jobs_dir = Path(args.jobs_dir)
+    store = PhotoStore(jobs_dir / "_store")
+    removed, freed = store.gc(jobs_dir, grace=args.grace)
+    log(f"GC: removed {removed} blobs, freed {freed / (1024 * 1024):.1f} MB")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
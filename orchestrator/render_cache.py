@@ -0,0 +1,180 @@
+"""
+MagazineBot Orchestrator — render_cache.py
+Кеш результатів рендеру за digest плану (build_plan.plan_digest):
+- <root>/<digest>/final.pdf, final.indd, spreads/spread_NN.jpg — hardlinks на файли першого job
+- повтор, подвійне натискання на кількість сторінок чи повторне замовлення з тими самими
+  фото/шаблоном/текстами отримують готовий результат без InDesign
+- LRU: коли кеш перевищує бюджет диска, видаляються записи, що найдовше не використовувались
+
+Важливо: файли в output/ можуть бути hardlink на кеш, тому перед новим рендером
+їх треба відв'язати (detach), інакше рендерер перезапише вміст кешу.
+
+Очистка вручну:
+    python -m orchestrator.render_cache prune --budget-mb 1024
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from orchestrator.run_job import JOBS_DIR, log
+
+ARTIFACTS = ("final.pdf", "final.indd")
+SPREADS_DIR = "spreads"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    digest      TEXT PRIMARY KEY,
+    bytes       INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    last_used   REAL NOT NULL
+);
+"""
+
+
+def _link(src: Path, dest: Path):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+class RenderCache:
+    def __init__(self, root: Path, budget_bytes: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.budget_bytes = budget_bytes
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "cache.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_bytes > 0
+
+    def entry_dir(self, digest: str) -> Path:
+        return self.root / digest
+
+    # ------------------------------------------------------------
+    @staticmethod
+    def detach(output_dir: Path):
+        """Прибирає з output/ файли, які можуть бути hardlink на кеш (перед новим рендером)."""
+        for name in ARTIFACTS:
+            (output_dir / name).unlink(missing_ok=True)
+        shutil.rmtree(output_dir / SPREADS_DIR, ignore_errors=True)
+
+    def restore(self, digest: str, output_dir: Path) -> bool:
+        """Є готовий результат → лінкуємо його в output/ і повертаємо True."""
+        if not self.enabled:
+            return False
+        entry = self.entry_dir(digest)
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM entries WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return False
+        if not (entry / "final.pdf").exists():
+            self._drop(digest)
+            return False
+
+        self.detach(output_dir)
+        for src in entry.rglob("*"):
+            if src.is_file():
+                _link(src, output_dir / src.relative_to(entry))
+
+        with self._lock:
+            self._db.execute("UPDATE entries SET last_used = ? WHERE digest = ?", (time.time(), digest))
+        return True
+
+    def put(self, digest: str, output_dir: Path):
+        """Кладе свіжий рендер у кеш (PDF, INDD) і за потреби витісняє старі записи."""
+        if not self.enabled:
+            return
+        entry = self.entry_dir(digest)
+        for name in ARTIFACTS:
+            if (output_dir / name).exists():
+                _link(output_dir / name, entry / name)
+        self._update(digest)
+
+    def put_spreads(self, digest: str, spreads_dir: Path):
+        """Превью розворотів з'являються пізніше за PDF — докладаємо їх у вже наявний запис."""
+        if not self.enabled or not spreads_dir.is_dir():
+            return
+        entry = self.entry_dir(digest)
+        if not (entry / "final.pdf").exists():
+            return
+        for src in spreads_dir.glob("spread_*.jpg"):
+            dest = entry / SPREADS_DIR / src.name
+            if not dest.exists():
+                _link(src, dest)
+        self._update(digest)
+
+    # ------------------------------------------------------------
+    def _update(self, digest: str):
+        entry = self.entry_dir(digest)
+        size = sum(p.stat().st_size for p in entry.rglob("*") if p.is_file())
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO entries (digest, bytes, created_at, last_used) VALUES (?, ?, ?, ?)
+                ON CONFLICT(digest) DO UPDATE SET bytes = excluded.bytes, last_used = excluded.last_used
+                """,
+                (digest, size, now, now),
+            )
+        self.prune(keep=digest)
+
+    def _drop(self, digest: str):
+        shutil.rmtree(self.entry_dir(digest), ignore_errors=True)
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+
+    def prune(self, budget_bytes: int | None = None, keep: str | None = None) -> tuple[int, int]:
+        """LRU-витіснення до бюджету. Повертає (видалено записів, звільнено байт)."""
+        budget = self.budget_bytes if budget_bytes is None else budget_bytes
+        with self._lock:
+            rows = self._db.execute("SELECT digest, bytes FROM entries ORDER BY last_used").fetchall()
+        total = sum(size for _, size in rows)
+
+        removed = freed = 0
+        for digest, size in rows:
+            if total <= budget:
+                break
+            if digest == keep:
+                continue
+            self._drop(digest)
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MagazineBot render cache")
+    parser.add_argument("cmd", choices=["prune"])
+    parser.add_argument("--root", default=str(JOBS_DIR / "_render_cache"))
+    parser.add_argument("--budget-mb", type=int, required=True)
+    args = parser.parse_args()
+
+    removed = freed = 0
+    for root in (p for p in Path(args.root).glob("*") if p.is_dir()):  # по підпапці на рендерер
+        cache = RenderCache(root, args.budget_mb * 1024 * 1024)
+        r, f = cache.prune()
+        removed, freed = removed + r, freed + f
+        cache.close()
+    log(f"Prune: removed {removed} entries, freed {freed / (1024 * 1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+MagazineBot Orchestrator — renderers.py
+Бекенди рендерингу compose_plan.json → output/final.pdf:
+- com    : InDesign Desktop через PowerShell/COM (run_indesign)
+- socket : InDesign-Server-подібний хост, JSON-рядки по TCP
+- stub   : чистий Python (Pillow), без InDesign — для бенчмарків і швидких превью
+- session: пул теплих сесій (orchestrator/sessions.py)
+"""
+
+import json
+import re
+import socket
+from pathlib import Path
+from typing import Protocol
+
+from orchestrator.run_job import COMPOSE_JSX, log, run_indesign
+from aizine_integration.layout_engine import grid_shape
+
+
+class Renderer(Protocol):
+    """Рендерить план у PDF (шлях береться з plan.meta.output_dir)."""
+
+    name: str
+
+    def render(self, plan_path: Path, plan: dict | None = None) -> None:
+        """plan — вже побудований об'єкт (щоб не перечитувати файл), якщо є."""
+        ...
+
+
+class RenderError(RuntimeError):
+    pass
+
+
+# ================================================================
+# InDesign Desktop (COM)
+# ================================================================
+class ComRenderer:
+    name = "com"
+
+    def __init__(self, timeout: float | None = None):
+        self.timeout = timeout
+
+    def render(self, plan_path: Path, plan: dict | None = None) -> None:
+        run_indesign(str(plan_path), self.timeout)
+
+
+# ================================================================
+# InDesign-Server-style socket
+# ================================================================
+def encode_request(cmd: str, **params) -> bytes:
+    """Один запит = один JSON-рядок (спільний протокол для socket і сесій)."""
+    return (json.dumps({"cmd": cmd, **params}, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def decode_response(line: bytes | str) -> dict:
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    if not line.strip():
+        raise RenderError("Renderer closed connection")
+    resp = json.loads(line)
+    if not resp.get("ok"):
+        raise RenderError(resp.get("error") or "Renderer failed")
+    return resp
+
+
+class SocketRenderer:
+    name = "socket"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 18383, timeout: float | None = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def render(self, plan_path: Path, plan: dict | None = None) -> None:
+        log(f"Sending plan to render host {self.host}:{self.port}...")
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as conn:
+            conn.sendall(encode_request(
+                "render",
+                plan=Path(plan_path).as_posix(),
+                script=COMPOSE_JSX.as_posix(),
+            ))
+            with conn.makefile("rb") as f:
+                decode_response(f.readline())
+        log("Render host OK")
+
+
+# ================================================================
+# Stub (Pillow) — без InDesign
+# ================================================================
+PAGE_LABEL_RE = re.compile(r"^PAGE_(\d+)_IMG_(\d+)$")
+
+
+def _page_index(label: str, pages: int) -> int | None:
+    """COVER_IMAGE → 0, PAGE_NN_IMG_MM → NN, BACK_IMAGE → остання."""
+    if label.startswith("COVER"):
+        return 0
+    if label.startswith("BACK"):
+        return pages - 1
+    m = PAGE_LABEL_RE.match(label)
+    if m:
+        return min(int(m.group(1)), pages - 2)
+    return None
+
+
+def _fit_fill(img, size):
+    """Аналог FitOptions.FILL_PROPORTIONALLY: масштаб + обрізка по центру."""
+    from PIL import ImageOps
+    return ImageOps.fit(ImageOps.exif_transpose(img), size)
+
+
+class StubRenderer:
+    """
+    Малює кожну сторінку як сітку фото (+ текст на обкладинці)
+    і зберігає багатосторінковий PDF. Відповідність шаблону не гарантується.
+    """
+
+    name = "stub"
+
+    def __init__(self, dpi: int = 72, page_size_pt: tuple[float, float] = (623.6, 822.0)):
+        self.dpi = dpi
+        self.page_px = (round(page_size_pt[0] * dpi / 72), round(page_size_pt[1] * dpi / 72))
+
+    def _load(self, path: str, size: tuple[int, int]):
+        from PIL import Image
+        with Image.open(path) as img:
+            img.draft("RGB", size)  # JPEG: декодуємо одразу зі зменшенням
+            return _fit_fill(img.convert("RGB"), size)
+
+    def _draw_page(self, photos: list[str], text: str | None):
+        from PIL import Image, ImageDraw
+
+        w, h = self.page_px
+        page = Image.new("RGB", (w, h), "white")
+        margin = max(8, w // 40)
+
+        if photos:
+            cols, rows = grid_shape(len(photos))  # та сама сітка, що й у layout_engine
+            cell_w = (w - margin * (cols + 1)) // cols
+            cell_h = (h - margin * (rows + 1)) // rows
+            for n, path in enumerate(photos):
+                r, c = divmod(n, cols)
+                try:
+                    tile = self._load(path, (cell_w, cell_h))
+                except Exception as e:
+                    log(f"Stub: cannot read {path}: {e}")
+                    continue
+                page.paste(tile, (margin + c * (cell_w + margin), margin + r * (cell_h + margin)))
+
+        if text:
+            ImageDraw.Draw(page).text((margin * 2, h - margin * 4), text, fill="black")
+        return page
+
+    def render(self, plan_path: Path, plan: dict | None = None) -> None:
+        if plan is None:
+            plan = json.loads(Path(plan_path).read_text(encoding="utf-8"))
+        meta = plan.get("meta", {})
+        pages = max(2, int(meta.get("pages") or 2))
+
+        page_photos: list[list[str]] = [[] for _ in range(pages)]
+        for p in plan.get("placements", []):
+            idx = p["page"] - 1 if 0 < p.get("page", 0) <= pages else _page_index(p.get("label", ""), pages)
+            if idx is not None and p.get("photo"):
+                page_photos[idx].append(p["photo"])
+
+        texts = plan.get("texts", {})
+        cover_text = " / ".join(t for t in (texts.get("COVER_TITLE"), texts.get("COVER_SUB")) if t)
+
+        out_dir = Path(meta.get("output_dir") or Path(plan_path).parent.parent / "output")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        pdf = out_dir / "final.pdf"
+
+        log(f"Stub render: {pages} pages → {pdf}")
+        images = [
+            self._draw_page(photos, cover_text if i == 0 else None)
+            for i, photos in enumerate(page_photos)
+        ]
+        # job_id і digest плану в метаданих PDF: bench stress перевіряє, що job отримав свій план
+        images[0].save(
+            str(pdf), "PDF", save_all=True, append_images=images[1:], resolution=self.dpi,
+            title=str(meta.get("job_id") or ""), subject=str(meta.get("digest") or ""),
+        )
+        log("Stub render OK")
+
+
+# ================================================================
+# FACTORY
+# ================================================================
+def get_renderer(name: str = "com", **options) -> Renderer:
+    """Створює рендерер за назвою з Config.renderer."""
+    name = (name or "com").lower()
+    if name == "com":
+        return ComRenderer(timeout=options.get("timeout"))
+    if name == "socket":
+        return SocketRenderer(
+            host=options.get("host") or "127.0.0.1",
+            port=int(options.get("port") or 18383),
+            timeout=options.get("timeout"),
+        )
+    if name == "stub":
+        return StubRenderer(dpi=int(options.get("dpi") or 72))
+    if name == "session":
+        from orchestrator.sessions import PooledRenderer, SessionPool, host_command
+        session_host = options.get("session_host") or "indesign"
+        size = int(options.get("pool_size") or 1)
+        if session_host == "indesign" and size > 1:
+            # Усі сесії говорять з одним COM-сервером InDesign
+            log(f"RENDERER_POOL_SIZE={size} ignored for InDesign sessions: one COM instance per machine")
+            size = 1
+        pool = SessionPool(
+            host_command(session_host),
+            size=size,
+            max_jobs=int(options.get("max_jobs", 20)),
+            max_rss_growth_mb=int(options.get("max_rss_growth_mb") or 0),
+            render_timeout=options.get("timeout"),
+        )
+        return PooledRenderer(pool)
+    raise ValueError(f"Unknown renderer: {name}")
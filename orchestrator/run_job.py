@@ -2,16 +2,24 @@
 MagazineBot Orchestrator — run_job.py
 Simplified MVP version:
 1) build_plan.py
-2) InDesign COM (PowerShell)
+2) InDesign COM (PowerShell) або інший рендерер (RENDERER=com/socket/stub)
 3) PDF-only ZIP
 """
 
-import subprocess
 import os
+import shutil
 import sys
+import tempfile
+import time
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))  # запуск як скрипт: python orchestrator/run_job.py
+
+from orchestrator.job_log import JobLog, job_log_for_plan, run_streamed
+from orchestrator.zip_output import write_zip
+
 JOBS_DIR = BASE_DIR / "jobs"
 AIZINE_DIR = BASE_DIR / "aizine_integration"
 SCRIPTS_DIR = BASE_DIR / "scripts"
@@ -36,7 +44,22 @@ def log(msg):
 # ================================================================
 # 1) BUILD PLAN
 # ================================================================
-def run_build_plan(job_id: str) -> Path:
+def plan_path(job_id: str) -> Path:
+    return JOBS_DIR / job_id / "meta" / "compose_plan.json"
+
+
+def run_build_plan(job_id: str, timer=None) -> Path:
+    """build_plan у тому ж процесі (без нового інтерпретатора і перечитування JSON)."""
+    from aizine_integration.build_plan import build_plan
+
+    log("Running build_plan...")
+    plan = build_plan(job_id=job_id, timer=timer)
+    log(f"build_plan OK ({len(plan['placements'])} placements)")
+    return plan_path(job_id)
+
+
+def run_build_plan_subprocess(job_id: str, timeout: float | None = None) -> Path:
+    """Старий шлях через окремий процес (лишився для порівняння в orchestrator/bench.py)."""
     log("Running build_plan.py...")
 
     cmd = [
@@ -46,48 +69,35 @@ def run_build_plan(job_id: str) -> Path:
         "-v",
     ]
 
-    proc = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
-        errors="replace",
-    )
-
-    safe_print(proc.stdout)
-    safe_print(proc.stderr)
-
-    if proc.returncode != 0:
-        raise RuntimeError("build_plan.py FAILED")
+    returncode, tail = run_streamed(cmd, JobLog(job_id, JOBS_DIR / job_id), "build_plan", timeout)
+    if returncode != 0:
+        raise RuntimeError("build_plan.py FAILED:\n" + "\n".join(tail[-10:]))
 
     log("build_plan OK")
-    return JOBS_DIR / job_id / "meta" / "compose_plan.json"
+    return plan_path(job_id)
 
 
 # ================================================================
 # 2) InDesign — PowerShell COM
 # ================================================================
-def run_indesign(plan_path: str):
+def run_indesign(plan_path: str, timeout: float | None = None):
+    """timeout — дедлайн рендеру: після нього дерево процесів PowerShell вбивається (StageTimeout)."""
     log("Launching InDesign COM...")
 
     plan_path = plan_path.replace("\\", "/")
     jsx_path = COMPOSE_JSX.as_posix()
 
-    # Write plan path to a config file that JSX can read reliably
-    # Environment variables don't always work with InDesign COM
-    config_file = Path(os.environ["TEMP"]) / "magazinebot_config.txt"
-    config_file.write_text(plan_path, encoding="utf-8")
-    config_path = str(config_file).replace("\\", "/")
+    # Plan path goes to JSX as a DoScript argument (env vars don't reach a running InDesign).
+    # No fixed %TEMP% files: each run gets its own temp dir, so parallel jobs don't clobber each other.
+    run_dir = Path(tempfile.mkdtemp(prefix=f"magazinebot_{Path(plan_path).parent.parent.name}_"))
 
     ps_script = f'''
 Write-Output "[PS] === InDesign COM Runner ==="
 Write-Output "[PS] JSX path: {jsx_path}"
 Write-Output "[PS] Plan path: {plan_path}"
-Write-Output "[PS] Config file: {config_path}"
 
 $env:AIZINE_PLAN = "{plan_path}"
 $env:AIZINE_JSX  = "{jsx_path}"
-$env:AIZINE_CONFIG = "{config_path}"
 
 # Check if JSX file exists
 if (-not (Test-Path $env:AIZINE_JSX)) {{
@@ -127,7 +137,7 @@ try {{
 # Execute script
 Write-Output "[PS] Executing JSX script..."
 try {{
-    $app.DoScript($code, 1246973031)
+    $app.DoScript($code, 1246973031, [object[]]@($env:AIZINE_PLAN))
     Write-Output "[PS] JSX execution completed"
 }} catch {{
     Write-Output "[PS] ERROR executing JSX"
@@ -145,41 +155,34 @@ Write-Output "[PS] SUCCESS"
 exit 0
 '''
 
-    tmp = Path(os.environ["TEMP"]) / "magazinebot_indesign.ps1"
+    tmp = run_dir / "indesign.ps1"
     tmp.write_text(ps_script, encoding="utf-8")
 
-    # Extract job_id from plan_path to find debug log
-    job_dir = Path(plan_path).parent.parent
+    # jobs/<id>/meta/log.jsonl: рядки PowerShell і compose_debug.log з job_id/stage
+    job_log = job_log_for_plan(Path(plan_path))
+    job_dir = job_log.path.parent.parent
 
     try:
-        result = subprocess.run(
-            ["powershell", "-ExecutionPolicy", "Bypass", "-File", str(tmp)],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
+        returncode, tail = run_streamed(
+            ["powershell", "-ExecutionPolicy", "Bypass", "-File", str(tmp)], job_log, "indesign", timeout,
         )
-        safe_print(result.stdout)
-        safe_print(result.stderr)
 
-        # Read and display compose debug log if it exists
+        # compose_debug.log — теж порядково і з лімітом, а не весь файл у консоль
         debug_log = job_dir / "meta" / "compose_debug.log"
         if debug_log.exists():
-            log("=== COMPOSE.JSX DEBUG LOG ===")
             try:
-                safe_print(debug_log.read_text(encoding="utf-8"))
-            except Exception as e:
+                with open(debug_log, encoding="utf-8", errors="replace") as f:
+                    jsx_tail = job_log.pump("compose_jsx", "file", f)
+            except OSError as e:
                 log(f"Could not read debug log: {e}")
-            log("=== END DEBUG LOG ===")
+            else:
+                tail += list(jsx_tail)[-10:]
 
-        if result.returncode != 0:
-            raise RuntimeError("InDesign failed")
+        if returncode != 0:
+            raise RuntimeError("InDesign failed:\n" + "\n".join(tail[-10:]))
 
     finally:
-        try:
-            tmp.unlink()
-        except:
-            pass
+        shutil.rmtree(run_dir, ignore_errors=True)
 
     log("InDesign OK")
 
@@ -202,15 +205,9 @@ def verify_output(job_id: str):
 # 4) ZIP (PDF only)
 # ================================================================
 def make_zip(job_id: str) -> Path:
+    """PDF уже стиснений — кладеться в архів STORED, шматками, без DEFLATE."""
     out = JOBS_DIR / job_id / "output"
-    zip_path = out / "magazine.zip"
-
-    pdf = out / "final.pdf"
-
-    import zipfile
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-        if pdf.exists():
-            z.write(pdf, arcname="final.pdf")
+    zip_path = write_zip([(out / "final.pdf", "final.pdf")], out / "magazine.zip")
 
     log("ZIP OK")
     return zip_path
@@ -230,17 +227,41 @@ def main():
     log(f"JOB START {job_id}")
     log("=" * 50)
 
-    plan_path = run_build_plan(job_id)
+    from orchestrator.renderers import get_renderer
+    from orchestrator.timings import StageTimer
+    from orchestrator.write_log import write_result_log
+
+    timer = StageTimer(job_id, JOBS_DIR)
+
+    with timer.stage("plan"):
+        plan_path = run_build_plan(job_id, timer)
+
+    renderer = get_renderer(
+        os.getenv("RENDERER", "com"),
+        host=os.getenv("RENDERER_HOST"),
+        port=os.getenv("RENDERER_PORT"),
+    )
+    log(f"Renderer: {renderer.name}")
+    timer.note("renderer", renderer.name)
+    with timer.stage("render"):
+        renderer.render(plan_path)
 
-    run_indesign(str(plan_path))
+    with timer.stage("verify"):
+        pdf = verify_output(job_id)
 
-    pdf = verify_output(job_id)
+    zip_path = None
+    if os.getenv("MAKE_ZIP", "1") != "0":
+        with timer.stage("zip"):
+            zip_path = make_zip(job_id)
 
-    zip_path = make_zip(job_id)
+    timer.save()
+    write_result_log(job_id, pdf, None, time.time() - timer.started_at, timer.stages(), JOBS_DIR)
+    log("Timings: " + ", ".join(f"{name} {sec:.2f}s" for name, sec in timer.stages().items()))
 
     log("JOB COMPLETE")
     safe_print(f"PDF: {pdf}")
-    safe_print(f"ZIP: {zip_path}")
+    if zip_path:
+        safe_print(f"ZIP: {zip_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""
+MagazineBot Orchestrator — session_host.py
+Локальний stand-in хоста renderer-сесії (той самий протокол, що й
+scripts/indesign_session.ps1) — для тестів і бенчмарків без InDesign.
+
+Запуск:
+    python -m orchestrator.session_host --backend stub
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from orchestrator.renderers import get_renderer
+
+
+def current_rss() -> int:
+    """RSS процесу в байтах (0 якщо платформа не дає дізнатися)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+def serve(backend: str):
+    # stdout — тільки для протоколу; логи рендерера йдуть у stderr
+    proto_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    renderer = get_renderer(backend)
+
+    def reply(**resp):
+        proto_out.write(json.dumps(resp, ensure_ascii=False) + "\n")
+        proto_out.flush()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            req = json.loads(line)
+        except ValueError as e:
+            reply(ok=False, error=f"bad request: {e}")
+            continue
+
+        cmd = req.get("cmd")
+        if cmd == "ping":
+            reply(ok=True, rss=current_rss(), pid=os.getpid())
+        elif cmd == "render":
+            try:
+                renderer.render(Path(req["plan"]))
+                reply(ok=True)
+            except Exception as e:
+                reply(ok=False, error=str(e))
+        elif cmd == "quit":
+            reply(ok=True)
+            break
+        else:
+            reply(ok=False, error=f"unknown cmd: {cmd}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="stub")
+    args = parser.parse_args()
+    serve(args.backend)
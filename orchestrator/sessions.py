@@ -0,0 +1,284 @@
+"""
+MagazineBot Orchestrator — sessions.py
+Пул "теплих" renderer-сесій замість холодного старту InDesign на кожен job.
+
+Сесія — довгоживучий процес-хост, який говорить JSON-рядками через stdin/stdout:
+    → {"cmd": "ping"}                     ← {"ok": true, "rss": <bytes>}
+    → {"cmd": "render", "plan": "..."}    ← {"ok": true} | {"ok": false, "error": "..."}
+    → {"cmd": "quit"}                     ← {"ok": true}
+
+Хости:
+- scripts/indesign_session.ps1           — один COM-об'єкт InDesign на всю сесію
+- python -m orchestrator.session_host    — локальний stand-in (stub/будь-який бекенд)
+
+Відповіді читає окремий потік у чергу, тож кожен запит має дедлайн: сесія, що не
+відповіла вчасно, вбивається (StageTimeout), а пул стартує нову.
+COM-сервер InDesign один на машину: для хоста indesign пул завжди з однієї сесії,
+інакше quit при перезапуску однієї сесії закрив би InDesign під рештою.
+"""
+
+import queue
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from orchestrator.renderers import RenderError, decode_response, encode_request
+from orchestrator.run_job import BASE_DIR, COMPOSE_JSX, SCRIPTS_DIR, log
+from orchestrator.watchdog import StageTimeout, kill_tree, job_processes, process_group_kwargs
+
+INDESIGN_SESSION_PS1 = SCRIPTS_DIR / "indesign_session.ps1"
+
+# Дедлайн службових запитів (ping, quit); рендер має власний — render_timeout пулу
+PING_TIMEOUT = 60
+
+
+def host_command(host: str = "indesign") -> list[str]:
+    """Команда запуску хоста сесії."""
+    if host == "indesign":
+        return [
+            "powershell", "-NoProfile", "-ExecutionPolicy", "Bypass",
+            "-File", str(INDESIGN_SESSION_PS1),
+            "-JsxPath", COMPOSE_JSX.as_posix(),
+        ]
+    return [sys.executable, "-m", "orchestrator.session_host", "--backend", host]
+
+
+class RendererSession:
+    """Один процес-хост. Не потокобезпечний — ним володіє пул."""
+
+    def __init__(self, command: list[str]):
+        self.command = command
+        self.proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+            cwd=str(BASE_DIR),
+            **process_group_kwargs(),
+        )
+        self.jobs_done = 0
+        self.baseline_rss: int | None = None
+        self.last_rss = 0
+        self._replies: queue.Queue[str | None] = queue.Queue()
+        threading.Thread(target=self._read_replies, name=f"session-{self.pid}", daemon=True).start()
+
+    @property
+    def pid(self) -> int:
+        return self.proc.pid
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def _read_replies(self):
+        try:
+            for line in self.proc.stdout:
+                self._replies.put(line)
+        except (OSError, ValueError):
+            pass  # stdout закрили в close()/kill()
+        self._replies.put(None)  # EOF: процес помер
+
+    def request(self, cmd: str, timeout: float | None = PING_TIMEOUT, **params) -> dict:
+        """timeout — скільки чекати відповідь; None — без дедлайну."""
+        if not self.alive():
+            raise RenderError(f"Session {self.pid} is not running")
+        try:
+            self.proc.stdin.write(encode_request(cmd, **params).decode("utf-8"))
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise RenderError(f"Session {self.pid} pipe error: {e}") from e
+        try:
+            line = self._replies.get(timeout=timeout)
+        except queue.Empty:
+            raise StageTimeout(f"Session {self.pid}: no reply to {cmd!r} in {timeout:g}s") from None
+        return decode_response(line or "")
+
+    def ping(self) -> dict:
+        resp = self.request("ping")
+        self.last_rss = int(resp.get("rss") or 0)
+        if self.baseline_rss is None:
+            self.baseline_rss = self.last_rss
+        return resp
+
+    def render(self, plan_path: Path, timeout: float | None = None):
+        self.request("render", timeout=timeout, plan=Path(plan_path).as_posix())
+        self.jobs_done += 1
+
+    def close(self, timeout: float = 30):
+        if self.alive():
+            try:
+                self.request("quit", timeout=timeout)
+            except Exception:
+                pass
+            try:
+                self.proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                kill_tree(self.proc)
+        self._close_streams()
+
+    def kill(self):
+        """Зависла сесія: без quit (відповіді не буде) — одразу вбиваємо дерево процесів."""
+        kill_tree(self.proc)
+        self._close_streams()
+
+    def _close_streams(self):
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class SessionPool:
+    """
+    До `size` теплих сесій; кожна перезапускається після `max_jobs` рендерів
+    або якщо RSS виріс більше ніж на `max_rss_growth_mb` від старту.
+    Рендер довший за `render_timeout` секунд вбиває сесію (StageTimeout).
+    """
+
+    def __init__(
+        self,
+        command: list[str],
+        size: int = 1,
+        max_jobs: int = 20,
+        max_rss_growth_mb: int = 0,
+        render_timeout: float | None = None,
+    ):
+        self.command = command
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.render_timeout = render_timeout
+        self.max_rss_growth = max_rss_growth_mb * 1024 * 1024
+        self._idle: queue.LifoQueue[RendererSession] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._sessions: set[RendererSession] = set()
+        self._closed = False
+
+    def _spawn(self) -> RendererSession:
+        session = RendererSession(self.command)
+        session.ping()  # чекаємо готовності хоста
+        log(f"Session {session.pid} started (rss={session.last_rss // (1024 * 1024)} MB)")
+        with self._lock:
+            self._sessions.add(session)
+        return session
+
+    def _retire(self, session: RendererSession, reason: str, kill: bool = False):
+        log(f"Session {session.pid} recycled: {reason}")
+        with self._lock:
+            self._sessions.discard(session)
+        if kill:
+            session.kill()
+        else:
+            session.close()
+
+    def _needs_recycle(self, session: RendererSession) -> str | None:
+        if self.max_jobs and session.jobs_done >= self.max_jobs:
+            return f"{session.jobs_done} jobs"
+        if self.max_rss_growth and session.baseline_rss is not None:
+            if session.last_rss - session.baseline_rss > self.max_rss_growth:
+                return f"rss grew to {session.last_rss // (1024 * 1024)} MB"
+        return None
+
+    def _take(self) -> RendererSession:
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            return self._spawn()
+        try:
+            session.ping()
+        except Exception as e:
+            self._retire(session, f"health-check failed: {e}")
+            return self._spawn()
+        return session
+
+    @contextmanager
+    def session(self):
+        """Видає здорову сесію (health-check ping перед використанням)."""
+        if self._closed:
+            raise RenderError("Session pool is closed")
+
+        self._slots.acquire()
+        session = None
+        try:
+            session = self._take()
+
+            try:
+                yield session
+            except StageTimeout:
+                # Сесія ще зайнята старим запитом — quit вона не прочитає
+                self._retire(session, "render deadline", kill=True)
+                session = None
+                raise
+            except Exception:
+                # Після помилки стан InDesign невідомий — не повертаємо сесію в пул
+                self._retire(session, "render error")
+                session = None
+                raise
+
+            try:
+                session.ping()
+            except Exception as e:
+                self._retire(session, f"health-check failed: {e}")
+                session = None
+            else:
+                reason = self._needs_recycle(session)
+                if reason:
+                    self._retire(session, reason)
+                    session = None
+        finally:
+            if session is not None:
+                self._idle.put(session)
+            self._slots.release()
+
+    def render(self, plan_path: Path):
+        # Скасування job вбиває процес сесії: readline отримає EOF, сесія піде на перезапуск
+        job_id = Path(plan_path).parent.parent.name
+        try:
+            with self.session() as session, job_processes.track(job_id, session.proc):
+                session.render(plan_path, timeout=self.render_timeout)
+        except RenderError:
+            job_processes.check(job_id)  # процес вбили скасуванням — це не збій рендеру
+            raise
+
+    def warm_up(self):
+        """Стартує всі сесії заздалегідь (щоб перший job не платив за cold start)."""
+        with self._lock:
+            missing = self.size - len(self._sessions)  # живі: і вільні, і зайняті рендером
+        for _ in range(missing):
+            # Кожна сесія стартує під слотом, як у _take: разом їх ніколи не більше size
+            if not self._slots.acquire(blocking=False):
+                break
+            try:
+                self._idle.put(self._spawn())
+            finally:
+                self._slots.release()
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+class PooledRenderer:
+    """Renderer поверх SessionPool (Config.renderer = "session")."""
+
+    name = "session"
+
+    def __init__(self, pool: SessionPool):
+        self.pool = pool
+
+    def render(self, plan_path: Path, plan: dict | None = None) -> None:
+        log("Rendering in warm session...")
+        self.pool.render(plan_path)
+        log("Session render OK")
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,187 @@
+"""
+MagazineBot Orchestrator — timings.py
+Поетапні таймінги job і метрики для Prometheus:
+- StageTimer: with timer.stage("render"): ... — етапи з однаковою назвою сумуються
+  (завантаження фото, альбоми превью), результат → jobs/<id>/meta/timings.json
+- StageMetrics: гістограми тривалості етапів у text format Prometheus; файл для
+  node_exporter textfile collector (METRICS_FILE), перезаписується атомарно
+- таймер job створюється при постановці в чергу (timer_for у chosen_pages) і живе
+  до finish_timer; прийом фото (receive_photos, download, analyze_photos) рахує
+  PhotoRegistry і додає до таймера окремими етапами — вибір теми в job не входить
+
+Етапи пайплайна: receive_photos, download, analyze_photos, placement, plan,
+render (або render_cache), verify, zip, rasterize, upload.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+# Секунди: від дрібних етапів (verify, zip) до InDesign на 40 сторінок
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class StageTimer:
+    def __init__(self, job_id: str, jobs_dir: Path):
+        self.job_id = job_id
+        self.jobs_dir = Path(jobs_dir)
+        self.started_at = time.time()
+        self.notes: dict = {}
+        self._stages: dict[str, dict] = {}  # порядок першого запуску зберігається
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Міряє блок; працює і в потоці (to_thread), і навколо await."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            entry = self._stages.setdefault(name, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+
+    def note(self, key: str, value):
+        """Контекст до таймінгів: renderer, cache hit, кількість фото…"""
+        with self._lock:
+            self.notes[key] = value
+
+    def stages(self) -> dict[str, float]:
+        with self._lock:
+            return {name: entry["seconds"] for name, entry in self._stages.items()}
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            stages = [
+                {"stage": name, "seconds": round(entry["seconds"], 3), "count": entry["count"]}
+                for name, entry in self._stages.items()
+            ]
+            notes = dict(self.notes)
+        return {
+            "job_id": self.job_id,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "total_seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "notes": notes,
+        }
+
+    def save(self) -> Path:
+        path = self.jobs_dir / self.job_id / "meta" / "timings.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(self.as_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+
+class _NoTimer:
+    """Заглушка для викликів без таймера (CLI, бенчмарки)."""
+
+    def stage(self, name: str):
+        return nullcontext()
+
+    def add(self, name: str, seconds: float):
+        pass
+
+    def note(self, key: str, value):
+        pass
+
+
+NO_TIMER = _NoTimer()
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class StageMetrics:
+    """Гістограми етапів і цілого job; render() — Prometheus text exposition format."""
+
+    def __init__(self, path: Path | None = None, buckets=DEFAULT_BUCKETS):
+        self.path = Path(path) if path else None
+        self.buckets = buckets
+        self._stages: dict[str, Histogram] = {}
+        self._jobs = Histogram(buckets)
+        self._lock = threading.Lock()
+
+    def observe_job(self, timer: StageTimer):
+        with self._lock:
+            for name, seconds in timer.stages().items():
+                self._stages.setdefault(name, Histogram(self.buckets)).observe(seconds)
+            self._jobs.observe(time.time() - timer.started_at)
+        self.write()
+
+    def render(self) -> str:
+        lines = [
+            "# HELP magazinebot_stage_seconds Time spent in a pipeline stage per job.",
+            "# TYPE magazinebot_stage_seconds histogram",
+        ]
+        with self._lock:
+            for name in sorted(self._stages):
+                lines += _histogram_lines("magazinebot_stage_seconds", self._stages[name], f'stage="{name}"')
+            lines += [
+                "# HELP magazinebot_job_seconds Wall time of a job from submit to delivery.",
+                "# TYPE magazinebot_job_seconds histogram",
+            ]
+            lines += _histogram_lines("magazinebot_job_seconds", self._jobs)
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, self.path)  # textfile collector не побачить половину файлу
+
+
+def _histogram_lines(metric: str, hist: Histogram, labels: str = "") -> list[str]:
+    sep = "," if labels else ""
+    lines = [
+        f'{metric}_bucket{{{labels}{sep}le="{upper:g}"}} {count}'
+        for upper, count in zip(hist.buckets, hist.counts)
+    ]
+    lines.append(f'{metric}_bucket{{{labels}{sep}le="+Inf"}} {hist.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {hist.sum:.6f}")
+    lines.append(f"{metric}_count{suffix} {hist.count}")
+    return lines
+
+
+# ================================================================
+# ТАЙМЕРИ JOB У ПРОЦЕСІ
+# ================================================================
+_timers: dict[str, StageTimer] = {}
+_timers_lock = threading.Lock()
+
+
+def timer_for(job_id: str, jobs_dir: Path) -> StageTimer:
+    with _timers_lock:
+        timer = _timers.get(job_id)
+        if timer is None:
+            timer = _timers[job_id] = StageTimer(job_id, jobs_dir)
+        return timer
+
+
+def finish_timer(job_id: str) -> StageTimer | None:
+    with _timers_lock:
+        return _timers.pop(job_id, None)
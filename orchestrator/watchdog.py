@@ -0,0 +1,167 @@
+"""
+MagazineBot Orchestrator — watchdog.py
+Дедлайни і скасування для процесів рендеру:
+- кожен subprocess job стартує у власній групі процесів і реєструється за job_id
+- дедлайн stage (wait_process) або скасування (job_processes.cancel) вбивають усе дерево
+  процесів (PowerShell → дочірні), а не лише батьківський процес
+- supervise() — асинхронна обгортка над пайплайном у потоці: при таймауті чи скасуванні
+  вбиває процеси job і повертає керування одразу, тож слот воркера звільняється,
+  а потік пайплайну завершується сам, щойно його subprocess помер
+
+Обмеження: InDesign Desktop — COM-сервер, він не є дочірнім процесом PowerShell;
+вбивство дерева перериває очікування DoScript, але сам InDesign може лишитись запущеним.
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import threading
+from contextlib import contextmanager
+
+IS_WINDOWS = os.name == "nt"
+
+
+class StageTimeout(RuntimeError):
+    pass
+
+
+class JobCancelled(RuntimeError):
+    pass
+
+
+def process_group_kwargs() -> dict:
+    """Popen kwargs: окрема група процесів, щоб kill_tree зачепив і нащадків."""
+    if IS_WINDOWS:
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_tree(proc: subprocess.Popen):
+    if proc.poll() is not None:
+        return
+    try:
+        if IS_WINDOWS:
+            subprocess.run(
+                ["taskkill", "/T", "/F", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=30,
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        pass
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+class JobProcesses:
+    """job_id → запущені процеси; cancel() можна викликати з будь-якого потоку."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._procs: dict[str, set[subprocess.Popen]] = {}
+        self._cancelled: set[str] = set()
+        self._runs: dict[str, int] = {}  # job_id → живі запуски під supervise (потоки пайплайна)
+
+    @contextmanager
+    def track(self, job_id: str, proc: subprocess.Popen):
+        with self._lock:
+            self._procs.setdefault(job_id, set()).add(proc)
+            cancelled = job_id in self._cancelled
+        if cancelled:
+            kill_tree(proc)  # скасували між стартом процесу і реєстрацією
+        try:
+            yield proc
+        finally:
+            with self._lock:
+                procs = self._procs.get(job_id)
+                if procs is not None:
+                    procs.discard(proc)
+                    if not procs:
+                        del self._procs[job_id]
+
+    def cancel(self, job_id: str) -> int:
+        """Позначає job скасованим і вбиває його процеси. Повертає кількість вбитих."""
+        with self._lock:
+            self._cancelled.add(job_id)
+            procs = list(self._procs.get(job_id, ()))
+        for proc in procs:
+            kill_tree(proc)
+        return len(procs)
+
+    def cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancelled
+
+    def check(self, job_id: str):
+        """Межа між stage: скасований job далі не йде."""
+        if self.cancelled(job_id):
+            raise JobCancelled(f"Job {job_id} cancelled")
+
+    def reset(self, job_id: str):
+        """Новий запуск того самого job (повтор, «Інший макет»)."""
+        with self._lock:
+            self._cancelled.discard(job_id)
+
+    def begin(self, job_id: str):
+        with self._lock:
+            self._cancelled.discard(job_id)
+            self._runs[job_id] = self._runs.get(job_id, 0) + 1
+
+    def end(self, job_id: str):
+        """Потік пайплайна завершився: позначка скасування більше нікому не потрібна."""
+        with self._lock:
+            runs = self._runs.get(job_id, 1) - 1
+            if runs > 0:
+                self._runs[job_id] = runs
+            else:
+                self._runs.pop(job_id, None)
+                self._cancelled.discard(job_id)
+
+
+job_processes = JobProcesses()
+
+
+def wait_process(proc: subprocess.Popen, timeout: float | None, job_id: str | None = None, stage: str = "") -> int:
+    """proc.wait з дедлайном stage: після дедлайну дерево процесів вбивається."""
+    try:
+        returncode = proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_tree(proc)
+        proc.wait()
+        raise StageTimeout(f"{stage or 'process'} timed out after {timeout:g}s")
+    if job_id is not None:
+        job_processes.check(job_id)  # код виходу від kill — це скасування, а не помилка рендеру
+    return returncode
+
+
+async def supervise(job_id: str, awaitable, timeout: float | None = None):
+    """
+    Чекає на пайплайн job (зазвичай asyncio.to_thread) з дедлайном.
+    Таймаут → StageTimeout, скасування задачі → CancelledError; в обох випадках
+    процеси job вбиваються, а керування повертається без очікування потоку.
+    Позначка скасування знімається, коли потік справді завершився (а не коли повернувся supervise).
+    """
+    job_processes.begin(job_id)
+    run = asyncio.ensure_future(awaitable)
+    run.add_done_callback(lambda f: _run_finished(job_id, f))
+    try:
+        return await asyncio.wait_for(asyncio.shield(run), timeout)
+    except asyncio.TimeoutError:
+        if not run.done():
+            job_processes.cancel(job_id)
+        raise StageTimeout(f"Job {job_id} timed out after {timeout:g}s") from None
+    except asyncio.CancelledError:
+        if not run.done():  # потік уже завершився — вбивати нічого, позначка лишилась би назавжди
+            job_processes.cancel(job_id)
+        raise
+
+
+def _run_finished(job_id: str, future: asyncio.Future):
+    job_processes.end(job_id)
+    if not future.cancelled():
+        future.exception()  # після таймауту результат нікому не потрібен — без "never retrieved"
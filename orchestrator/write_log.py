@@ -1,16 +1,22 @@
 import json
 import os
+from pathlib import Path
 
-def write_result_log(job_id, pdf_path, preview_path, duration):
+
+def write_result_log(job_id, pdf_path, preview_path, duration, stages=None, jobs_dir=None):
+    """jobs/<id>/result.json: підсумок job; stages — {етап: секунди} з StageTimer."""
     result = {
         "job_id": job_id,
-        "pdf": pdf_path,
-        "preview": preview_path,
+        "pdf": str(pdf_path) if pdf_path else None,
+        "preview": str(preview_path) if preview_path else None,
         "seconds": round(duration, 2)
     }
+    if stages:
+        result["stages"] = {name: round(seconds, 3) for name, seconds in stages.items()}
 
+    jobs_dir = jobs_dir or os.getenv("AIZINE_JOBS") or Path(__file__).resolve().parent.parent / "jobs"
     out_file = os.path.join(
-        os.getenv("AIZINE_JOBS"),
+        jobs_dir,
         job_id,
         "result.json"
     )
@@ -1,17 +1,72 @@
+"""
+MagazineBot Orchestrator — zip_output.py
+Пакування результатів job у ZIP:
+- метод стиснення за типом файлу: PDF/JPEG/PNG/IDML вже стиснені — STORED
+  (DEFLATE витрачав би CPU на ~0% виграшу), JSON/логи/INDD — DEFLATED
+- файли копіюються в архів шматками по CHUNK_SIZE: пам'ять не залежить від розміру PDF
+- архів пишеться у .tmp поруч і підміняється через os.replace — читач (або hardlink
+  з кешу рендерів) ніколи не бачить половину файлу
+"""
+
 import os
+import shutil
 import zipfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+CHUNK_SIZE = 1024 * 1024
+
+# Вже стиснені формати: повторний DEFLATE майже нічого не дає
+STORED_SUFFIXES = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".webp", ".heic", ".gif",
+    ".zip", ".idml", ".gz", ".mp4",
+}
+
+
+def compression_for(path: Path) -> int:
+    return zipfile.ZIP_STORED if Path(path).suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+
+
+def write_zip(entries, zip_path: Path) -> Path:
+    """
+    entries — пари (файл, ім'я в архіві). Відсутні файли пропускаються.
+    Повертає zip_path.
+    """
+    zip_path = Path(zip_path)
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = zip_path.with_name(f"{zip_path.name}.{os.getpid()}.tmp")
+    try:
+        with zipfile.ZipFile(tmp, "w", allowZip64=True) as z:
+            for src, arcname in entries:
+                src = Path(src)
+                if not src.is_file():
+                    continue
+                info = zipfile.ZipInfo.from_file(src, arcname)
+                info.compress_type = compression_for(src)  # розмір з from_file — zip64 вмикається сам
+                with open(src, "rb") as f, z.open(info, "w") as dst:
+                    shutil.copyfileobj(f, dst, CHUNK_SIZE)
+        os.replace(tmp, zip_path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return zip_path
+
 
 def create_zip(job_id):
-    out_dir = os.getenv("AIZINE_OUT")
-    job_dir = os.path.join(os.getenv("AIZINE_JOBS"), job_id)
+    """Увесь каталог job (фото, meta, output) → magazine_<job_id>.zip у AIZINE_OUT."""
+    job_dir = Path(os.getenv("AIZINE_JOBS") or BASE_DIR / "jobs") / job_id
+    out_dir = Path(os.getenv("AIZINE_OUT") or job_dir / "output")
 
-    zip_path = os.path.join(out_dir, f"magazine_{job_id}.zip")
+    zip_path = out_dir / f"magazine_{job_id}.zip"
 
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+    def entries():
         for root, dirs, files in os.walk(job_dir):
-            for file in files:
-                full = os.path.join(root, file)
-                rel = os.path.relpath(full, job_dir)
-                z.write(full, rel)
+            dirs.sort()
+            for file in sorted(files):
+                full = Path(root) / file
+                if file.startswith("magazine") and file.endswith((".zip", ".tmp")):
+                    continue  # свої архіви (і цей) не пакуються — PDF не дублюється
+                yield full, full.relative_to(job_dir).as_posix()
 
-    return zip_path
+    return str(write_zip(entries(), zip_path))
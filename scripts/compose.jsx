@@ -8,32 +8,27 @@
 
 app.scriptPreferences.userInteractionLevel = UserInteractionLevels.NEVER_INTERACT;
 
+// Arguments from app.doScript(..., withArguments) — capture at top level:
+// inside a function `arguments` means that function's own arguments
+var _scriptArgs = (typeof arguments !== "undefined" && arguments) ? arguments : [];
+
 // Global log file for debugging
 var _logFile = null;
 var _logPath = "";
 
 function getPlanPath() {
-    // Try environment variable first
+    // Plan path per job: DoScript(code, language, [planPath]) from run_indesign / indesign_session.ps1.
+    // No shared temp file, so concurrent jobs can't read each other's plan.
+    if (_scriptArgs.length > 0 && _scriptArgs[0]) {
+        return String(_scriptArgs[0]);
+    }
+
+    // Manual run (ESTK / Scripts panel): environment variable
     var planPath = $.getenv("AIZINE_PLAN");
     if (planPath && planPath !== "null" && planPath !== "undefined") {
         return planPath;
     }
 
-    // Try config file
-    var configPath = $.getenv("AIZINE_CONFIG");
-    if (!configPath) {
-        configPath = Folder.temp.fsName + "/magazinebot_config.txt";
-    }
-
-    var configFile = new File(configPath);
-    if (configFile.exists) {
-        configFile.open("r");
-        configFile.encoding = "UTF-8";
-        planPath = configFile.read();
-        configFile.close();
-        return planPath.replace(/^\s+|\s+$/g, "");
-    }
-
     return null;
 }
 
@@ -178,32 +173,6 @@ function placeImage(frame, imgPath, fitType, photoInfo) {
     }
 }
 
-function placeImageByLabel(doc, label, imgPath, fitType) {
-    var ok = false;
-
-    // rectangles
-    var rects = doc.rectangles;
-    for (var i = 0; i < rects.length; i++) {
-        if (rects[i].label === label) {
-            if (placeImage(rects[i], imgPath, fitType)) ok = true;
-        }
-    }
-
-    // fallback: all items
-    if (!ok) {
-        var items = doc.allPageItems;
-        for (var j = 0; j < items.length; j++) {
-            if (items[j].label === label) {
-                if (placeImage(items[j], imgPath, fitType)) ok = true;
-            }
-        }
-    }
-
-    if (!ok) log("FRAME NOT FOUND: " + label);
-
-    return ok;
-}
-
 // ======================================================
 // TEXT
 // ======================================================
@@ -223,10 +192,15 @@ function setTextByLabel(doc, label, txt) {
 // PAGE MANAGEMENT
 // ======================================================
 function calculateRequiredPages(placements) {
-    // Cover = 1 page, Back = 1 page
-    // Internal pages: parse PAGE_XX_IMG_YY labels
+    // Plans from layout_engine carry the 1-based page of every placement
     var maxPage = 0;
+    for (var k = 0; k < placements.length; k++) {
+        if (placements[k].page && placements[k].page > maxPage) maxPage = placements[k].page;
+    }
+    if (maxPage > 0) return maxPage + maxPage % 2;
 
+    // Older plans: Cover = 1 page, Back = 1 page
+    // Internal pages: parse PAGE_XX_IMG_YY labels
     for (var i = 0; i < placements.length; i++) {
         var label = placements[i].label;
 
@@ -335,7 +309,7 @@ function listAllLabels(doc) {
 }
 
 // ======================================================
-// FALLBACK: Place images into rectangles by page order
+// IMAGE PLACEMENT BY PLAN: page + label
 // ======================================================
 
 // Список можливих назв шару з фото (пріоритет зверху вниз)
@@ -456,45 +430,153 @@ function findBestFrameForPhoto(frames, photoOrientation) {
     return largest;
 }
 
-function placeFallbackImages(doc, placements) {
-    log("=== LAYER-BASED IMAGE PLACEMENT ===");
+function sameItem(a, b) {
+    try { return a.id === b.id; } catch(e) { return false; }
+}
 
-    // Шукаємо шар Photos
-    var photoLayer = findPhotoLayer(doc);
-    if (photoLayer) {
-        log("Using layer: " + photoLayer.name);
-    } else {
-        log("No photo layer found - using largest frames on each page");
+function groupPlacementsByPage(placements) {
+    // placement.page — 1-based page from layout_engine (several photos per page);
+    // older plans without page: one photo per page in list order
+    var byPage = {};
+    var order = [];
+    for (var i = 0; i < placements.length; i++) {
+        var pageNum = placements[i].page ? parseInt(placements[i].page, 10) : i + 1;
+        if (!byPage[pageNum]) {
+            byPage[pageNum] = [];
+            order.push(pageNum);
+        }
+        byPage[pageNum].push(placements[i]);
     }
+    return {byPage: byPage, order: order};
+}
 
-    var placedCount = 0;
-    var photoIndex = 0;
+function findLabeledFrame(page, label, used) {
+    var items = page.allPageItems;
+    for (var i = 0; i < items.length; i++) {
+        if (items[i].label !== label) continue;
+        var taken = false;
+        for (var j = 0; j < used.length; j++) {
+            if (sameItem(used[j], items[i])) taken = true;
+        }
+        if (!taken) return items[i];
+    }
+    return null;
+}
 
-    for (var pageIdx = 0; pageIdx < doc.pages.length; pageIdx++) {
-        if (photoIndex >= placements.length) break;
+function gridShape(count) {
+    // Same as layout_engine.grid_shape: 1-2 photos stacked, then 2 columns
+    if (count <= 2) return {cols: 1, rows: Math.max(1, count)};
+    return {cols: 2, rows: Math.ceil(count / 2)};
+}
 
-        var page = doc.pages[pageIdx];
-        var frames = getImageFramesOnPage(page, photoLayer);
+function pageContentBounds(page) {
+    var b = page.bounds; // [top, left, bottom, right]
+    try {
+        var m = page.marginPreferences;
+        return [b[0] + m.top, b[1] + m.left, b[2] - m.bottom, b[3] - m.right];
+    } catch(e) {
+        return b;
+    }
+}
 
-        log("Page " + (pageIdx + 1) + ": found " + frames.length + " photo frames" + (photoLayer ? " on layer '" + photoLayer.name + "'" : ""));
+var GRID_GUTTER = 6; // pt between grid cells
 
-        if (frames.length > 0 && photoIndex < placements.length) {
-            var p = placements[photoIndex];
+function makeGridFrames(page, count, reuse, photoLayer) {
+    /**
+     * Page has fewer photo frames than the plan puts on it (virtual grid slots):
+     * split the content area into a grid; existing free frames are resized and reused
+     * (keeping template styling), missing cells are duplicated or created.
+     */
+    var area = pageContentBounds(page);
+    var shape = gridShape(count);
+    var cellW = (area[3] - area[1] - GRID_GUTTER * (shape.cols - 1)) / shape.cols;
+    var cellH = (area[2] - area[0] - GRID_GUTTER * (shape.rows - 1)) / shape.rows;
 
-            // Визначаємо орієнтацію фото з placement (якщо є)
-            var photoOrientation = p.orientation || "unknown";
-            log("  Photo: " + p.filename + " (" + photoOrientation + ")");
+    var frames = [];
+    for (var n = 0; n < count; n++) {
+        var top = area[0] + Math.floor(n / shape.cols) * (cellH + GRID_GUTTER);
+        var left = area[1] + (n % shape.cols) * (cellW + GRID_GUTTER);
+        var frame;
+        if (n < reuse.length) {
+            frame = reuse[n].frame;
+        } else if (reuse.length > 0) {
+            frame = reuse[0].frame.duplicate();
+        } else if (photoLayer) {
+            frame = page.rectangles.add(photoLayer);
+        } else {
+            frame = page.rectangles.add();
+        }
+        frame.geometricBounds = [top, left, top + cellH, left + cellW];
+        frames.push(frame);
+    }
+    return frames;
+}
 
-            // Знаходимо найкращий фрейм для цього фото
-            var bestFrame = findBestFrameForPhoto(frames, photoOrientation);
+function placePlanImages(doc, placements) {
+    log("=== PLAN IMAGE PLACEMENT (page + label) ===");
 
-            if (bestFrame) {
-                log("  Placing into frame on page " + (pageIdx + 1) + " (size: " + bestFrame.width.toFixed(0) + "x" + bestFrame.height.toFixed(0) + ")");
-                if (placeImage(bestFrame.frame, p.photo, "fill", {orientation: photoOrientation})) {
-                    placedCount++;
+    var photoLayer = findPhotoLayer(doc);
+    var groups = groupPlacementsByPage(placements);
+    var placedCount = 0;
+
+    for (var g = 0; g < groups.order.length; g++) {
+        var pageNum = groups.order[g];
+        var items = groups.byPage[pageNum];
+
+        if (pageNum < 1 || pageNum > doc.pages.length) {
+            log("Page " + pageNum + " is not in the document (" + doc.pages.length + " pages), " +
+                items.length + " photos NOT placed");
+            continue;
+        }
+        var page = doc.pages[pageNum - 1];
+        var used = [];
+        var rest = [];
+
+        // 1) Frame with the slot's script label on this page
+        for (var i = 0; i < items.length; i++) {
+            var labeled = items[i].label ? findLabeledFrame(page, items[i].label, used) : null;
+            if (!labeled) {
+                rest.push(items[i]);
+                continue;
+            }
+            log("Page " + pageNum + ": " + items[i].label + " <- " + items[i].filename);
+            used.push(labeled);
+            if (placeImage(labeled, items[i].photo, items[i].fit || "fill", items[i])) placedCount++;
+        }
+        if (rest.length === 0) continue;
+
+        // 2) Remaining photos: free photo frames of this page, by orientation
+        var free = [];
+        var frames = getImageFramesOnPage(page, photoLayer);
+        for (var f = 0; f < frames.length; f++) {
+            var isUsed = false;
+            for (var u = 0; u < used.length; u++) {
+                if (sameItem(used[u], frames[f].frame)) isUsed = true;
+            }
+            if (!isUsed) free.push(frames[f]);
+        }
+        log("Page " + pageNum + ": " + rest.length + " photos without label frame, " + free.length + " free frames");
+
+        var targets = [];
+        if (free.length >= rest.length) {
+            for (var r = 0; r < rest.length; r++) {
+                var best = findBestFrameForPhoto(free, rest[r].orientation || "unknown");
+                for (var b = 0; b < free.length; b++) {
+                    if (free[b] === best) {
+                        free.splice(b, 1);
+                        break;
+                    }
                 }
+                targets.push(best.frame);
             }
-            photoIndex++;
+        } else {
+            // 3) Fewer frames than photos (virtual grid): build the grid on the page
+            targets = makeGridFrames(page, rest.length, free, photoLayer);
+        }
+
+        for (var t = 0; t < rest.length; t++) {
+            log("Page " + pageNum + ": " + rest[t].label + " <- " + rest[t].filename);
+            if (placeImage(targets[t], rest[t].photo, rest[t].fit || "fill", rest[t])) placedCount++;
         }
     }
 
@@ -620,8 +702,8 @@ function placeFallbackImages(doc, placements) {
 
     // STEP 9: Place images
     try {
-        log("STEP 9: Placing images (fallback mode)...");
-        var ok = placeFallbackImages(doc, placements);
+        log("STEP 9: Placing images by page and label...");
+        var ok = placePlanImages(doc, placements);
         log("STEP 9 OK: Placed " + ok + "/" + placements.length);
     } catch(e) {
         throw new Error("STEP 9 FAILED (images): " + e.message);
@@ -0,0 +1,91 @@
+# ============================================
+# ТЕПЛА СЕСІЯ INDESIGN (orchestrator/sessions.py)
+# Один COM-об'єкт на весь час життя процесу.
+# Протокол: JSON-рядок у stdin → JSON-рядок у stdout.
+# Логи — тільки в stderr, щоб не ламати протокол.
+# ============================================
+
+param(
+    [Parameter(Mandatory = $true)][string]$JsxPath
+)
+
+[Console]::InputEncoding = [System.Text.Encoding]::UTF8
+[Console]::OutputEncoding = [System.Text.Encoding]::UTF8
+
+function Reply($obj) {
+    [Console]::Out.WriteLine(($obj | ConvertTo-Json -Compress))
+    [Console]::Out.Flush()
+}
+
+function Log($msg) {
+    [Console]::Error.WriteLine("[PS-SESSION] $msg")
+}
+
+function Get-InDesignRss {
+    try {
+        return [int64](Get-Process -Name "InDesign*" -ErrorAction Stop | Measure-Object WorkingSet64 -Sum).Sum
+    } catch {
+        return 0
+    }
+}
+
+Log "Creating InDesign COM object..."
+try {
+    $app = New-Object -ComObject InDesign.Application
+    Log "COM object created: $($app.Name) $($app.Version)"
+} catch {
+    Log "ERROR: Cannot create COM object: $_"
+    exit 1
+}
+
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($null -eq $line) { break }
+    if (-not $line.Trim()) { continue }
+
+    try {
+        $req = $line | ConvertFrom-Json
+    } catch {
+        Reply @{ ok = $false; error = "bad request: $_" }
+        continue
+    }
+
+    switch ($req.cmd) {
+        "ping" {
+            try {
+                $null = $app.Version
+                Reply @{ ok = $true; rss = (Get-InDesignRss); pid = $PID }
+            } catch {
+                Reply @{ ok = $false; error = "InDesign not responding: $_" }
+            }
+        }
+        "render" {
+            try {
+                # InDesign вже запущений — env змінні до нього не доходять, тож план
+                # аргументом DoScript (у compose.jsx — arguments[0]), без спільного файлу в TEMP
+                $code = Get-Content $JsxPath -Raw -Encoding UTF8
+
+                if ($app.Documents.Count -gt 0) { $app.Documents.Close() }
+                $app.DoScript($code, 1246973031, [object[]]@([string]$req.plan))
+                try { $app.Documents.Close() } catch {}
+
+                Reply @{ ok = $true }
+            } catch {
+                Log "ERROR executing JSX: $_"
+                Reply @{ ok = $false; error = "$_" }
+            }
+        }
+        "quit" {
+            try { $app.Documents.Close() } catch {}
+            try { $app.Quit() } catch {}
+            Reply @{ ok = $true }
+            exit 0
+        }
+        default {
+            Reply @{ ok = $false; error = "unknown cmd: $($req.cmd)" }
+        }
+    }
+}
+
+try { $app.Quit() } catch {}
+exit 0